@@ -0,0 +1 @@
+"""Benchmarks for pylemmy's hot paths."""
@@ -0,0 +1,236 @@
+"""Benchmark the hot paths of streams: parsing, deduplication, merging, wrappers."""
+
+import asyncio
+import functools
+import itertools
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Sequence
+
+from pylemmy import Lemmy, api
+from pylemmy.models.comment import Comment
+from pylemmy.models.post import Post
+from pylemmy.testing.synthetic import SyntheticInstance
+from pylemmy.utils import StreamYielder, _merge_streams
+
+
+def _best_time(fn: Callable[[], Any], repeat: int) -> float:
+    """Run a function `repeat` times, and return the fastest run in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _instance(n_posts: int, n_comments: int) -> SyntheticInstance:
+    instance = SyntheticInstance(n_communities=1)
+    instance.generate(n_posts, n_comments)
+    return instance
+
+
+def bench_parsing(
+    page_sizes: Sequence[int] = (10, 20, 50), repeat: int = 20
+) -> Dict[str, float]:
+    """Time the validation of GetPostsResponse and GetCommentsResponse pages.
+
+    :param page_sizes: Numbers of items per page.
+    :param repeat: Number of times each page is parsed; the fastest run is kept.
+    :return: Items parsed per second, for each response type and page size.
+    """
+    instance = _instance(max(page_sizes), max(page_sizes))
+    results = {}
+    for size in page_sizes:
+        posts = instance.get_posts({"limit": size})
+        comments = instance.get_comments({"limit": size})
+        elapsed = _best_time(
+            functools.partial(api.post.GetPostsResponse, **posts), repeat
+        )
+        results[f"parse_posts_{size}_items_per_second"] = size / elapsed
+        elapsed = _best_time(
+            functools.partial(api.comment.GetCommentsResponse, **comments), repeat
+        )
+        results[f"parse_comments_{size}_items_per_second"] = size / elapsed
+    return results
+
+
+def bench_stream_yielder(
+    found_keys_sizes: Sequence[int] = (1_000, 100_000, 1_000_000),
+    page_size: int = 50,
+    n_pages: int = 200,
+    repeat: int = 5,
+) -> Dict[str, float]:
+    """Time `StreamYielder.yield_results` with many keys already seen.
+
+    Each page has half new keys, and half keys seen on the previous page, as when
+    polling an active community.
+
+    :param found_keys_sizes: Numbers of keys seen before the timed pages.
+    :param page_size: Number of results per page.
+    :param n_pages: Number of pages yielded.
+    :param repeat: Number of runs; the fastest is kept.
+    :return: Microseconds per page, for each number of keys seen.
+    """
+    step = page_size // 2
+    pages = [
+        [str(k) for k in range(i * step, i * step + page_size)] for i in range(n_pages)
+    ]
+    results = {}
+    for n_keys in found_keys_sizes:
+        seen = {str(i) for i in range(-n_keys, 0)}
+
+        def yield_pages(seen=seen):
+            yielder = StreamYielder(
+                skip_existing=False,
+                filter_fn=lambda _: True,
+                unique_key_fn=str,
+                limit=None,
+                min_wait_time=1,
+                max_wait_time=1,
+            )
+            yielder.found_keys = set(seen)
+            start = time.perf_counter()
+            for page in pages:
+                for _ in yielder.yield_results(page):
+                    pass
+            return time.perf_counter() - start
+
+        elapsed = min(yield_pages() for _ in range(repeat))
+        results[f"yield_page_{n_keys}_keys_us"] = elapsed / n_pages * 1e6
+    return results
+
+
+def _endless_source(source: int, page_size: int) -> Callable[[], List[str]]:
+    """A results function returning a page of new items on every call."""
+    polls = itertools.count()
+
+    def results_fn() -> List[str]:
+        poll = next(polls)
+        return [f"{source}-{poll}-{i}" for i in range(page_size)]
+
+    return results_fn
+
+
+def bench_merge(
+    n_sources: Sequence[int] = (10, 100, 1000),
+    page_size: int = 10,
+    n_items: int = 20_000,
+    repeat: int = 3,
+) -> Dict[str, float]:
+    """Time `_merge_streams` fanning in many sources.
+
+    Every poll of every source returns a page of new items, so that the time spent
+    is the overhead of polling, deduplicating and merging.
+
+    :param n_sources: Numbers of merged sources.
+    :param page_size: Number of new items per poll of a source.
+    :param n_items: Number of items merged before stopping.
+    :param repeat: Number of runs; the fastest is kept.
+    :return: Items merged per second, for each number of sources.
+    """
+    results = {}
+    for n in n_sources:
+
+        def merge(n=n):
+            asyncio.run(
+                _merge_streams(
+                    [_endless_source(s, page_size) for s in range(n)],
+                    [str] * n,
+                    lambda _: None,
+                    limit=n_items,
+                    min_wait_time=0,
+                    max_wait_time=0,
+                )
+            )
+
+        elapsed = _best_time(merge, repeat)
+        results[f"merge_{n}_sources_items_per_second"] = n_items / elapsed
+    return results
+
+
+def bench_wrappers(n_items: int = 2000, repeat: int = 5) -> Dict[str, float]:
+    """Time the construction of Post and Comment wrappers from parsed views.
+
+    :param n_items: Number of wrappers built.
+    :param repeat: Number of runs; the fastest is kept.
+    :return: Wrappers built per second, for posts and comments.
+    """
+    lemmy = Lemmy("http://lemmy.test", None, None, "pylemmy benchmarks")
+    instance = _instance(n_items, n_items)
+    post_views = api.post.GetPostsResponse(
+        **instance.get_posts({"limit": n_items})
+    ).posts
+    comment_views = api.comment.GetCommentsResponse(
+        **instance.get_comments({"limit": n_items})
+    ).comments
+
+    post_time = _best_time(lambda: [Post(lemmy, v) for v in post_views], repeat)
+    comment_time = _best_time(
+        lambda: [Comment(lemmy, v) for v in comment_views], repeat
+    )
+    return {
+        "post_wrappers_per_second": n_items / post_time,
+        "comment_wrappers_per_second": n_items / comment_time,
+    }
+
+
+def _allocated(build: Callable[[], Any]) -> float:
+    """Bytes still allocated by the object returned by a function."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def bench_memory(n_items: int = 2000) -> Dict[str, float]:
+    """Measure the memory retained per item with tracemalloc.
+
+    :param n_items: Number of items retained.
+    :return: Bytes per Post, per Comment (wrapper and parsed view), and per key in
+    a StreamYielder's `found_keys`.
+    """
+    lemmy = Lemmy("http://lemmy.test", None, None, "pylemmy benchmarks")
+    instance = _instance(n_items, n_items)
+    posts = instance.get_posts({"limit": n_items})
+    comments = instance.get_comments({"limit": n_items})
+
+    post_bytes = _allocated(
+        lambda: [Post(lemmy, v) for v in api.post.GetPostsResponse(**posts).posts]
+    )
+    comment_bytes = _allocated(
+        lambda: [
+            Comment(lemmy, v)
+            for v in api.comment.GetCommentsResponse(**comments).comments
+        ]
+    )
+    key_bytes = _allocated(lambda: {str(p["post"]["ap_id"]) for p in posts["posts"]})
+    return {
+        "bytes_per_post": post_bytes / n_items,
+        "bytes_per_comment": comment_bytes / n_items,
+        "bytes_per_found_key": key_bytes / n_items,
+    }
+
+
+def run() -> Dict[str, float]:
+    """Run all the benchmarks of this module, with their default sizes."""
+    results: Dict[str, float] = {}
+    for bench in (
+        bench_parsing,
+        bench_stream_yielder,
+        bench_merge,
+        bench_wrappers,
+        bench_memory,
+    ):
+        results.update(bench())
+    return results
+
+
+if __name__ == "__main__":
+    for key, value in run().items():
+        print(f"{key}: {value:.1f}")
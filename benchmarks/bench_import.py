@@ -0,0 +1,61 @@
+"""Benchmark the startup of short-lived scripts: imports and client creation."""
+
+import subprocess
+import sys
+from typing import Dict
+
+_SNIPPETS = {
+    "import_pylemmy": "import pylemmy",
+    "import_client": "from pylemmy import Lemmy",
+    "client_startup": (
+        "from pylemmy import Lemmy; Lemmy('http://lemmy.test', None, None, 'bench')"
+    ),
+    "first_validation": (
+        "from pylemmy import api; api.post.GetPostsResponse(posts=[])"
+    ),
+    "import_streaming": "from pylemmy.utils import stream_apply",
+}
+"""Code timed in a fresh interpreter, by metric name."""
+
+_TIMER = """
+import time
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+"""
+
+
+def _time_fresh(code: str, repeat: int) -> float:
+    """Run code in `repeat` new interpreters, and return the fastest run in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        output = subprocess.run(  # noqa: S603
+            [sys.executable, "-c", _TIMER.format(code=code)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        best = min(best, float(output))
+    return best
+
+
+def bench_startup(repeat: int = 7) -> Dict[str, float]:
+    """Time imports and the creation of a client, each in a fresh interpreter.
+
+    :param repeat: Number of runs of each snippet; the fastest is kept.
+    :return: Microseconds taken by each snippet.
+    """
+    return {
+        f"{name}_us": _time_fresh(code, repeat) * 1e6
+        for name, code in _SNIPPETS.items()
+    }
+
+
+def run() -> Dict[str, float]:
+    """Run all the benchmarks of this module, with their default sizes."""
+    return bench_startup()
+
+
+if __name__ == "__main__":
+    for key, value in run().items():
+        print(f"{key}: {value:.1f}")
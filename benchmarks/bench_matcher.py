@@ -0,0 +1,54 @@
+"""Benchmark the KeywordMatcher against a naive loop over the phrases."""
+
+import random
+import string
+import time
+from types import SimpleNamespace
+from typing import Dict, List
+
+from pylemmy.matcher import KeywordMatcher
+
+
+def _random_phrase(rng: random.Random) -> str:
+    words = (
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8)))
+        for _ in range(rng.randint(1, 3))
+    )
+    return " ".join(words)
+
+
+def _naive_filter(phrases: List[str]):
+    def filter_fn(item) -> bool:
+        title = item.title.lower()
+        return any(phrase in title for phrase in phrases)
+
+    return filter_fn
+
+
+def run(n_phrases: int = 2000, n_titles: int = 2000) -> Dict[str, float]:
+    """Time both approaches over the same random phrases and titles.
+
+    :param n_phrases: Number of phrases in the rule set.
+    :param n_titles: Number of titles to filter.
+    :return: Items per second for each approach.
+    """
+    rng = random.Random(0)
+    phrases = [_random_phrase(rng) for _ in range(n_phrases)]
+    items = [SimpleNamespace(title=_random_phrase(rng) * 3) for _ in range(n_titles)]
+
+    results = {}
+    for name, filter_fn in [
+        ("naive_loop", _naive_filter(phrases)),
+        ("keyword_matcher", KeywordMatcher(phrases, fields=["title"])),
+    ]:
+        start = time.perf_counter()
+        matched = sum(1 for item in items if filter_fn(item))
+        elapsed = time.perf_counter() - start
+        results[f"{name}_items_per_second"] = n_titles / elapsed
+        results[f"{name}_matched"] = matched
+    return results
+
+
+if __name__ == "__main__":
+    for key, value in run().items():
+        print(f"{key}: {value:.1f}")
@@ -0,0 +1,203 @@
+"""Drive a MultiCommunityStream against a local fake Lemmy server, under load.
+
+Example:
+
+    python -m benchmarks.load_test --communities 50 --posts-per-second 40 \
+        --error-rate 0.02 --duration 30
+"""
+
+import argparse
+import datetime
+import json
+import statistics
+import time
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from pylemmy import Lemmy
+from pylemmy.fake_server import ContentGenerator, FakeLemmyServer, Faults
+from pylemmy.metrics import RequestEvent, RequestHooks
+from pylemmy.models.comment import Comment
+from pylemmy.models.post import Post
+from pylemmy.testing.synthetic import SyntheticInstance
+from pylemmy.transport import RequestsTransport, RetryTransport
+from pylemmy.utils import parse_time
+
+
+class _Stop(Exception):  # noqa: N818
+    """Raised before a request of the stream, to end the test."""
+
+
+class _Deadline(RequestHooks):
+    """Stops the stream at its next poll after a deadline, even if nothing arrives."""
+
+    def __init__(self, deadline: float):
+        """Initialize a _Deadline.
+
+        :param deadline: Time (from `time.monotonic`) to stop at.
+        """
+        self.deadline = deadline
+
+    def on_request(self, event: RequestEvent):  # noqa: ARG002
+        """Raise `_Stop` once the deadline is passed."""
+        if time.monotonic() >= self.deadline:
+            raise _Stop
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def run(
+    n_communities: int = 20,
+    posts_per_second: float = 10,
+    comments_per_second: float = 20,
+    duration: float = 10,
+    *,
+    rate_limit: Optional[float] = None,
+    error_rate: float = 0,
+    latency: float = 0.005,
+    spike_rate: float = 0,
+    spike_latency: float = 1,
+    min_wait_time: int = 1,
+    max_wait_time: int = 4,
+) -> Dict[str, Any]:
+    """Stream the posts and comments of many communities, while they are created.
+
+    Items published during the last `max_wait_time + 1` seconds of the test are
+    not counted as missed, since the stream may not have polled for them yet.
+
+    :param n_communities: Number of communities streamed.
+    :param posts_per_second: Rate of new posts, across all communities.
+    :param comments_per_second: Rate of new comments, across all communities.
+    :param duration: Length (in seconds) of the test.
+    :param rate_limit: Requests per second allowed by the server.
+    :param error_rate: Fraction of requests failing with a server error.
+    :param latency: Time (in seconds) the server takes to answer.
+    :param spike_rate: Fraction of requests answered after `spike_latency`.
+    :param spike_latency: Time (in seconds) to answer during latency spikes.
+    :param min_wait_time: Minimum time (in seconds) between polls of a source.
+    :param max_wait_time: Maximum time (in seconds) between polls of a source.
+    :return: Throughput, delivery latency, missed items, and request and poll counts.
+    """
+    instance = SyntheticInstance(n_communities, realtime=True)
+    faults = Faults(
+        rate_limit=rate_limit,
+        error_rate=error_rate,
+        latency=latency,
+        spike_rate=spike_rate,
+        spike_latency=spike_latency,
+    )
+    received: Dict[str, float] = {}
+    lags: List[float] = []
+    error = None
+
+    with FakeLemmyServer(instance, faults=faults) as server:
+        transport = RetryTransport(RequestsTransport(), max_retries=5)
+        deadline = _Deadline(float("inf"))
+        lemmy = Lemmy(
+            server.url,
+            None,
+            None,
+            "pylemmy load test",
+            transport=transport,
+            hooks=[deadline],
+        )
+        multi_stream = lemmy.multi_communities_stream(range(1, n_communities + 1))
+
+        with ContentGenerator(
+            instance,
+            posts_per_second=posts_per_second,
+            comments_per_second=comments_per_second,
+        ):
+            start = time.monotonic()
+            deadline.deadline = start + duration
+
+            def callback(item: Union[Post, Comment]):
+                now = datetime.datetime.now(datetime.timezone.utc)
+                if isinstance(item, Post):
+                    key = str(item.post_view.post.ap_id)
+                    published = item.post_view.post.published
+                else:
+                    key = str(item.comment_view.comment.ap_id)
+                    published = item.comment_view.comment.published
+                received[key] = time.monotonic()
+                lags.append((now - parse_time(published)).total_seconds())
+
+            try:
+                multi_stream.content_apply(
+                    callback, min_wait_time=min_wait_time, max_wait_time=max_wait_time
+                )
+            except _Stop:
+                pass
+            except Exception as e:
+                error = repr(e)
+            elapsed = time.monotonic() - start
+
+        settled = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+            seconds=max_wait_time + 1
+        )
+        expected = [
+            str(v["post"]["ap_id"])
+            for v in instance.posts
+            if parse_time(v["post"]["published"]) <= settled
+        ] + [
+            str(v["comment"]["ap_id"])
+            for v in instance.comments
+            if parse_time(v["comment"]["published"]) <= settled
+        ]
+        missed = sum(1 for key in expected if key not in received)
+        statuses: Dict[str, int] = {}
+        for (_, status), count in server.responses.items():
+            statuses[str(status)] = statuses.get(str(status), 0) + count
+
+    return {
+        "items_received": len(received),
+        "items_per_second": len(received) / elapsed,
+        "items_missed": missed,
+        "missed_ratio": missed / len(expected) if expected else 0.0,
+        "lag_p50_seconds": statistics.median(lags) if lags else 0.0,
+        "lag_p95_seconds": _percentile(lags, 0.95),
+        "lag_max_seconds": max(lags, default=0.0),
+        "requests": sum(statuses.values()),
+        "responses_by_status": statuses,
+        "retries": transport.retries,
+        "polls": sum(s.polls for s in multi_stream.stats.values()),
+        "empty_polls": sum(s.empty_polls for s in multi_stream.stats.values()),
+        "duplicates": sum(s.duplicates for s in multi_stream.stats.values()),
+        "stream_error": error,
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """Run the load test from the command line, and print its results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--communities", type=int, default=20)
+    parser.add_argument("--posts-per-second", type=float, default=10)
+    parser.add_argument("--comments-per-second", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--spike-rate", type=float, default=0)
+    parser.add_argument("--spike-latency", type=float, default=1)
+    args = parser.parse_args(argv)
+
+    results = run(
+        args.communities,
+        args.posts_per_second,
+        args.comments_per_second,
+        args.duration,
+        rate_limit=args.rate_limit,
+        error_rate=args.error_rate,
+        latency=args.latency,
+        spike_rate=args.spike_rate,
+        spike_latency=args.spike_latency,
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
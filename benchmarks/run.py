@@ -0,0 +1,114 @@
+"""Run the benchmarks, and write or compare their results as JSON.
+
+Example:
+
+    python -m benchmarks.run --output before.json
+    # upgrade pylemmy, or change the code
+    python -m benchmarks.run --output after.json --compare before.json
+"""
+
+import argparse
+import datetime
+import importlib
+import json
+import platform
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+from pylemmy.__about__ import __version__
+
+BENCHMARKS = ("core", "matcher", "import")
+"""Benchmark modules, named without their `bench_` prefix."""
+
+
+def run(names: Sequence[str] = BENCHMARKS) -> Dict[str, Any]:
+    """Run benchmark modules, and collect their results with the environment.
+
+    :param names: Benchmark modules to run.
+    """
+    results = {}
+    for name in names:
+        module = importlib.import_module(f"benchmarks.bench_{name}")
+        results[name] = module.run()
+    return {
+        "pylemmy_version": __version__,
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "results": results,
+    }
+
+
+def _lower_is_better(metric: str) -> bool:
+    # Times (in microseconds) and sizes. Other metrics are rates.
+    return metric.endswith("_us") or metric.startswith("bytes_")
+
+
+def compare(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.2
+) -> List[str]:
+    """Find the metrics that got worse between two runs.
+
+    :param baseline: Results of the reference run.
+    :param current: Results of the new run.
+    :param threshold: Relative change above which a metric is a regression.
+    :return: A description of each regression.
+    """
+    regressions = []
+    for name, metrics in current["results"].items():
+        for metric, value in metrics.items():
+            old = baseline["results"].get(name, {}).get(metric)
+            if not old:
+                continue
+            change = (value - old) / old
+            if _lower_is_better(metric):
+                change = -change
+            if change < -threshold:
+                regressions.append(
+                    f"{name}.{metric}: {old:.1f} -> {value:.1f} ({change:+.0%})"
+                )
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the benchmarks from the command line.
+
+    :return: The exit code, 1 if a regression was found.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "names", nargs="*", help=f"Benchmarks to run, among {', '.join(BENCHMARKS)}."
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Compare with the results in this file.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Relative change above which a metric is a regression.",
+    )
+    args = parser.parse_args(argv)
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    current = run(args.names or BENCHMARKS)
+    for name, metrics in current["results"].items():
+        for metric, value in metrics.items():
+            print(f"{name}.{metric}: {value:.1f}")
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(current, file, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(baseline, current, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,9 +10,12 @@ This example was heavily inspired by
 from urllib.parse import quote_plus
 
 from pylemmy import Lemmy
+from pylemmy.matcher import KeywordMatcher
 from pylemmy.models.post import Post
+from pylemmy.outbox import Outbox
 
 QUESTIONS = ["what is", "who is", "what are"]
+QUESTIONS_MATCHER = KeywordMatcher(QUESTIONS, fields=["post_view.post.name"])
 REPLY_TEMPLATE = "[Let me google that for you](https://lmgtfy.com/?q={})"
 
 
@@ -25,25 +28,23 @@ def main():
     )
 
     community = lemmy.get_community("test")
-    for post in community.stream.get_posts():
-        process_post(post)
+    # Replies are sent in the background, so they don't slow down the stream.
+    with Outbox(lemmy) as outbox:
+        for post in community.stream.get_posts(filter_fn=QUESTIONS_MATCHER):
+            process_post(post, outbox)
 
 
-def process_post(post: Post):
+def process_post(post: Post, outbox: Outbox):
     # Ignore titles with more than 10 words as they probably are not simple questions.
     title = post.post_view.post.name
     if len(title.split()) > 10:
         return
 
-    normalized_title = title.lower()
-    for question_phrase in QUESTIONS:
-        if question_phrase in normalized_title:
-            url_title = quote_plus(title)
-            reply_text = REPLY_TEMPLATE.format(url_title)
-            print(f"Replying to: {title}")
-            post.create_comment(reply_text)
-            # A reply has been made so do not attempt to match other phrases.
-            break
+    # The stream only yields posts whose title contains one of the QUESTIONS.
+    url_title = quote_plus(title)
+    reply_text = REPLY_TEMPLATE.format(url_title)
+    print(f"Replying to: {title}")
+    outbox.create_comment(post, reply_text)
 
 
 if __name__ == "__main__":
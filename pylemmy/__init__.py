@@ -1 +1,23 @@
-from pylemmy.lemmy import Lemmy  # noqa
+"""A Python client for the Lemmy API."""
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from pylemmy import api
+    from pylemmy.lemmy import Lemmy
+
+__all__ = ["Lemmy", "api"]
+
+
+def __getattr__(name: str) -> Any:
+    # The client is imported on first use, so that importing a lighter module of
+    # the package (e.g. `pylemmy.endpoints`) doesn't import all of it.
+    if name == "Lemmy":
+        from pylemmy.lemmy import Lemmy
+
+        return Lemmy
+    if name == "api":
+        return importlib.import_module("pylemmy.api")
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
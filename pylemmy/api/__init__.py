@@ -1 +1,21 @@
-from pylemmy.api import auth, comment, community, listing, person, post, site  # noqa
+"""Models of the requests and responses of the Lemmy API."""
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from pylemmy.api import auth, comment, community, listing, person, post, site
+
+__all__ = ["auth", "comment", "community", "listing", "person", "post", "site"]
+
+
+def __getattr__(name: str) -> Any:
+    # The modules are imported on first use, as importing all of them is slow.
+    if not name.startswith("_"):
+        try:
+            return importlib.import_module(f"{__name__}.{name}")
+        except ModuleNotFoundError as e:
+            if e.name != f"{__name__}.{name}":
+                raise
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
@@ -72,6 +72,8 @@ class GetPosts(BaseApiModel):
     community_name: Optional[str] = None
     limit: Optional[int] = None
     page: Optional[int] = None
+    # Only supported by Lemmy 0.19 and later, as `next_page` of the previous page.
+    page_cursor: Optional[str] = None
     saved_only: Optional[bool] = None
     liked_only: Optional[bool] = None
     disliked_only: Optional[bool] = None
@@ -82,6 +84,7 @@ class GetPosts(BaseApiModel):
 
 class GetPostsResponse(BaseApiModel):
     posts: List[PostView]
+    next_page: Optional[str] = None
 
 
 class PostReport(BaseApiModel):
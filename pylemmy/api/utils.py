@@ -2,4 +2,5 @@ from pydantic import BaseModel, ConfigDict
 
 
 class BaseApiModel(BaseModel):
-    model_config = ConfigDict(use_enum_values=True)
+    # Validators are built on first use, instead of when the models are imported.
+    model_config = ConfigDict(use_enum_values=True, defer_build=True)
@@ -0,0 +1,373 @@
+"""Implements a cache for the responses of GET requests."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Protocol, Set, Tuple
+
+from pylemmy.endpoints import LemmyAPI
+
+DEFAULT_TTLS: Dict[LemmyAPI, float] = {
+    LemmyAPI.GetSite: 3600,
+    LemmyAPI.Community: 300,
+    LemmyAPI.ListCommunities: 300,
+    LemmyAPI.Person: 300,
+}
+"""Default time to live (in seconds) of the responses of each endpoint."""
+
+INVALIDATIONS: Dict[LemmyAPI, Tuple[LemmyAPI, ...]] = {
+    LemmyAPI.Community: (LemmyAPI.Community, LemmyAPI.ListCommunities),
+    LemmyAPI.Post: (LemmyAPI.Post, LemmyAPI.GetPosts, LemmyAPI.Person),
+    LemmyAPI.Comment: (
+        LemmyAPI.Comment,
+        LemmyAPI.GetComments,
+        LemmyAPI.Post,
+        LemmyAPI.GetPosts,
+        LemmyAPI.Person,
+    ),
+    LemmyAPI.CreatePostReport: (LemmyAPI.ListPostReports,),
+    LemmyAPI.CreateCommentReport: (LemmyAPI.ListCommentReports,),
+    LemmyAPI.ResolvePostReport: (LemmyAPI.ListPostReports,),
+    LemmyAPI.ResolveCommentReport: (LemmyAPI.ListCommentReports,),
+}
+"""Cached endpoints whose responses are outdated by a write to each endpoint."""
+
+
+class CacheBackend(Protocol):
+    """Interface of the storage used by a [ResponseCache][pylemmy.cache.ResponseCache].
+
+    It must be safe to use from several threads.
+    """
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        """Get a response and the time it was stored at, if it is cached."""
+
+    def set(self, key: str, endpoint: str, value: Any, stored_at: float):
+        """Store a response."""
+
+    def invalidate(self, endpoints: Iterable[str]):
+        """Drop all the responses from some endpoints."""
+
+    def clear(self):
+        """Drop all responses."""
+
+
+class MemoryCacheBackend:
+    """Keeps cached responses in memory, dropping the least recently used ones."""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: Optional[int] = None):
+        """Initialize a MemoryCacheBackend.
+
+        :param max_entries: Maximum number of responses to keep.
+        :param max_bytes: Maximum total size of the responses to keep, measured as
+        the length of their JSON encoding.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+
+        self._data: OrderedDict[str, Tuple[str, float, Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        """Get a response and the time it was stored at, if it is cached.
+
+        :param key: The key of the request.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            self._data.move_to_end(key)
+            return entry[1], entry[2]
+
+    def set(self, key: str, endpoint: str, value: Any, stored_at: float):
+        """Store a response.
+
+        :param key: The key of the request.
+        :param endpoint: The endpoint of the request, used for invalidation.
+        :param value: The response.
+        :param stored_at: Time when the response was received.
+        """
+        size = len(json.dumps(value)) if self.max_bytes is not None else 0
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size_bytes -= old[3]
+            self._data[key] = (endpoint, stored_at, value, size)
+            self.size_bytes += size
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None
+                and self.size_bytes > self.max_bytes
+                and len(self._data) > 1
+            ):
+                _, (_, _, _, dropped_size) = self._data.popitem(last=False)
+                self.size_bytes -= dropped_size
+
+    def invalidate(self, endpoints: Iterable[str]):
+        """Drop all the responses from some endpoints.
+
+        :param endpoints: The endpoints to drop responses from.
+        """
+        endpoints = set(endpoints)
+        with self._lock:
+            for key in [k for k, v in self._data.items() if v[0] in endpoints]:
+                self.size_bytes -= self._data.pop(key)[3]
+
+    def clear(self):
+        """Drop all responses."""
+        with self._lock:
+            self._data.clear()
+            self.size_bytes = 0
+
+
+class SQLiteCacheBackend:
+    """Keeps cached responses in an SQLite file, which can be shared by processes.
+
+    Every `sweep_every` writes, the responses older than `max_age` are deleted, and
+    then the oldest ones beyond `max_entries`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        max_entries: int = 100_000,
+        max_age: Optional[float] = None,
+        sweep_every: int = 100,
+    ):
+        """Initialize an SQLiteCacheBackend.
+
+        :param path: Path to the SQLite database file.
+        :param max_entries: Maximum number of responses to keep, across all the
+        processes sharing the file.
+        :param max_age: If set, maximum time (in seconds) to keep a response, e.g.
+        the longest time to live of a [ResponseCache][pylemmy.cache.ResponseCache]
+        plus its `stale_ttl`.
+        :param sweep_every: Number of writes between deletions of the responses
+        beyond `max_entries` or `max_age`.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.sweep_every = sweep_every
+
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, endpoint TEXT, stored_at REAL, value TEXT)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_stored_at "
+                "ON responses (stored_at)"
+            )
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        """Get a response and the time it was stored at, if it is cached.
+
+        :param key: The key of the request.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT stored_at, value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def set(self, key: str, endpoint: str, value: Any, stored_at: float):
+        """Store a response.
+
+        :param key: The key of the request.
+        :param endpoint: The endpoint of the request, used for invalidation.
+        :param value: The response.
+        :param stored_at: Time when the response was received.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, endpoint, stored_at, json.dumps(value)),
+            )
+            self._writes += 1
+            if self._writes % self.sweep_every == 0:
+                self._sweep()
+
+    def _sweep(self):
+        if self.max_age is not None:
+            self._connection.execute(
+                "DELETE FROM responses WHERE stored_at < ?",
+                (time.time() - self.max_age,),
+            )
+        self._connection.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+            "ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def invalidate(self, endpoints: Iterable[str]):
+        """Drop all the responses from some endpoints.
+
+        :param endpoints: The endpoints to drop responses from.
+        """
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "DELETE FROM responses WHERE endpoint = ?", [(e,) for e in endpoints]
+            )
+
+    def clear(self):
+        """Drop all responses."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
+
+
+class ResponseCache:
+    """Caches the responses of GET requests, for a time that depends on the endpoint.
+
+    Responses older than their time to live, but younger than `stale_ttl` more, are
+    returned immediately while a fresh one is fetched in the background.
+    Writes through the same [Lemmy][pylemmy.lemmy.Lemmy] client drop the cached
+    responses they may have outdated (see `INVALIDATIONS`).
+
+    Example:
+
+        lemmy = Lemmy(..., response_cache=ResponseCache(stale_ttl=60))
+        community = lemmy.get_community("test")  # sent to the instance
+        community = lemmy.get_community("test")  # read from the cache
+        print(lemmy.response_cache.stats())
+    """
+
+    def __init__(
+        self,
+        ttls: Optional[Dict[LemmyAPI, float]] = None,
+        *,
+        backend: Optional[CacheBackend] = None,
+        stale_ttl: float = 0,
+    ):
+        """Initialize a ResponseCache.
+
+        :param ttls: Time to live (in seconds) of the responses of each endpoint.
+        Endpoints not in this dictionary are never cached. Defaults to
+        `DEFAULT_TTLS`.
+        :param backend: Where to store the responses, either a
+        [MemoryCacheBackend][pylemmy.cache.MemoryCacheBackend] (the default) or an
+        [SQLiteCacheBackend][pylemmy.cache.SQLiteCacheBackend].
+        :param stale_ttl: For how long (in seconds) after expiring a response can
+        still be returned, while it is refreshed in the background.
+        """
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.backend: CacheBackend = (
+            MemoryCacheBackend() if backend is None else backend
+        )
+        self.stale_ttl = stale_ttl
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+        self._refreshing: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def caches(self, path: LemmyAPI) -> bool:
+        """Whether the responses of an endpoint are cached.
+
+        :param path: A Lemmy endpoint.
+        """
+        return path in self.ttls
+
+    @staticmethod
+    def key(path: LemmyAPI, payload: Dict[str, Any], token: Optional[str]) -> str:
+        """Build the cache key of a request.
+
+        The session token is hashed, so it isn't stored in the cache.
+
+        :param path: A Lemmy endpoint.
+        :param payload: The parameters of the request.
+        :param token: The session token sent with the request, if any.
+        """
+        identity = hashlib.sha256(token.encode()).hexdigest()[:16] if token else ""
+        params = json.dumps(payload, sort_keys=True, default=str)
+        return f"{path.value}|{params}|{identity}"
+
+    def get_or_fetch(
+        self,
+        path: LemmyAPI,
+        payload: Dict[str, Any],
+        token: Optional[str],
+        fetch_fn: Callable[[], Any],
+    ) -> Any:
+        """Get a response from the cache, or fetch it and store it.
+
+        :param path: A Lemmy endpoint.
+        :param payload: The parameters of the request.
+        :param token: The session token sent with the request, if any.
+        :param fetch_fn: Function sending the request, and returning its response.
+        """
+        key = self.key(path, payload, token)
+        ttl = self.ttls[path]
+        cached = self.backend.get(key)
+        if cached is not None:
+            stored_at, value = cached
+            age = time.time() - stored_at
+            if age <= ttl:
+                with self._lock:
+                    self.hits += 1
+                return value
+            if age <= ttl + self.stale_ttl:
+                with self._lock:
+                    self.stale_hits += 1
+                self._refresh(key, path, fetch_fn)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        value = fetch_fn()
+        self.backend.set(key, path.value, value, time.time())
+        return value
+
+    def _refresh(self, key: str, path: LemmyAPI, fetch_fn: Callable[[], Any]):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.backend.set(key, path.value, fetch_fn(), time.time())
+            except Exception:  # noqa: S110
+                pass  # the stale response stays until it expires
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def invalidate_after_write(self, path: LemmyAPI):
+        """Drop the cached responses outdated by a write to an endpoint.
+
+        :param path: The endpoint that was written to.
+        """
+        endpoints = [p.value for p in INVALIDATIONS.get(path, ()) if p in self.ttls]
+        if endpoints:
+            self.backend.invalidate(endpoints)
+
+    @property
+    def hit_ratio(self) -> float:
+        """Fraction of the lookups answered from the cache, including stale ones."""
+        total = self.hits + self.stale_hits + self.misses
+        return (self.hits + self.stale_hits) / total if total > 0 else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """Get the counts of cache hits and misses, and the hit ratio."""
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": self.hit_ratio,
+        }
@@ -0,0 +1,268 @@
+"""Implements cassettes, which record requests to Lemmy and replay them offline."""
+
+import asyncio
+import collections
+import gzip
+import json
+import threading
+import time
+import urllib.parse
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from pylemmy.endpoints import LemmyAPI
+from pylemmy.transport import Response, Timeout, Transport
+
+CASSETTE_VERSION = 1
+
+# Headers worth keeping, e.g. for retries. Others (cookies...) aren't recorded.
+_RECORDED_HEADERS = ("Content-Type", "Retry-After")
+
+_REDACTED_TOKEN = "replayed-token"
+
+
+class CassetteMissError(LookupError):
+    """Raised when replaying a request that isn't in the cassette."""
+
+
+def _request_key(
+    method: str, url: str, params: Optional[Dict[str, Any]], body: Optional[Any]
+) -> Tuple[str, str, str]:
+    path = urllib.parse.urlsplit(url).path
+    if path == LemmyAPI.Login.value:
+        body = None  # credentials aren't recorded
+    data = {k: v for k, v in (params or {}).items() if v is not None}
+    if body is not None:
+        data = {"body": body, **data}
+    return method.upper(), path, json.dumps(data, sort_keys=True, default=str)
+
+
+class RecordingTransport(Transport):
+    """Sends requests through another transport, and records them in a cassette.
+
+    A cassette is a gzip-compressed file of JSON lines, one per request, with its
+    parameters, response, and how long the response took. The session token isn't
+    recorded, and neither are the credentials sent to log in.
+    """
+
+    def __init__(self, inner: Transport, path: str):
+        """Initialize a RecordingTransport.
+
+        :param inner: The transport sending the requests.
+        :param path: Path to the cassette file, which is overwritten.
+        """
+        self.inner = inner
+        self.path = path
+        self.recorded = 0
+
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._write({"version": CASSETTE_VERSION})
+
+    def _write(self, entry: Dict[str, Any]):
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def _record(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        body: Optional[Any],
+        response: Response,
+        started: float,
+    ):
+        elapsed = time.monotonic() - started
+        method, path, data = _request_key(method, url, params, body)
+        content = response.content.decode("utf-8", errors="replace")
+        if path == LemmyAPI.Login.value and response.status_code < 400:  # noqa: PLR2004
+            content = json.dumps({**response.json(), "jwt": _REDACTED_TOKEN})
+        entry = {
+            "method": method,
+            "path": path,
+            "params": data,
+            "status": response.status_code,
+            "headers": {
+                k: response.headers[k]
+                for k in _RECORDED_HEADERS
+                if k in response.headers
+            },
+            "body": content,
+            "offset": round(started - self._start, 6),
+            "elapsed": round(elapsed, 6),
+        }
+        with self._lock:
+            if not self._file.closed:
+                self._write(entry)
+                self.recorded += 1
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Any] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Timeout = None,
+    ) -> Response:
+        """Send a request, and record it.
+
+        See [request][pylemmy.transport.Transport.request] for the arguments.
+        """
+        started = time.monotonic()
+        response = self.inner.request(
+            method, url, params=params, json=json, headers=headers, timeout=timeout
+        )
+        self._record(method, url, params, json, response, started)
+        return response
+
+    async def request_async(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Any] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Timeout = None,
+    ) -> Response:
+        """Send a request without blocking the event loop, and record it.
+
+        See [request][pylemmy.transport.Transport.request] for the arguments.
+        """
+        started = time.monotonic()
+        response = await self.inner.request_async(
+            method, url, params=params, json=json, headers=headers, timeout=timeout
+        )
+        self._record(method, url, params, json, response, started)
+        return response
+
+    def close(self):
+        """Finish writing the cassette. The inner transport is left open."""
+        with self._lock:
+            self._file.close()
+
+
+class ReplayTransport(Transport):
+    """Answers requests from a cassette, without any network access.
+
+    Cassettes are recorded by a
+    [RecordingTransport][pylemmy.cassette.RecordingTransport]. Identical requests
+    (same method, endpoint and parameters) get the responses recorded for them, in
+    the same order. Once they are all used, the last one is repeated, as polling an
+    idle community would.
+
+    Example:
+
+        with lemmy.record("community.jsonl.gz"):
+            for post in community.stream.get_posts(limit=10):
+                ...
+
+        replayed = Lemmy(
+            "http://lemmy.test", None, None, "replay",
+            transport=ReplayTransport("community.jsonl.gz"),
+        )
+    """
+
+    def __init__(self, path: str, *, realtime: bool = False, speed: float = 1):
+        """Initialize a ReplayTransport, loading a cassette.
+
+        :param path: Path to the cassette file.
+        :param realtime: If `True`, wait as long as each response originally took.
+        Otherwise, answer immediately.
+        :param speed: When replaying in real time, how many times faster than the
+        original responses to answer.
+        """
+        self.path = path
+        self.realtime = realtime
+        self.speed = speed
+        self.replayed = 0
+
+        self._entries: Dict[Tuple[str, str, str], Deque[Dict[str, Any]]] = (
+            collections.defaultdict(collections.deque)
+        )
+        self._lock = threading.Lock()
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            header = json.loads(file.readline())
+            if header.get("version") != CASSETTE_VERSION:
+                msg = f"Unsupported cassette version: {header.get('version')}"
+                raise ValueError(msg)
+            for line in file:
+                entry = json.loads(line)
+                key = (entry["method"], entry["path"], entry["params"])
+                self._entries[key].append(entry)
+
+    def __len__(self) -> int:
+        """Number of responses left to replay, not counting repeats."""
+        return sum(len(entries) for entries in self._entries.values())
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """List the entries left to replay, in the order they were recorded."""
+        with self._lock:
+            entries = [e for queue in self._entries.values() for e in queue]
+        return sorted(entries, key=lambda e: e["offset"])
+
+    def _next(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        body: Optional[Any],
+    ) -> Dict[str, Any]:
+        key = _request_key(method, url, params, body)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                msg = f"No recorded response for {key[0]} {key[1]} {key[2]}"
+                raise CassetteMissError(msg)
+            self.replayed += 1
+            return entries.popleft() if len(entries) > 1 else entries[0]
+
+    def _delay(self, entry: Dict[str, Any]) -> float:
+        return entry["elapsed"] / self.speed if self.realtime else 0
+
+    @staticmethod
+    def _response(entry: Dict[str, Any], url: str) -> Response:
+        return Response(
+            entry["status"], entry["body"].encode("utf-8"), entry["headers"], url
+        )
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Any] = None,
+        headers: Optional[Dict[str, str]] = None,  # noqa: ARG002
+        timeout: Timeout = None,  # noqa: ARG002
+    ) -> Response:
+        """Answer a request from the cassette.
+
+        See [request][pylemmy.transport.Transport.request] for the arguments.
+        """
+        entry = self._next(method, url, params, json)
+        delay = self._delay(entry)
+        if delay > 0:
+            time.sleep(delay)
+        return self._response(entry, url)
+
+    async def request_async(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Any] = None,
+        headers: Optional[Dict[str, str]] = None,  # noqa: ARG002
+        timeout: Timeout = None,  # noqa: ARG002
+    ) -> Response:
+        """Answer a request from the cassette, without blocking the event loop.
+
+        See [request][pylemmy.transport.Transport.request] for the arguments.
+        """
+        entry = self._next(method, url, params, json)
+        delay = self._delay(entry)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self._response(entry, url)
@@ -0,0 +1,273 @@
+"""Implements streams of the changes of posts and comments, e.g. edits or removals."""
+
+import collections
+import sys
+import time
+from enum import Enum
+from typing import (
+    Any,
+    Callable,
+    Generator,
+    Generic,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from mypy_extensions import KwArg
+
+from pylemmy.utils import StreamStats
+
+T = TypeVar("T")
+
+
+class ChangeType(Enum):
+    """Types of [ChangeEvent][pylemmy.changes.ChangeEvent]."""
+
+    CREATED = "created"
+    EDITED = "edited"
+    DELETED = "deleted"
+    UNDELETED = "undeleted"
+    REMOVED = "removed"
+    UNREMOVED = "unremoved"
+    LOCKED = "locked"
+    UNLOCKED = "unlocked"
+    FEATURED = "featured"
+    UNFEATURED = "unfeatured"
+    DISTINGUISHED = "distinguished"
+    UNDISTINGUISHED = "undistinguished"
+
+
+Fingerprint = Tuple[int, int, int]
+"""Hash of the content of an item, bits of its flags, and its local id."""
+
+POST_FLAGS: Sequence[Tuple[ChangeType, ChangeType]] = (
+    (ChangeType.DELETED, ChangeType.UNDELETED),
+    (ChangeType.REMOVED, ChangeType.UNREMOVED),
+    (ChangeType.LOCKED, ChangeType.UNLOCKED),
+    (ChangeType.FEATURED, ChangeType.UNFEATURED),
+)
+"""Changes reported when each bit of the flags of a post is set or cleared."""
+
+COMMENT_FLAGS: Sequence[Tuple[ChangeType, ChangeType]] = (
+    (ChangeType.DELETED, ChangeType.UNDELETED),
+    (ChangeType.REMOVED, ChangeType.UNREMOVED),
+    (ChangeType.DISTINGUISHED, ChangeType.UNDISTINGUISHED),
+)
+"""Changes reported when each bit of the flags of a comment is set or cleared."""
+
+
+def _bits(*flags: Optional[bool]) -> int:
+    return sum(1 << i for i, flag in enumerate(flags) if flag)
+
+
+def post_fingerprint(post: Any) -> Fingerprint:
+    """Fingerprint a [Post][pylemmy.models.post.Post], for `POST_FLAGS`."""
+    p = post.post_view.post
+    return (
+        hash((p.name, p.body, p.url, p.nsfw, p.language_id, p.updated)),
+        _bits(p.deleted, p.removed, p.locked, p.featured_community or p.featured_local),
+        p.id,
+    )
+
+
+def comment_fingerprint(comment: Any) -> Fingerprint:
+    """Fingerprint a [Comment][pylemmy.models.comment.Comment], for `COMMENT_FLAGS`."""
+    c = comment.comment_view.comment
+    return (
+        hash((c.content, c.language_id, c.updated)),
+        _bits(c.deleted, c.removed, c.distinguished),
+        c.id,
+    )
+
+
+class ChangeEvent(Generic[T]):
+    """Describes a change of an item, as seen between two polls."""
+
+    __slots__ = ("type", "key", "item")
+
+    def __init__(self, change_type: ChangeType, key: str, item: T):
+        """Initialize a ChangeEvent.
+
+        :param change_type: What changed.
+        :param key: Unique key of the item, e.g. its `ap_id`.
+        :param item: The item, as it is after the change.
+        """
+        self.type = change_type
+        self.key = key
+        self.item = item
+
+    def __repr__(self) -> str:
+        """Representation of the event."""
+        return f"ChangeEvent({self.type.value}, {self.key!r})"
+
+
+class ChangeTracker(Generic[T]):
+    """Keeps a fingerprint of each item seen, to report how they change.
+
+    A fingerprint is three integers: a hash of the content of the item (including
+    its `updated` time), bits of its flags (e.g. `deleted`), and its local id. An
+    unchanged item costs a comparison of fingerprints, and only changed ones are
+    diffed, into one event per changed flag and an `EDITED` event if the content
+    hash differs.
+
+    At most `max_items` fingerprints are kept, dropping the least recently seen
+    ones. An item showing up again after its fingerprint was dropped isn't
+    reported as `CREATED` if its id isn't above the ids of the dropped items, as ids
+    grow with time; its next changes are reported again.
+    """
+
+    def __init__(
+        self,
+        unique_key_fn: Callable[[T], str],
+        fingerprint_fn: Callable[[T], Fingerprint],
+        flags: Sequence[Tuple[ChangeType, ChangeType]],
+        *,
+        max_items: int = 100_000,
+    ):
+        """Initialize an empty ChangeTracker.
+
+        :param unique_key_fn: A function that takes an item and outputs a unique id.
+        :param fingerprint_fn: A function that takes an item and outputs its
+        fingerprint, e.g. [post_fingerprint][pylemmy.changes.post_fingerprint].
+        :param flags: Changes reported when each bit of the flags is set or
+        cleared, e.g. `POST_FLAGS`.
+        :param max_items: Maximum number of fingerprints kept.
+        """
+        self.unique_key_fn = unique_key_fn
+        self.fingerprint_fn = fingerprint_fn
+        self.flags = flags
+        self.max_items = max_items
+        # Items seen unchanged, and fingerprints dropped.
+        self.unchanged = 0
+        self.evicted = 0
+
+        self._fingerprints: collections.OrderedDict[str, Fingerprint] = (
+            collections.OrderedDict()
+        )
+        self._key_bytes = 0
+        # Highest id of the items whose fingerprint was dropped.
+        self._evicted_until: Optional[int] = None
+
+    def __len__(self) -> int:
+        """Number of fingerprints kept."""
+        return len(self._fingerprints)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the fingerprints, in bytes."""
+        # Each fingerprint is a tuple of three integers.
+        entry = sys.getsizeof((0, 0, 0)) + 3 * sys.getsizeof(2**62)
+        return (
+            sys.getsizeof(self._fingerprints)
+            + self._key_bytes
+            + len(self._fingerprints) * entry
+        )
+
+    def observe(self, item: T) -> List[ChangeEvent[T]]:
+        """Compare an item to its previous fingerprint, and store the new one.
+
+        :param item: The item, as just polled.
+        :return: The changes of the item since it was last seen, if any.
+        """
+        key = self.unique_key_fn(item)
+        fingerprint = self.fingerprint_fn(item)
+        previous = self._fingerprints.get(key)
+        if previous == fingerprint:
+            self._fingerprints.move_to_end(key)
+            self.unchanged += 1
+            return []
+        self._fingerprints[key] = fingerprint
+        self._fingerprints.move_to_end(key)
+
+        if previous is None:
+            self._key_bytes += sys.getsizeof(key)
+            self._evict()
+            seen_before = (
+                self._evicted_until is not None
+                and fingerprint[2] <= self._evicted_until
+            )
+            return [] if seen_before else [ChangeEvent(ChangeType.CREATED, key, item)]
+
+        events = []
+        if previous[0] != fingerprint[0]:
+            events.append(ChangeEvent(ChangeType.EDITED, key, item))
+        changed = previous[1] ^ fingerprint[1]
+        for bit, (set_type, cleared_type) in enumerate(self.flags):
+            if changed >> bit & 1:
+                change_type = set_type if fingerprint[1] >> bit & 1 else cleared_type
+                events.append(ChangeEvent(change_type, key, item))
+        return events
+
+    def _evict(self):
+        while len(self._fingerprints) > self.max_items:
+            key, fingerprint = self._fingerprints.popitem(last=False)
+            self._key_bytes -= sys.getsizeof(key)
+            self.evicted += 1
+            if self._evicted_until is None or fingerprint[2] > self._evicted_until:
+                self._evicted_until = fingerprint[2]
+
+
+def change_stream(
+    results_fn: Callable[[KwArg(Any)], Iterable[T]],
+    tracker: ChangeTracker[T],
+    *,
+    limit: Optional[int] = None,
+    max_wait_time: int = 300,
+    min_wait_time: int = 1,
+    skip_existing: bool = False,
+    stats: Optional[StreamStats] = None,
+    **function_kwargs: Any,
+) -> Generator[ChangeEvent[T], None, None]:
+    """Stream the changes of the items returned by a function, polling it.
+
+    The polls are spaced as in [stream_generator][pylemmy.utils.stream_generator],
+    backing off while nothing changes.
+
+    :param results_fn: A function to call repeatedly, which outputs a list of items.
+    :param tracker: The [ChangeTracker][pylemmy.changes.ChangeTracker] comparing the
+    items to their previous fingerprints.
+    :param limit: Maximum number of events to yield.
+    :param max_wait_time: Maximum time (in seconds) to wait before calling the
+    function again, when nothing changes.
+    :param min_wait_time: Minimum time (in seconds) to wait before calling the
+    function again.
+    :param skip_existing: If `True`, the items of the first poll are only
+    fingerprinted, without `CREATED` events.
+    :param stats: [StreamStats][pylemmy.utils.StreamStats] updated as the stream
+    runs, counting events as new items and unchanged items as duplicates.
+    :param function_kwargs: Keyword parameters that are passed to the function.
+    """
+    if limit is not None and limit <= 0:
+        return
+    count = 0
+    wait_time = min_wait_time
+    first_poll = True
+    while True:
+        unchanged = tracker.unchanged
+        events = 0
+        for item in results_fn(**function_kwargs):
+            for event in tracker.observe(item):
+                events += 1
+                if first_poll and skip_existing:
+                    continue
+                yield event
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+        first_poll = False
+
+        if stats is not None:
+            stats.polls += 1
+            stats.new_items += events
+            stats.empty_polls += events == 0
+            stats.duplicates += tracker.unchanged - unchanged
+            stats.dedup_keys = len(tracker)
+            stats.dedup_bytes = tracker.nbytes
+        wait_time = min(2 * wait_time, max_wait_time) if events == 0 else min_wait_time
+        if stats is not None:
+            stats.wait_time = wait_time
+        time.sleep(wait_time)
@@ -0,0 +1,262 @@
+"""Implements a local stand-in for a Lemmy instance, for load and soak tests."""
+
+import collections
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+from pylemmy.proxy import JsonRequestHandler
+from pylemmy.testing.synthetic import SyntheticInstance
+
+
+class Faults:
+    """Faults injected in the responses of a fake server.
+
+    See [FakeLemmyServer][pylemmy.fake_server.FakeLemmyServer]. Each request is
+    first checked against the rate limit, then may fail with a server error, and is
+    otherwise answered after some latency, occasionally much longer (a spike).
+    """
+
+    def __init__(
+        self,
+        *,
+        rate_limit: Optional[float] = None,
+        burst: int = 10,
+        error_rate: float = 0,
+        latency: float = 0,
+        spike_rate: float = 0,
+        spike_latency: float = 1,
+        seed: int = 0,
+    ):
+        """Initialize Faults.
+
+        :param rate_limit: If set, requests beyond this many per second get an HTTP
+        429 response, with a `Retry-After` header.
+        :param burst: Number of requests that can be sent back-to-back within the
+        rate limit.
+        :param error_rate: Fraction of the requests that get an HTTP 500, 502 or 503
+        response.
+        :param latency: Time (in seconds) to wait before answering each request.
+        :param spike_rate: Fraction of the requests answered after `spike_latency`
+        instead.
+        :param spike_latency: Time (in seconds) to wait during latency spikes.
+        :param seed: Seed of the random choice of failing requests.
+        """
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.error_rate = error_rate
+        self.latency = latency
+        self.spike_rate = spike_rate
+        self.spike_latency = spike_latency
+
+        self._random = random.Random(seed)  # noqa: S311
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _rate_limited(self) -> bool:
+        if self.rate_limit is None:
+            return False
+        now = time.monotonic()
+        self._tokens = min(
+            self._tokens + (now - self._updated) * self.rate_limit, self.burst
+        )
+        self._updated = now
+        if self._tokens < 1:
+            return True
+        self._tokens -= 1
+        return False
+
+    def decide(self) -> Tuple[float, Optional[int]]:
+        """Decide how to answer a request.
+
+        :return: The time (in seconds) to wait before answering, and the status of
+        the error to answer with, if any.
+        """
+        with self._lock:
+            if self._rate_limited():
+                return 0, 429
+            if self._random.random() < self.error_rate:
+                return self.latency, self._random.choice((500, 502, 503))
+            if self._random.random() < self.spike_rate:
+                return self.spike_latency, None
+        return self.latency, None
+
+
+class ContentGenerator:
+    """Adds posts and comments to a SyntheticInstance at steady rates, in a thread.
+
+    Posts and comments go to random communities and posts.
+    """
+
+    def __init__(
+        self,
+        instance: SyntheticInstance,
+        *,
+        posts_per_second: float = 1,
+        comments_per_second: float = 0,
+    ):
+        """Initialize a ContentGenerator.
+
+        :param instance: The instance to add content to.
+        :param posts_per_second: Rate of new posts, across all communities.
+        :param comments_per_second: Rate of new comments, across all communities.
+        """
+        self.instance = instance
+        self.posts_per_second = posts_per_second
+        self.comments_per_second = comments_per_second
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        start = time.monotonic()
+        posts = comments = 0
+        while not self._stop.is_set():
+            elapsed = time.monotonic() - start
+            while posts < elapsed * self.posts_per_second:
+                self.instance.add_post()
+                posts += 1
+            while self.instance.posts and comments < elapsed * self.comments_per_second:
+                self.instance.add_comment()
+                comments += 1
+            self._stop.wait(0.01)
+
+    def start(self):
+        """Start adding content."""
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="pylemmy-content-generator", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop adding content."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "ContentGenerator":
+        """Start adding content, until the end of the context."""
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        """Stop adding content."""
+        self.stop()
+
+
+class FakeLemmyServer(ThreadingHTTPServer):
+    """A local HTTP server answering like a Lemmy instance, with synthetic content.
+
+    It answers the endpoints routed by its
+    [SyntheticInstance][pylemmy.testing.synthetic.SyntheticInstance], and can inject
+    [Faults][pylemmy.fake_server.Faults]. Unlike a
+    [FakeTransport][pylemmy.transport.FakeTransport], requests go through the
+    network stack, so this tests the whole client.
+
+    Example:
+
+        instance = SyntheticInstance(n_communities=1000, realtime=True)
+        faults = Faults(rate_limit=50, error_rate=0.01, spike_rate=0.01)
+        with FakeLemmyServer(instance, faults=faults) as server:
+            with ContentGenerator(instance, posts_per_second=100):
+                lemmy = Lemmy(server.url, None, None, "load test")
+                ...
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        instance: Optional[SyntheticInstance] = None,
+        *,
+        faults: Optional[Faults] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        """Initialize a FakeLemmyServer. It starts serving when `start` is called.
+
+        :param instance: The instance whose content is served. Defaults to an empty
+        instance with one community.
+        :param faults: Faults to inject in the responses.
+        :param host: Address to listen on.
+        :param port: Port to listen on. By default, a free port is chosen.
+        """
+        super().__init__((host, port), JsonRequestHandler)
+        self.instance = SyntheticInstance() if instance is None else instance
+        self.faults = faults
+        # Number of responses sent, by endpoint and status.
+        self.responses: collections.Counter[Tuple[str, int]] = collections.Counter()
+
+        self._routes = {
+            (method, path.value): handler
+            for (method, path), handler in self.instance.routes().items()
+        }
+        self._counter_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """URL of the server."""
+        host, port = self.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def answer(
+        self, method: str, path: str, params: Dict[str, Any]
+    ) -> Tuple[int, Any, Dict[str, str]]:
+        """Answer a request.
+
+        :param method: HTTP method of the request.
+        :param path: Path of the request.
+        :param params: Parameters of the request, from the URL and the body.
+        :return: The status, JSON data and extra headers of the response.
+        """
+        delay, error = self.faults.decide() if self.faults is not None else (0, None)
+        if delay > 0:
+            time.sleep(delay)
+
+        headers: Dict[str, str] = {}
+        handler = self._routes.get((method, path))
+        if error == 429:  # noqa: PLR2004
+            status, data = error, {"error": "rate_limit_error"}
+            headers["Retry-After"] = "1"
+        elif error is not None:
+            status, data = error, {"error": "unknown"}
+        elif handler is None:
+            status, data = 404, {"error": "not_found"}
+        else:
+            try:
+                status, data = 200, handler(params)
+            except (KeyError, StopIteration, ValueError):
+                status, data = 404, {"error": "couldnt_find_object"}
+
+        with self._counter_lock:
+            self.responses[(path, status)] += 1
+        return status, data, headers
+
+    def start(self):
+        """Start serving requests in a background thread."""
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="pylemmy-fake-server", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving requests, and close the socket."""
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeLemmyServer":
+        """Serve requests until the end of the context."""
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        """Stop serving requests."""
+        self.stop()
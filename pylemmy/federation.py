@@ -0,0 +1,266 @@
+"""Implements streams of communities followed from several federated instances."""
+
+import collections
+import functools
+import time
+import urllib.parse
+from typing import Any, Dict, Generator, Iterable, List, Optional, Sequence, Set
+
+import pylemmy
+from pylemmy.hub import StreamHub
+from pylemmy.models.community import Community
+from pylemmy.sharding import ConsistentHashRing
+from pylemmy.utils import run_concurrently
+
+
+def _host(url: str) -> str:
+    return urllib.parse.urlsplit(url).netloc
+
+
+def _get_community(name: str, lemmy: "pylemmy.Lemmy") -> Community:
+    return lemmy.get_community(name)
+
+
+class FederatedCommunity:
+    """A community, as seen from the instances it is polled on."""
+
+    def __init__(self, actor_id: str, replicas: List[Community]):
+        """Initialize a FederatedCommunity.
+
+        :param actor_id: The `actor_id` of the community, the same on all instances.
+        :param replicas: The community on each instance polling it, its home
+        instance first if it is one of them.
+        """
+        self.actor_id = actor_id
+        self.replicas = replicas
+        # Hosts of the instances polling the community.
+        self.hosts: Set[str] = {_host(str(c.lemmy.lemmy_url)) for c in replicas}
+
+
+class FederatedStream:
+    """Streams communities from several instances, delivering each item once.
+
+    Through federation, a post shows up on every instance following its community,
+    with a different local `id` but the same `ap_id`. This stream polls each
+    community on its home instance when it is one of the `instances`. Otherwise,
+    a [ConsistentHashRing][pylemmy.sharding.ConsistentHashRing] of the instances
+    picks which one polls it, spreading the load. With `redundancy` above 1, more
+    instances poll each community, and the copies are deduplicated on their
+    `ap_id`.
+
+    Copies from the instance where an item was made (`local=True`) are preferred:
+    when that instance is also polled, copies from other instances are held for
+    `local_grace` seconds, and dropped if the local copy arrives meanwhile.
+
+    Example:
+
+        stream = FederatedStream(
+            [lemmy_ml, beehaw], ["technology@lemmy.ml", "chat@beehaw.org"]
+        )
+        for post in stream.get_posts():
+            process_post(post)
+    """
+
+    def __init__(
+        self,
+        instances: Sequence["pylemmy.Lemmy"],
+        communities: Iterable[str],
+        *,
+        redundancy: int = 1,
+        local_grace: float = 30,
+        replicas: int = 100,
+    ):
+        """Initialize a FederatedStream, looking up the communities on each instance.
+
+        :param instances: Clients of the instances to poll.
+        :param communities: Names of the communities, as understood by each
+        instance, e.g. `"technology@lemmy.ml"`.
+        :param redundancy: Number of instances polling each community.
+        :param local_grace: Time (in seconds) to wait for the local copy of an item.
+        :param replicas: Number of points of each instance on the hash ring.
+        """
+        if redundancy < 1:
+            msg = f"Need a positive redundancy, got {redundancy}."
+            raise ValueError(msg)
+        self.instances = list(instances)
+        self.redundancy = redundancy
+        self.local_grace = local_grace
+        by_url = {str(lemmy.lemmy_url): lemmy for lemmy in self.instances}
+        if len(by_url) != len(self.instances):
+            msg = "Each instance can only be given once."
+            raise ValueError(msg)
+        self.ring = ConsistentHashRing(by_url, replicas=replicas)
+
+        self.communities: Dict[str, FederatedCommunity] = {}
+        for name in communities:
+            found: Dict[str, Community] = {}
+            for result in run_concurrently(
+                functools.partial(_get_community, name), self.instances
+            ):
+                if result.ok:
+                    found[str(result.key.lemmy_url)] = result.unwrap()
+            if not found:
+                msg = f"Community {name!r} wasn't found on any instance."
+                raise LookupError(msg)
+            actor_id = next(iter(found.values())).safe.actor_id
+            order = [
+                url
+                for url in self.ring.nodes_for(actor_id, len(self.ring))
+                if url in found
+            ]
+            order.sort(key=lambda url: not found[url].safe.local)
+            self.communities[actor_id] = FederatedCommunity(
+                actor_id, [found[url] for url in order[:redundancy]]
+            )
+
+        self.delivered = 0
+        # Copies discarded because another copy of the item was delivered.
+        self.duplicates = 0
+        self.hub: Optional[StreamHub] = None
+
+    def assignments(self) -> Dict[str, List[str]]:
+        """Get the communities polled by each instance.
+
+        :return: A dictionary keyed by instance URL, with the `actor_id`s of the
+        communities it polls.
+        """
+        assignments: Dict[str, List[str]] = {url: [] for url in self.ring.nodes}
+        for community in self.communities.values():
+            for replica in community.replicas:
+                assignments[str(replica.lemmy.lemmy_url)].append(community.actor_id)
+        return assignments
+
+    def stats_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Get the current statistics of each source of the running stream.
+
+        :return: A dictionary keyed by `"<kind>/<community name>@<host>"`, with the
+        snapshots of their [StreamStats][pylemmy.utils.StreamStats].
+        """
+        return {} if self.hub is None else self.hub.stats_snapshot()
+
+    def get_posts(self, **kwargs) -> Generator["pylemmy.models.post.Post", None, None]:
+        """Get a stream of Posts in the communities, each Post once.
+
+        :param kwargs: See [stream][pylemmy.federation.FederatedStream.stream].
+        """
+        return self.stream("posts", **kwargs)
+
+    def get_comments(
+        self, **kwargs
+    ) -> Generator["pylemmy.models.comment.Comment", None, None]:
+        """Get a stream of Comments in the communities, each Comment once.
+
+        :param kwargs: See [stream][pylemmy.federation.FederatedStream.stream].
+        """
+        return self.stream("comments", **kwargs)
+
+    def stream(
+        self,
+        kind: str,
+        *,
+        limit: Optional[int] = None,
+        min_wait_time: float = 1,
+        max_wait_time: float = 300,
+        skip_existing: bool = False,
+        max_size: int = 1000,
+        **function_kwargs: Any,
+    ) -> Generator[Any, None, None]:
+        """Get a stream of Posts or Comments, polling all the instances concurrently.
+
+        :param kind: Either `"posts"` or `"comments"`.
+        :param limit: Maximum number of items to yield.
+        :param min_wait_time: Minimum time (in seconds) between polls of a source.
+        :param max_wait_time: Maximum time (in seconds) between polls of a source.
+        :param skip_existing: If `True`, skip the items of the first poll of each
+        source.
+        :param max_size: Maximum number of polled items waiting to be yielded,
+        before the pollers wait.
+        :param function_kwargs: Keyword parameters passed to
+        [get_posts][pylemmy.models.community.Community.get_posts] or
+        [get_comments][pylemmy.models.community.Community.get_comments], e.g.
+        `filters`.
+        """
+        if kind not in ("posts", "comments"):
+            msg = f"Unknown kind {kind!r}, expected 'posts' or 'comments'."
+            raise ValueError(msg)
+        hub = self.hub = StreamHub(
+            min_wait_time=min_wait_time,
+            max_wait_time=max_wait_time,
+            skip_existing=skip_existing,
+        )
+        add = hub.add_posts if kind == "posts" else hub.add_comments
+        for community in self.communities.values():
+            for replica in community.replicas:
+                host = _host(str(replica.lemmy.lemmy_url))
+                add(
+                    replica,
+                    name=f"{kind}/{replica.safe.name}@{host}",
+                    **function_kwargs,
+                )
+        subscription = hub.subscribe(max_size=max_size)
+
+        seen: Set[str] = set()
+        # Copies waiting for their local copy, oldest first, with their deadline.
+        held: collections.OrderedDict[str, Any] = collections.OrderedDict()
+        count = 0
+        hub.start()
+        try:
+            while limit is None or count < limit:
+                timeout = None
+                if held:
+                    deadline, _ = next(iter(held.values()))
+                    timeout = max(deadline - time.monotonic(), 0)
+                try:
+                    item = subscription.get(timeout=timeout)
+                except TimeoutError:
+                    item = None
+                if item is not None:
+                    deliver = self._admit(item, kind, seen, held)
+                    if deliver is not None:
+                        yield deliver
+                        count += 1
+                while held and (limit is None or count < limit):
+                    key, (deadline, copy) = next(iter(held.items()))
+                    if deadline > time.monotonic():
+                        break
+                    del held[key]
+                    seen.add(key)
+                    self.delivered += 1
+                    yield copy
+                    count += 1
+        finally:
+            hub.stop()
+
+    def _admit(
+        self, item: Any, kind: str, seen: Set[str], held: Dict[str, Any]
+    ) -> Optional[Any]:
+        """Dedup a polled item, and return it if it should be delivered now."""
+        if kind == "posts":
+            ap_id = str(item.post_view.post.ap_id)
+            local = item.post_view.post.local
+            community_id = item.post_view.community.actor_id
+        else:
+            ap_id = str(item.comment_view.comment.ap_id)
+            local = item.comment_view.comment.local
+            community_id = item.comment_view.community.actor_id
+        if ap_id in seen:
+            self.duplicates += 1
+            return None
+        community = self.communities.get(str(community_id))
+        waits_for_local = (
+            not local
+            and community is not None
+            and len(community.replicas) > 1
+            and _host(ap_id) in community.hosts
+        )
+        if waits_for_local:
+            if ap_id in held:
+                self.duplicates += 1
+            else:
+                held[ap_id] = (time.monotonic() + self.local_grace, item)
+            return None
+        if held.pop(ap_id, None) is not None:
+            self.duplicates += 1
+        seen.add(ap_id)
+        self.delivered += 1
+        return item
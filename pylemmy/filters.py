@@ -0,0 +1,247 @@
+"""Implements declarative filters, evaluated by the server whenever possible."""
+
+import typing
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from pylemmy.api.comment import CommentReportView, CommentView
+from pylemmy.api.listing import ListingType, SortType
+from pylemmy.api.post import PostReportView, PostView
+from pylemmy.api.utils import BaseApiModel
+
+
+def _view(item: Any) -> Any:
+    """Get the API view wrapped by a Post, Comment or report."""
+    for attr in ("post_view", "comment_view", "report_view"):
+        view = getattr(item, attr, None)
+        if view is not None:
+            return view
+    return item
+
+
+def _report(view: Any) -> Any:
+    return getattr(view, "post_report", None) or getattr(view, "comment_report", None)
+
+
+def _sort_param(sort: Any, annotation: Any) -> Optional[Any]:
+    """Translate a sort to the sort type of a request, or `None` if it has no match.
+
+    Comments can only be sorted by Hot, Top, New or Old: the `Top*` sorts of posts
+    become `Top`, and the others are dropped.
+    """
+    enums = [
+        arg
+        for arg in typing.get_args(annotation) or (annotation,)
+        if isinstance(arg, type) and issubclass(arg, Enum)
+    ]
+    choices = {member.value for enum in enums for member in enum}
+    value = getattr(sort, "value", sort)
+    if not choices or value in choices:
+        return sort
+    if str(value).startswith("Top") and "Top" in choices:
+        return "Top"
+    return None
+
+
+def _holds(condition: "_Condition", view: Any) -> bool:
+    # Conditions on another kind of views (e.g. `max_depth` on a post) are skipped,
+    # and other views without the field of the condition fail it.
+    if condition.views is not None and not isinstance(view, condition.views):
+        return True
+    try:
+        return bool(condition.predicate(view))
+    except AttributeError:
+        return False
+
+
+class _Condition:
+    """A condition with its request parameter, and its client-side equivalent."""
+
+    def __init__(
+        self,
+        param: Optional[str],
+        value: Any,
+        predicate: Callable[[Any], bool],
+        views: Optional[Tuple[type, ...]] = None,
+    ):
+        """Initialize a condition.
+
+        :param param: Name of the request parameter that implements this condition,
+        or `None` if it can only be evaluated client-side.
+        :param value: Value to send in the request parameter.
+        :param predicate: Function evaluating the condition on an API view.
+        :param views: Types of the API views the condition applies to, or `None` if
+        it applies to all of them.
+        """
+        self.param = param
+        self.value = value
+        self.predicate = predicate
+        self.views = views
+
+
+class Filter:
+    """A declarative filter for listings and streams.
+
+    Each condition is sent as a request parameter if the endpoint supports it, and
+    evaluated client-side otherwise. This way, less data is downloaded and parsed.
+
+    Example:
+
+        only_liked = Filter(liked=True, where=lambda p: p.post_view.post.url)
+        for post in community.stream.get_posts(filters=only_liked):
+            process_post(post)
+    """
+
+    def __init__(
+        self,
+        *,
+        sort: Optional[SortType] = None,
+        type_: Optional[ListingType] = None,
+        community_name: Optional[str] = None,
+        saved: Optional[bool] = None,
+        liked: Optional[bool] = None,
+        disliked: Optional[bool] = None,
+        max_depth: Optional[int] = None,
+        unresolved: Optional[bool] = None,
+        where: Optional[Callable[[Any], bool]] = None,
+    ):
+        """Initialize a Filter.
+
+        :param sort: How the server should sort the results. This is only sent to
+        endpoints supporting it, translated to their sort type (e.g. `TopDay` is
+        `Top` for comments, and `Active` isn't sent), and is never evaluated
+        client-side.
+        :param type_: Only keep content of this listing type.
+        :param community_name: Only keep content from the community with this name.
+        :param saved: Only keep content that was (or wasn't) saved.
+        :param liked: Only keep content that was (or wasn't) upvoted.
+        :param disliked: Only keep content that was (or wasn't) downvoted.
+        :param max_depth: Only keep comments up to this depth.
+        :param unresolved: Only keep reports that are (or aren't) unresolved.
+        Conditions only apply to the kinds of content having them: e.g. with
+        `max_depth`, all posts are kept.
+        :param where: A function evaluated client-side on each object, after all
+        other conditions. Objects for which it returns `False` are dropped.
+        """
+        self.sort = sort
+        self.where = where
+        self.conditions: List[_Condition] = []
+
+        if type_ is not None:
+            self._add_type(ListingType(type_))
+        if community_name is not None:
+            self.conditions.append(
+                _Condition(
+                    "community_name",
+                    community_name,
+                    lambda v: v.community.name == community_name,
+                )
+            )
+        if saved is not None:
+            self._add_flag(
+                "saved_only",
+                lambda v: v.saved,
+                expected=saved,
+                views=(PostView, CommentView),
+            )
+        if liked is not None:
+            self._add_flag("liked_only", lambda v: v.my_vote == 1, expected=liked)
+        if disliked is not None:
+            self._add_flag(
+                "disliked_only", lambda v: v.my_vote == -1, expected=disliked
+            )
+        if max_depth is not None:
+            self.conditions.append(
+                _Condition(
+                    "max_depth",
+                    max_depth,
+                    # The path of a top-level comment is "0.<id>", which is depth 1.
+                    lambda v: v.comment.path.count(".") <= max_depth,
+                    views=(CommentView, CommentReportView),
+                )
+            )
+        if unresolved is not None:
+            self._add_flag(
+                "unresolved_only",
+                lambda v: not _report(v).resolved,
+                expected=unresolved,
+                views=(PostReportView, CommentReportView),
+            )
+
+    def _add_flag(
+        self,
+        param: str,
+        predicate: Callable[[Any], bool],
+        *,
+        expected,
+        views: Optional[Tuple[type, ...]] = None,
+    ):
+        # The API flags can only select the `True` case, the opposite is done locally.
+        if expected:
+            self.conditions.append(_Condition(param, True, predicate, views))
+        else:
+            self.conditions.append(
+                _Condition(None, None, lambda v: not predicate(v), views)
+            )
+
+    def _add_type(self, type_: ListingType):
+        predicates: Dict[ListingType, Callable[[Any], bool]] = {
+            ListingType.All: lambda _: True,
+            ListingType.Local: lambda v: v.community.local,
+            ListingType.Subscribed: lambda v: v.subscribed == "Subscribed",
+            ListingType.Community: lambda _: True,
+        }
+        self.conditions.append(_Condition("type_", type_.value, predicates[type_]))
+
+    def compile(
+        self, request_model: Type[BaseApiModel]
+    ) -> Tuple[Dict[str, Any], Callable[[Any], bool]]:
+        """Split this filter into request parameters and a client-side function.
+
+        :param request_model: The API model of the request, e.g.
+        [GetPosts](https://join-lemmy.org/api/interfaces/GetPosts.html).
+        :return: A dictionary with the parameters to add to the request, and a
+        function returning `True` for the objects that should be kept.
+        """
+        fields = request_model.model_fields
+        params: Dict[str, Any] = {}
+        if self.sort is not None and "sort" in fields:
+            sort = _sort_param(self.sort, fields["sort"].annotation)
+            if sort is not None:
+                params["sort"] = sort
+        local: List[_Condition] = []
+        for condition in self.conditions:
+            if condition.param is not None and condition.param in fields:
+                params[condition.param] = condition.value
+            else:
+                local.append(condition)
+
+        where = self.where
+
+        def predicate(item: Any) -> bool:
+            view = _view(item)
+            if not all(_holds(c, view) for c in local):
+                return False
+            return where is None or bool(where(item))
+
+        return params, predicate
+
+
+def compile_filters(
+    filters: Optional[Filter],
+    request_model: Type[BaseApiModel],
+    kwargs: Dict[str, Any],
+) -> Tuple[Dict[str, Any], Callable[[Any], bool]]:
+    """Merge an optional Filter with explicit request parameters.
+
+    :param filters: A Filter, or `None`.
+    :param request_model: The API model of the request.
+    :param kwargs: Request parameters given explicitly, which take precedence over
+    the ones coming from the filter.
+    :return: The merged request parameters, and a function returning `True` for the
+    objects that should be kept.
+    """
+    if filters is None:
+        return kwargs, lambda _: True
+    params, predicate = filters.compile(request_model)
+    return {**params, **kwargs}, predicate
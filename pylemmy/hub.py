@@ -0,0 +1,493 @@
+"""Implements a hub polling each source once, and fanning items out to subscribers."""
+
+import collections
+import pickle
+import struct
+import tempfile
+import threading
+import time
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+)
+
+from mypy_extensions import KwArg
+
+from pylemmy import api
+from pylemmy.models.comment import Comment
+from pylemmy.models.community import Community
+from pylemmy.models.post import Post
+from pylemmy.utils import StreamStats, StreamYielder
+
+POLICIES = ("block", "drop_oldest", "spill")
+"""What a [Subscription][pylemmy.hub.Subscription] does when its queue is full."""
+
+_LENGTH = struct.Struct(">I")
+
+
+class _Source:
+    def __init__(
+        self,
+        name: str,
+        results_fn: Callable[[KwArg(Any)], Iterable[Any]],
+        yielder: StreamYielder,
+        dumps: Callable[[Any], bytes],
+        loads: Callable[[bytes], Any],
+        function_kwargs: Dict[str, Any],
+    ):
+        self.name = name
+        self.results_fn = results_fn
+        self.yielder = yielder
+        self.dumps = dumps
+        self.loads = loads
+        self.function_kwargs = function_kwargs
+        self.error: Optional[Exception] = None
+
+
+class Subscription:
+    """A bounded queue of the items of a [StreamHub][pylemmy.hub.StreamHub].
+
+    Subscriptions are created by [subscribe][pylemmy.hub.StreamHub.subscribe], and
+    iterating over one yields its items until it is closed. When the queue is full,
+    the `policy` decides what happens to new items:
+
+    - `"block"`: the pollers wait until the subscriber catches up. This slows down
+    every subscriber of the same sources, but nothing is lost.
+    - `"drop_oldest"`: the oldest queued item is dropped.
+    - `"spill"`: new items are written to a temporary file, and read back in order
+    once the queue is drained.
+    """
+
+    def __init__(
+        self,
+        hub: "StreamHub",
+        sources: Sequence[str],
+        *,
+        max_size: int,
+        policy: str,
+        spill_dir: Optional[str],
+    ):
+        """Initialize a Subscription.
+
+        :param hub: The hub publishing the items.
+        :param sources: Names of the sources subscribed to.
+        :param max_size: Maximum number of items queued in memory.
+        :param policy: One of `"block"`, `"drop_oldest"` or `"spill"`.
+        :param spill_dir: Directory of the temporary file used by the `"spill"`
+        policy. Defaults to the system's temporary directory.
+        """
+        if policy not in POLICIES:
+            msg = f"Unknown policy {policy!r}, expected one of {POLICIES}."
+            raise ValueError(msg)
+        if max_size < 1:
+            msg = f"Need a positive max_size, got {max_size}."
+            raise ValueError(msg)
+        self.hub = hub
+        self.sources = list(sources)
+        self.max_size = max_size
+        self.policy = policy
+        self.spill_dir = spill_dir
+
+        self.delivered = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.closed = False
+
+        self._queue: Deque[Any] = collections.deque()
+        self._condition = threading.Condition()
+        self._spill_file: Optional[IO[bytes]] = None
+        # Number of items in the spill file, and offset of the next one to read.
+        self._spill_pending = 0
+        self._spill_offset = 0
+
+    def __len__(self) -> int:
+        """Number of items waiting, in memory and on disk."""
+        return len(self._queue) + self._spill_pending
+
+    def _put(self, source: _Source, item: Any):
+        with self._condition:
+            if self.policy == "block":
+                while len(self._queue) >= self.max_size and not self.closed:
+                    self._condition.wait()
+            if self.closed:
+                return
+            if self.policy == "spill" and (
+                self._spill_pending or len(self._queue) >= self.max_size
+            ):
+                self._spill(source, item)
+            else:
+                if len(self._queue) >= self.max_size:
+                    self._queue.popleft()
+                    self.dropped += 1
+                self._queue.append(item)
+            self._condition.notify_all()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """Take the oldest item, waiting for one if the queue is empty.
+
+        :param timeout: Maximum time (in seconds) to wait. By default, wait until an
+        item arrives or the subscription is closed.
+        :raise TimeoutError: If no item arrived in time.
+        :raise EOFError: If the subscription is closed and drained.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while not self._queue and not self._spill_pending:
+                if self.closed:
+                    msg = "The subscription is closed."
+                    raise EOFError(msg)
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    msg = f"No item arrived in {timeout} seconds."
+                    raise TimeoutError(msg)
+                self._condition.wait(remaining)
+            if not self._queue:
+                self._unspill()
+            item = self._queue.popleft()
+            self.delivered += 1
+            self._condition.notify_all()
+            return item
+
+    def __iter__(self) -> Generator[Any, None, None]:
+        """Yield the items, until the subscription is closed and drained."""
+        while True:
+            try:
+                yield self.get()
+            except EOFError:
+                return
+
+    def close(self):
+        """Stop receiving items. Items already queued can still be read.
+
+        The spill file is deleted once its items are read.
+        """
+        self.hub._unsubscribe(self)
+        with self._condition:
+            self.closed = True
+            if not self._spill_pending:
+                self._close_spill_file()
+            self._condition.notify_all()
+
+    def _spill(self, source: _Source, item: Any):
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(dir=self.spill_dir)
+        name = source.name.encode()
+        data = source.dumps(item)
+        self._spill_file.seek(0, 2)
+        self._spill_file.write(_LENGTH.pack(len(name)) + name)
+        self._spill_file.write(_LENGTH.pack(len(data)) + data)
+        self._spill_pending += 1
+        self.spilled += 1
+
+    def _unspill(self):
+        """Move up to `max_size` spilled items back to the in-memory queue."""
+        spill_file = self._spill_file
+        spill_file.seek(self._spill_offset)
+        while self._spill_pending and len(self._queue) < self.max_size:
+            (length,) = _LENGTH.unpack(spill_file.read(_LENGTH.size))
+            name = spill_file.read(length).decode()
+            (length,) = _LENGTH.unpack(spill_file.read(_LENGTH.size))
+            self._queue.append(self.hub._sources[name].loads(spill_file.read(length)))
+            self._spill_pending -= 1
+        self._spill_offset = spill_file.tell()
+        if not self._spill_pending:
+            spill_file.seek(0)
+            spill_file.truncate()
+            self._spill_offset = 0
+            if self.closed:
+                self._close_spill_file()
+
+    def _close_spill_file(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+
+class StreamHub:
+    """Polls each source once, and fans the new items out to all its subscribers.
+
+    Components each creating their own stream of the same community poll it once
+    per component, and each keep a copy of the keys seen. With a hub, a single
+    poller per source deduplicates the items, and subscribers get them through
+    their own bounded [Subscription][pylemmy.hub.Subscription]: the polling load
+    only depends on the number of sources.
+
+    Example:
+
+        hub = StreamHub()
+        hub.add_posts(lemmy.get_community("test"))
+        spam = hub.subscribe(policy="block")
+        archive = hub.subscribe(policy="spill", max_size=100)
+        with hub:
+            for post in spam:
+                check_spam(post)
+    """
+
+    def __init__(
+        self,
+        *,
+        min_wait_time: float = 1,
+        max_wait_time: float = 300,
+        skip_existing: bool = False,
+    ):
+        """Initialize a StreamHub.
+
+        :param min_wait_time: Minimum time (in seconds) between polls of a source.
+        :param max_wait_time: When a source has no new items, the time between its
+        polls increases, up to this time (in seconds).
+        :param skip_existing: If `True`, skip the items of the first poll of each
+        source, and only publish new ones.
+        """
+        self.min_wait_time = min_wait_time
+        self.max_wait_time = max_wait_time
+        self.skip_existing = skip_existing
+        # Statistics of each source, keyed by its name.
+        self.stats: Dict[str, StreamStats] = {}
+
+        self._sources: Dict[str, _Source] = {}
+        self._subscriptions: List[Subscription] = []
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def errors(self) -> Dict[str, Exception]:
+        """The last error of each source whose last poll failed."""
+        return {
+            name: source.error
+            for name, source in self._sources.items()
+            if source.error is not None
+        }
+
+    def add_source(
+        self,
+        name: str,
+        results_fn: Callable[[KwArg(Any)], Iterable[Any]],
+        unique_key_fn: Callable[[Any], str],
+        *,
+        filter_fn: Callable[[Any], bool] = lambda _: True,
+        published_fn: Optional[Callable[[Any], str]] = None,
+        dumps: Callable[[Any], bytes] = pickle.dumps,
+        loads: Callable[[bytes], Any] = pickle.loads,
+        **function_kwargs: Any,
+    ):
+        """Add a source to poll.
+
+        :param name: A unique name for the source.
+        :param results_fn: A function to call repeatedly, which outputs a list of
+        objects.
+        :param unique_key_fn: A function that takes an object and outputs a unique
+        id, used to publish each object once.
+        :param filter_fn: Only publish objects for which this function returns
+        `True`.
+        :param published_fn: A function that takes an object and outputs its
+        `published` time, used to measure the lag of the source in `stats`.
+        :param dumps: Serializes an object, for subscriptions spilling to disk.
+        :param loads: Deserializes an object serialized by `dumps`.
+        :param function_kwargs: Keyword parameters that are passed to the function.
+        """
+        if name in self._sources:
+            msg = f"There is already a source named {name!r}."
+            raise ValueError(msg)
+        stats = self.stats[name] = StreamStats()
+        yielder = StreamYielder(
+            skip_existing=self.skip_existing,
+            filter_fn=filter_fn,
+            unique_key_fn=unique_key_fn,
+            limit=None,
+            min_wait_time=self.min_wait_time,  # type: ignore[arg-type]
+            max_wait_time=self.max_wait_time,  # type: ignore[arg-type]
+            stats=stats,
+            published_fn=published_fn,
+        )
+        self._sources[name] = _Source(
+            name, results_fn, yielder, dumps, loads, function_kwargs
+        )
+        if self._threads:
+            self._start(self._sources[name])
+
+    def add_posts(
+        self, community: Community, *, name: Optional[str] = None, **kwargs
+    ) -> str:
+        """Add a source polling the Posts of a Community.
+
+        :param community: The Community.
+        :param name: Name of the source, `"posts/<community name>"` by default.
+        :param kwargs: See [add_source][pylemmy.hub.StreamHub.add_source], and
+        [get_posts][pylemmy.models.community.Community.get_posts].
+        :return: Name of the source.
+        """
+        lemmy = community.lemmy
+        if name is None:
+            name = f"posts/{community.safe.name}"
+        kwargs.setdefault("published_fn", lambda x: x.post_view.post.published)
+        kwargs.setdefault("dumps", lambda x: x.post_view.model_dump_json().encode())
+        kwargs.setdefault(
+            "loads",
+            lambda data: Post(lemmy, api.post.PostView.model_validate_json(data)),
+        )
+        self.add_source(
+            name,
+            community.get_posts,
+            lambda x: str(x.post_view.post.ap_id),
+            **kwargs,
+        )
+        return name
+
+    def add_comments(
+        self, community: Community, *, name: Optional[str] = None, **kwargs
+    ) -> str:
+        """Add a source polling the Comments of a Community.
+
+        :param community: The Community.
+        :param name: Name of the source, `"comments/<community name>"` by default.
+        :param kwargs: See [add_source][pylemmy.hub.StreamHub.add_source], and
+        [get_comments][pylemmy.models.community.Community.get_comments].
+        :return: Name of the source.
+        """
+        lemmy = community.lemmy
+        if name is None:
+            name = f"comments/{community.safe.name}"
+        kwargs.setdefault("published_fn", lambda x: x.comment_view.comment.published)
+        kwargs.setdefault("dumps", lambda x: x.comment_view.model_dump_json().encode())
+        kwargs.setdefault(
+            "loads",
+            lambda data: Comment(
+                lemmy, api.comment.CommentView.model_validate_json(data)
+            ),
+        )
+        self.add_source(
+            name,
+            community.get_comments,
+            lambda x: str(x.comment_view.comment.ap_id),
+            **kwargs,
+        )
+        return name
+
+    def subscribe(
+        self,
+        sources: Optional[Iterable[str]] = None,
+        *,
+        max_size: int = 1000,
+        policy: str = "block",
+        spill_dir: Optional[str] = None,
+    ) -> Subscription:
+        """Subscribe to the items of some sources, published from now on.
+
+        :param sources: Names of the sources. Defaults to all the sources, including
+        the ones added later.
+        :param max_size: Maximum number of items queued in memory.
+        :param policy: What to do with new items when the queue is full, one of
+        `"block"`, `"drop_oldest"` or `"spill"` (see
+        [Subscription][pylemmy.hub.Subscription]).
+        :param spill_dir: Directory of the temporary file used by the `"spill"`
+        policy.
+        """
+        names = list(sources) if sources is not None else []
+        for name in names:
+            if name not in self._sources:
+                msg = f"Unknown source {name!r}."
+                raise KeyError(msg)
+        subscription = Subscription(
+            self, names, max_size=max_size, policy=policy, spill_dir=spill_dir
+        )
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def _publish(self, source: _Source, item: Any):
+        with self._lock:
+            subscriptions = [
+                s
+                for s in self._subscriptions
+                if not s.sources or source.name in s.sources
+            ]
+        for subscription in subscriptions:
+            subscription._put(source, item)
+
+    def _poll(self, source: _Source) -> float:
+        """Poll a source once, and return the time to wait before the next poll."""
+        yielder = source.yielder
+        first_key = yielder.last_seen_key
+        # Any error (e.g. of `filter_fn`, or of `dumps` when spilling) is kept in
+        # `errors`, rather than stopping the poller of the source.
+        try:
+            results = source.results_fn(**source.function_kwargs)
+            for item in yielder.yield_results(results):
+                self._publish(source, item)
+        except Exception as e:
+            source.error = e
+        else:
+            source.error = None
+        return yielder.get_wait_time(first_key)
+
+    def poll_once(self):
+        """Poll every source once, in the calling thread."""
+        for source in list(self._sources.values()):
+            self._poll(source)
+
+    def _run(self, source: _Source):
+        while not self._stopping.is_set():
+            self._stopping.wait(self._poll(source))
+
+    def _start(self, source: _Source):
+        thread = threading.Thread(
+            target=self._run,
+            args=(source,),
+            name=f"pylemmy-hub-{source.name}",
+            daemon=True,
+        )
+        self._threads.append(thread)
+        thread.start()
+
+    def start(self):
+        """Start one polling thread per source."""
+        if self._threads:
+            return
+        self._stopping.clear()
+        for source in list(self._sources.values()):
+            self._start(source)
+
+    def stop(self):
+        """Stop the polling threads, and close the subscriptions.
+
+        Items already queued can still be read from the subscriptions.
+        """
+        self._stopping.set()
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def stats_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Get the current statistics of each source.
+
+        :return: A dictionary keyed by source name, with the snapshots of their
+        [StreamStats][pylemmy.utils.StreamStats].
+        """
+        return {name: stats.snapshot() for name, stats in self.stats.items()}
+
+    def __enter__(self) -> "StreamHub":
+        """Start the polling threads."""
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        """Stop the polling threads, and close the subscriptions."""
+        self.stop()
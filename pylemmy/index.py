@@ -0,0 +1,207 @@
+"""Implements a local full-text index over fetched Posts and Comments."""
+
+import sqlite3
+import threading
+from typing import Iterable, List, Optional, Union
+
+import pylemmy
+from pylemmy import api
+from pylemmy.models.comment import Comment
+from pylemmy.models.post import Post
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY,
+    community_id INTEGER NOT NULL,
+    published TEXT NOT NULL,
+    view TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(name, body);
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY,
+    post_id INTEGER NOT NULL,
+    community_id INTEGER NOT NULL,
+    published TEXT NOT NULL,
+    view TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5(content);
+"""
+
+
+class ContentIndex:
+    """A local full-text index of Posts and Comments, backed by SQLite FTS5.
+
+    The index stores the full views, so searches return
+    [Post][pylemmy.models.post.Post] and [Comment][pylemmy.models.comment.Comment]
+    instances without any requests to the Lemmy instance.
+    Since an instance of this class is callable, it can be passed directly as a
+    callback to the streams.
+
+    Example:
+
+        index = ContentIndex(lemmy, "content.db")
+        lemmy.multi_communities_stream(["test"]).content_apply(index, limit=100)
+        for post in index.search_posts("python"):
+            print(post.post_view.post.name)
+    """
+
+    def __init__(self, lemmy: "pylemmy.Lemmy", path: str = ":memory:"):
+        """Initialize a ContentIndex.
+
+        :param lemmy: A Lemmy instance, used to build the returned objects.
+        :param path: Path to the SQLite database file. By default the index is kept
+        in memory only.
+        """
+        self.lemmy = lemmy
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        try:
+            self._connection.executescript(_SCHEMA)
+        except sqlite3.OperationalError as e:
+            msg = "The SQLite library in use was compiled without FTS5 support."
+            raise RuntimeError(msg) from e
+
+    def __call__(self, item: Union[Post, Comment]):
+        """Add a Post or Comment to the index.
+
+        :param item: The Post or Comment to add.
+        """
+        self.add(item)
+
+    def add(self, item: Union[Post, Comment]):
+        """Add a Post or Comment to the index, replacing older versions of it.
+
+        :param item: The Post or Comment to add.
+        """
+        self.add_many([item])
+
+    def add_many(self, items: Iterable[Union[Post, Comment]]):
+        """Add several Posts and Comments to the index, in a single transaction.
+
+        :param items: The Posts and Comments to add.
+        """
+        with self._lock, self._connection:
+            for item in items:
+                if isinstance(item, Post):
+                    self._add_post(item.post_view)
+                elif isinstance(item, Comment):
+                    self._add_comment(item.comment_view)
+                else:
+                    msg = f"Can only index Posts and Comments, got {type(item)}."
+                    raise TypeError(msg)
+
+    def _add_post(self, view: api.post.PostView):
+        post = view.post
+        self._connection.execute(
+            "INSERT OR REPLACE INTO posts VALUES (?, ?, ?, ?)",
+            (post.id, post.community_id, post.published, view.model_dump_json()),
+        )
+        self._connection.execute("DELETE FROM posts_fts WHERE rowid = ?", (post.id,))
+        self._connection.execute(
+            "INSERT INTO posts_fts (rowid, name, body) VALUES (?, ?, ?)",
+            (post.id, post.name, post.body or ""),
+        )
+
+    def _add_comment(self, view: api.comment.CommentView):
+        comment = view.comment
+        self._connection.execute(
+            "INSERT OR REPLACE INTO comments VALUES (?, ?, ?, ?, ?)",
+            (
+                comment.id,
+                comment.post_id,
+                view.community.id,
+                comment.published,
+                view.model_dump_json(),
+            ),
+        )
+        self._connection.execute(
+            "DELETE FROM comments_fts WHERE rowid = ?", (comment.id,)
+        )
+        self._connection.execute(
+            "INSERT INTO comments_fts (rowid, content) VALUES (?, ?)",
+            (comment.id, comment.content),
+        )
+
+    def search_posts(
+        self, query: str, *, limit: int = 20, community_id: Optional[int] = None
+    ) -> List[Post]:
+        """Search the indexed Posts, in their name and body.
+
+        :param query: A full-text query, in [FTS5 syntax](
+        https://www.sqlite.org/fts5.html#full_text_query_syntax).
+        :param limit: Maximum number of Posts to return.
+        :param community_id: Only return Posts from this community.
+        :return: The matching Posts, best matches first.
+        """
+        sql = (
+            "SELECT posts.view FROM posts_fts JOIN posts ON posts.id = posts_fts.rowid "
+            "WHERE posts_fts MATCH ?"
+        )
+        params: List[Union[str, int]] = [query]
+        if community_id is not None:
+            sql += " AND posts.community_id = ?"
+            params.append(community_id)
+        sql += " ORDER BY posts_fts.rank LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+        return [
+            Post(self.lemmy, api.post.PostView.model_validate_json(view))
+            for (view,) in rows
+        ]
+
+    def search_comments(
+        self,
+        query: str,
+        *,
+        limit: int = 20,
+        community_id: Optional[int] = None,
+        post_id: Optional[int] = None,
+    ) -> List[Comment]:
+        """Search the indexed Comments, in their content.
+
+        :param query: A full-text query, in [FTS5 syntax](
+        https://www.sqlite.org/fts5.html#full_text_query_syntax).
+        :param limit: Maximum number of Comments to return.
+        :param community_id: Only return Comments from this community.
+        :param post_id: Only return Comments under this post.
+        :return: The matching Comments, best matches first.
+        """
+        sql = (
+            "SELECT comments.view FROM comments_fts "
+            "JOIN comments ON comments.id = comments_fts.rowid "
+            "WHERE comments_fts MATCH ?"
+        )
+        params: List[Union[str, int]] = [query]
+        if community_id is not None:
+            sql += " AND comments.community_id = ?"
+            params.append(community_id)
+        if post_id is not None:
+            sql += " AND comments.post_id = ?"
+            params.append(post_id)
+        sql += " ORDER BY comments_fts.rank LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+        return [
+            Comment(self.lemmy, api.comment.CommentView.model_validate_json(view))
+            for (view,) in rows
+        ]
+
+    def __len__(self) -> int:
+        """Total number of Posts and Comments in the index."""
+        with self._lock:
+            (posts,) = self._connection.execute("SELECT COUNT(*) FROM posts").fetchone()
+            (comments,) = self._connection.execute(
+                "SELECT COUNT(*) FROM comments"
+            ).fetchone()
+        return posts + comments
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._connection.close()
@@ -1,18 +1,70 @@
 """Implements the Lemmy class."""
 
+import asyncio
+import contextlib
+import json
+import threading
+import time
 import urllib.parse
-from typing import Iterable, List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 import requests
-from pydantic import AnyUrl, TypeAdapter
+from pydantic import AnyUrl
 
 from pylemmy import api
 from pylemmy.api.utils import BaseApiModel
+from pylemmy.cache import ResponseCache
 from pylemmy.endpoints import LemmyAPI
-from pylemmy.models.comment import Comment
+from pylemmy.filters import Filter, compile_filters
+from pylemmy.metrics import RequestEvent, RequestHooks
+from pylemmy.models.comment import Comment, CommentReport
 from pylemmy.models.community import Community, MultiCommunityStream
 from pylemmy.models.person import Person
-from pylemmy.models.post import Post
+from pylemmy.models.post import Post, PostReport
+from pylemmy.transport import (
+    RequestsTransport,
+    Response,
+    Transport,
+    create_session,
+)
+from pylemmy.utils import (
+    AsyncSingleFlight,
+    BatchResult,
+    LRUCache,
+    RateLimiter,
+    SingleFlight,
+    get_many,
+    paginate,
+    run_concurrently,
+    stream_generator,
+)
+
+K = TypeVar("K")
+T = TypeVar("T")
+
+if TYPE_CHECKING:
+    from pylemmy.cassette import RecordingTransport, ReplayTransport
+
+
+def _payload(params: Union[BaseApiModel, Dict[str, Any], None]) -> Dict[str, Any]:
+    if params is None:
+        return {}
+    return params if isinstance(params, dict) else params.dict()
 
 
 class Lemmy:
@@ -31,6 +83,9 @@ class Lemmy:
             password="lemmylemmy",
             user_agent="custom user-agent (by u/USERNAME)",
         )
+
+    A client can be used from several threads: logging in happens once, and the
+    caches and connection pools are shared.
     """
 
     def __init__(
@@ -40,6 +95,21 @@ class Lemmy:
         password: Optional[str],
         user_agent: str,
         request_timeout: int = 30,
+        *,
+        requests_per_second: Optional[float] = None,
+        burst: int = 1,
+        entity_cache_size: int = 0,
+        coalesce_requests: bool = True,
+        response_cache: Optional[ResponseCache] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        keep_alive: bool = True,
+        session: Optional[requests.Session] = None,
+        transport: Optional[Transport] = None,
+        hooks: Sequence[RequestHooks] = (),
+        max_workers: int = 8,
     ):
         """Initialize a Lemmy instance.
 
@@ -48,22 +118,163 @@ class Lemmy:
         :param password: Your Lemmy password
         :param user_agent: The user agent the requests will use.
         :param request_timeout: A maximum timeout to wait for requests (in seconds).
+        :param requests_per_second: If set, limit the rate of requests sent to the
+        instance, across all threads using this client.
+        :param burst: Maximum number of requests that can be sent back-to-back when
+        `requests_per_second` is set.
+        :param entity_cache_size: If positive, keep up to this many Posts, Comments,
+        Persons and Communities (each) fetched by id, so that the batch methods like
+        [get_posts_by_id][pylemmy.lemmy.Lemmy.get_posts_by_id] don't fetch them again.
+        :param coalesce_requests: If `True`, identical GET requests made at the same
+        time (e.g. from different threads) share a single request to the instance.
+        :param response_cache: A [ResponseCache][pylemmy.cache.ResponseCache] for the
+        responses of GET requests. Responses aren't cached by default.
+        :param connect_timeout: Timeout (in seconds) to establish a connection.
+        Defaults to `request_timeout`.
+        :param read_timeout: Timeout (in seconds) to wait for the server to send
+        data. Defaults to `request_timeout`.
+        :param pool_connections: Number of hosts to keep connection pools for.
+        :param pool_maxsize: Maximum number of connections kept open to each host.
+        Set this to at least the number of threads using this client.
+        :param keep_alive: If `False`, close connections after each request.
+        :param session: A session to send requests with, e.g. created by
+        [create_session][pylemmy.transport.create_session] and shared with other
+        clients. When given, the pool and keep-alive options are ignored, and all
+        threads use this session.
+        :param transport: A [Transport][pylemmy.transport.Transport] to send requests
+        with, e.g. a [FakeTransport][pylemmy.transport.FakeTransport] for tests and
+        benchmarks. When given, the session, pool and keep-alive options are ignored.
+        Defaults to a [RequestsTransport][pylemmy.transport.RequestsTransport].
+        :param hooks: [RequestHooks][pylemmy.metrics.RequestHooks] called around each
+        request, e.g. [Metrics][pylemmy.metrics.Metrics].
+        :param max_workers: Number of threads of the pool used by
+        [map][pylemmy.lemmy.Lemmy.map].
         """
         self.lemmy_url = (
-            lemmy_url
-            if isinstance(lemmy_url, AnyUrl)
-            else TypeAdapter(AnyUrl).validate_python(lemmy_url)
+            lemmy_url if isinstance(lemmy_url, AnyUrl) else AnyUrl(lemmy_url)
         )
         self.username = username
         self.password = password
         self.user_agent = user_agent
 
         self.request_timeout = request_timeout
+        self.timeout: Tuple[float, float] = (
+            request_timeout if connect_timeout is None else connect_timeout,
+            request_timeout if read_timeout is None else read_timeout,
+        )
+        self.rate_limiter = (
+            RateLimiter(requests_per_second, burst)
+            if requests_per_second is not None
+            else None
+        )
+
+        self.entity_caches: Dict[str, LRUCache[int, Any]] = {
+            kind: LRUCache(entity_cache_size)
+            for kind in ("post", "comment", "person", "community")
+        }
+
+        self.single_flight = SingleFlight() if coalesce_requests else None
+        self.async_single_flight = AsyncSingleFlight() if coalesce_requests else None
+        self.response_cache = response_cache
 
         self._login_response: Optional[api.auth.LoginResponse] = None
+        self._login_lock = threading.Lock()
+
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+        # Only the transport (and session) created here is closed by `close`.
+        self._owns_transport = transport is None and session is None
+        if transport is None:
+            if session is None:
+                transport = RequestsTransport(
+                    create_session(
+                        pool_connections=pool_connections,
+                        pool_maxsize=pool_maxsize,
+                        keep_alive=keep_alive,
+                    )
+                )
+            else:
+                transport = RequestsTransport(session)
+        self.transport = transport
+        self.hooks = list(hooks)
+        # The session of the default transport, kept for backwards compatibility.
+        self.session: Optional[requests.Session] = (
+            transport.session if isinstance(transport, RequestsTransport) else None
+        )
+
+    def _headers(self, token: Optional[str]) -> Dict[str, str]:
+        # The user agent is set on each request, since the session may be shared.
+        headers = {"User-Agent": self.user_agent}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        return headers
+
+    def connection_stats(self) -> Dict[str, int]:
+        """Count the connections opened to the instance, and how often they're reused.
+
+        :return: A dictionary with the number of `connections` opened, `requests`
+        sent, and `reused` connections. If the session wasn't created by
+        [create_session][pylemmy.transport.create_session], or requests don't go
+        through a [RequestsTransport][pylemmy.transport.RequestsTransport], the
+        counts are zero. Counts include all clients sharing the same session.
+        """
+        if isinstance(self.transport, RequestsTransport):
+            return self.transport.connection_stats(str(self.lemmy_url))
+        return {"connections": 0, "requests": 0, "reused": 0}
+
+    @contextlib.contextmanager
+    def record(self, path: str) -> Generator["RecordingTransport", None, None]:
+        """Record the requests sent by this client to a cassette file.
+
+        Example:
+
+            with lemmy.record("community.jsonl.gz") as recorder:
+                posts = lemmy.get_community("test").get_posts()
+            print(recorder.recorded, "requests recorded")
+
+        :param path: Path to the cassette file, which is overwritten.
+        """
+        transport = self.transport
+        login_response = self._login_response
+        from pylemmy.cassette import RecordingTransport
+
+        recorder = RecordingTransport(transport, path)
+        self.transport = recorder
+        try:
+            yield recorder
+        finally:
+            self.transport = transport
+            self._login_response = login_response
+            recorder.close()
 
-        self.session = requests.Session()
-        self.session.headers.update({"User-Agent": self.user_agent})
+    @contextlib.contextmanager
+    def replay(
+        self, path: str, *, realtime: bool = False, speed: float = 1
+    ) -> Generator["ReplayTransport", None, None]:
+        """Answer the requests of this client from a cassette file, offline.
+
+        See [ReplayTransport][pylemmy.cassette.ReplayTransport].
+
+        :param path: Path to a cassette file, created by
+        [record][pylemmy.lemmy.Lemmy.record].
+        :param realtime: If `True`, wait as long as each response originally took.
+        :param speed: When replaying in real time, how many times faster than the
+        original responses to answer.
+        """
+        transport = self.transport
+        # A login replayed from the cassette has a fake token, only valid inside.
+        login_response = self._login_response
+        from pylemmy.cassette import ReplayTransport
+
+        replayer = ReplayTransport(path, realtime=realtime, speed=speed)
+        self.transport = replayer
+        try:
+            yield replayer
+        finally:
+            self.transport = transport
+            self._login_response = login_response
 
     def _get_url(self, path: LemmyAPI):
         return urllib.parse.urljoin(str(self.lemmy_url), path.value)
@@ -74,15 +285,19 @@ class Lemmy:
         If the user is already logged in, return the response to the original login
         request, with the session information.
         """
-        if self._login_response is None:
+        if self._login_response is not None:
+            return self._login_response
+        with self._login_lock:
+            if self._login_response is not None:  # another thread logged in
+                return self._login_response
             if self.username is not None and self.password is not None:
-                response = self.post_request(
+                parsed_response = self.post_request(
                     LemmyAPI.Login,
                     params=api.auth.Login(
                         username_or_email=self.username, password=self.password
                     ),
+                    response_model=api.auth.LoginResponse,
                 )
-                parsed_response = api.auth.LoginResponse(**response)
                 if parsed_response.jwt is None:
                     msg = "Couldn't login! Have you verified your email?"
                     raise RuntimeError(msg)
@@ -121,9 +336,14 @@ class Lemmy:
         else:
             raise ValueError()
 
-        result = self.get_request(LemmyAPI.Community, params=payload)
-        parsed_result = api.community.GetCommunityResponse(**result)
-        return Community(self, parsed_result.community_view)
+        parsed_result = self.get_request(
+            LemmyAPI.Community,
+            params=payload,
+            response_model=api.community.GetCommunityResponse,
+        )
+        community_obj = Community(self, parsed_result.community_view)
+        self.entity_caches["community"].set(community_obj.safe.id, community_obj)
+        return community_obj
 
     def create_community(self, name: str, title: str, **kwargs) -> Community:
         """Create a community with the given name and title.
@@ -135,22 +355,40 @@ class Lemmy:
         """
         self.get_token()
         payload = api.community.CreateCommunity(name=name, title=title, **kwargs)
-        result = self.post_request(LemmyAPI.Community, params=payload)
-        parsed_result = api.community.CommunityResponse(**result)
+        parsed_result = self.post_request(
+            LemmyAPI.Community,
+            params=payload,
+            response_model=api.community.CommunityResponse,
+        )
 
         return Community(self, parsed_result.community_view)
 
-    def list_communities(self, **kwargs) -> List[Community]:
+    def list_communities(
+        self, filters: Optional[Filter] = None, **kwargs
+    ) -> List[Community]:
         """List the communities in the current Lemmy instance.
 
+        :param filters: A [Filter][pylemmy.filters.Filter] for the communities.
+        Conditions are evaluated on their [CommunityView](
+        https://join-lemmy.org/api/interfaces/CommunityView.html).
         :param kwargs: See optional arguments in [ListCommunities](
         https://join-lemmy.org/api/interfaces/ListCommunities.html).
         """
-        payload = api.community.ListCommunities(**kwargs)
-        result = self.get_request(LemmyAPI.ListCommunities, params=payload)
-        parsed_result = api.community.ListCommunitiesResponse(**result)
+        params, predicate = compile_filters(
+            filters, api.community.ListCommunities, kwargs
+        )
+        payload = api.community.ListCommunities(**params)
+        parsed_result = self.get_request(
+            LemmyAPI.ListCommunities,
+            params=payload,
+            response_model=api.community.ListCommunitiesResponse,
+        )
 
-        return [Community(self, view) for view in parsed_result.communities]
+        return [
+            Community(self, view)
+            for view in parsed_result.communities
+            if predicate(view)
+        ]
 
     def get_comment(self, comment_id: Optional[int] = None) -> Comment:
         """Get a comment from its id.
@@ -163,10 +401,13 @@ class Lemmy:
             msg = "Need to give a comment id."
             raise ValueError(msg)
 
-        result = self.get_request(LemmyAPI.Comment, params=payload)
-        parsed_result = api.comment.CommentResponse(**result)
+        parsed_result = self.get_request(
+            LemmyAPI.Comment, params=payload, response_model=api.comment.CommentResponse
+        )
 
-        return Comment(self, parsed_result.comment_view)
+        comment = Comment(self, parsed_result.comment_view)
+        self.entity_caches["comment"].set(comment_id, comment)
+        return comment
 
     def get_person_details(self, person_id=None, username=None) -> Person:
         """Get a user from its id or username.
@@ -182,12 +423,17 @@ class Lemmy:
             msg = "Need to give a person_id or username."
             raise ValueError(msg)
 
-        result = self.get_request(LemmyAPI.Person, params=payload)
-        parsed_result = api.person.GetPersonDetailsResponse(**result)
+        parsed_result = self.get_request(
+            LemmyAPI.Person,
+            params=payload,
+            response_model=api.person.GetPersonDetailsResponse,
+        )
 
-        return Person(
+        person = Person(
             self, parsed_result.person_view.counts, parsed_result.person_view.person
         )
+        self.entity_caches["person"].set(person.safe.id, person)
+        return person
 
     def get_post(
         self, *, post_id: Optional[int] = None, comment_id: Optional[int] = None
@@ -205,95 +451,563 @@ class Lemmy:
             msg = "Need to give either a post id or a comment id."
             raise ValueError(msg)
 
-        result = self.get_request(LemmyAPI.Post, params=payload)
-        parsed_result = api.post.GetPostResponse(**result)
+        parsed_result = self.get_request(
+            LemmyAPI.Post, params=payload, response_model=api.post.GetPostResponse
+        )
+
+        post = Post(self, parsed_result.post_view)
+        self.entity_caches["post"].set(post.post_view.post.id, post)
+        return post
+
+    def _get_many_by_id(
+        self, kind: str, fetch_fn, ids: Iterable[int], max_workers: int
+    ) -> List[BatchResult]:
+        self.get_token_optional()  # login once, before the concurrent requests
+        return get_many(
+            fetch_fn, ids, cache=self.entity_caches[kind], max_workers=max_workers
+        )
 
-        return Post(self, parsed_result.post_view)
+    def get_posts_by_id(
+        self, post_ids: Iterable[int], *, max_workers: int = 8
+    ) -> List[BatchResult]:
+        """Get many posts from their ids, concurrently.
 
-    def list_post_reports(self, **kwargs) -> List[api.post.PostReportView]:
+        Repeated ids are only fetched once, and so are the ids already in the entity
+        cache (see `entity_cache_size`).
+
+        Example:
+
+            results = lemmy.get_posts_by_id([1, 2, 3])
+            posts = [r.value for r in results if r.ok]
+
+        :param post_ids: Ids of the posts.
+        :param max_workers: Maximum number of concurrent requests.
+        :return: One [BatchResult][pylemmy.utils.BatchResult] per id, in the same
+        order, with either the Post or the error raised while fetching it.
+        """
+        return self._get_many_by_id(
+            "post", lambda i: self.get_post(post_id=i), post_ids, max_workers
+        )
+
+    def get_comments_by_id(
+        self, comment_ids: Iterable[int], *, max_workers: int = 8
+    ) -> List[BatchResult]:
+        """Get many comments from their ids, concurrently.
+
+        See [get_posts_by_id][pylemmy.lemmy.Lemmy.get_posts_by_id].
+
+        :param comment_ids: Ids of the comments.
+        :param max_workers: Maximum number of concurrent requests.
+        """
+        return self._get_many_by_id(
+            "comment", self.get_comment, comment_ids, max_workers
+        )
+
+    def get_persons_by_id(
+        self, person_ids: Iterable[int], *, max_workers: int = 8
+    ) -> List[BatchResult]:
+        """Get many users from their ids, concurrently.
+
+        See [get_posts_by_id][pylemmy.lemmy.Lemmy.get_posts_by_id].
+
+        :param person_ids: Ids of the users.
+        :param max_workers: Maximum number of concurrent requests.
+        """
+        return self._get_many_by_id(
+            "person",
+            lambda i: self.get_person_details(person_id=i),
+            person_ids,
+            max_workers,
+        )
+
+    def get_communities_by_id(
+        self, community_ids: Iterable[int], *, max_workers: int = 8
+    ) -> List[BatchResult]:
+        """Get many communities from their ids, concurrently.
+
+        See [get_posts_by_id][pylemmy.lemmy.Lemmy.get_posts_by_id].
+
+        :param community_ids: Ids of the communities.
+        :param max_workers: Maximum number of concurrent requests.
+        """
+        return self._get_many_by_id(
+            "community", self.get_community, community_ids, max_workers
+        )
+
+    def list_post_reports(
+        self, filters: Optional[Filter] = None, **kwargs
+    ) -> List[api.post.PostReportView]:
         """List post reports.
 
+        :param filters: A [Filter][pylemmy.filters.Filter] for the reports.
         :param kwargs: See optional arguments in [ListPostReports](
         https://join-lemmy.org/api/interfaces/ListPostReports.html).
         """
         self.get_token()
-        payload = api.post.ListPostReports(**kwargs)
-        result = self.get_request(LemmyAPI.ListPostReports, params=payload)
-        parsed_result = api.post.ListPostReportsResponse(**result)
+        params, predicate = compile_filters(filters, api.post.ListPostReports, kwargs)
+        payload = api.post.ListPostReports(**params)
+        parsed_result = self.get_request(
+            LemmyAPI.ListPostReports,
+            params=payload,
+            response_model=api.post.ListPostReportsResponse,
+        )
 
-        return parsed_result.post_reports
+        return [r for r in parsed_result.post_reports if predicate(r)]
 
-    def list_comment_reports(self, **kwargs) -> List[api.comment.CommentReportView]:
+    def list_comment_reports(
+        self, filters: Optional[Filter] = None, **kwargs
+    ) -> List[api.comment.CommentReportView]:
         """List comment reports.
 
+        :param filters: A [Filter][pylemmy.filters.Filter] for the reports.
         :param kwargs: See optional arguments in [ListCommentReports](
         https://join-lemmy.org/api/interfaces/ListCommentReports.html).
         """
         self.get_token()
-        payload = api.comment.ListCommentReports(**kwargs)
-        result = self.get_request(LemmyAPI.ListPostReports, params=payload)
-        parsed_result = api.comment.ListCommentReportsResponse(**result)
+        params, predicate = compile_filters(
+            filters, api.comment.ListCommentReports, kwargs
+        )
+        payload = api.comment.ListCommentReports(**params)
+        parsed_result = self.get_request(
+            LemmyAPI.ListCommentReports,
+            params=payload,
+            response_model=api.comment.ListCommentReportsResponse,
+        )
+
+        return [r for r in parsed_result.comment_reports if predicate(r)]
+
+    def iter_communities(
+        self, filters: Optional[Filter] = None, *, limit: Optional[int] = None, **kwargs
+    ) -> Generator[Community, None, None]:
+        """Iterate through the communities of the instance, page after page.
+
+        See [paginate][pylemmy.utils.paginate].
+
+        :param filters: A [Filter][pylemmy.filters.Filter] for the communities.
+        :param limit: Maximum number of communities.
+        :param kwargs: See optional arguments in [ListCommunities](
+        https://join-lemmy.org/api/interfaces/ListCommunities.html), except `page`.
+        """
+        params, predicate = compile_filters(
+            filters, api.community.ListCommunities, kwargs
+        )
+
+        def page_fn(**page_params) -> Tuple[List[Any], None]:
+            parsed_result = self.get_request(
+                LemmyAPI.ListCommunities,
+                params=api.community.ListCommunities(**page_params),
+                response_model=api.community.ListCommunitiesResponse,
+            )
+            return parsed_result.communities, None
+
+        views = paginate(
+            page_fn,
+            lambda x: str(x.community.actor_id),
+            filter_fn=predicate,
+            limit=limit,
+            **params,
+        )
+        return (Community(self, view) for view in views)
+
+    def iter_post_reports(
+        self, filters: Optional[Filter] = None, *, limit: Optional[int] = None, **kwargs
+    ) -> Generator[api.post.PostReportView, None, None]:
+        """Iterate through the post reports, page after page.
+
+        See [paginate][pylemmy.utils.paginate].
+
+        :param filters: A [Filter][pylemmy.filters.Filter] for the reports.
+        :param limit: Maximum number of reports.
+        :param kwargs: See optional arguments in [ListPostReports](
+        https://join-lemmy.org/api/interfaces/ListPostReports.html), except `page`.
+        """
+        params, predicate = compile_filters(filters, api.post.ListPostReports, kwargs)
+        return paginate(
+            lambda **kw: (self.list_post_reports(**kw), None),
+            lambda x: str(x.post_report.id),
+            filter_fn=predicate,
+            limit=limit,
+            **params,
+        )
+
+    def iter_comment_reports(
+        self, filters: Optional[Filter] = None, *, limit: Optional[int] = None, **kwargs
+    ) -> Generator[api.comment.CommentReportView, None, None]:
+        """Iterate through the comment reports, page after page.
+
+        See [paginate][pylemmy.utils.paginate].
+
+        :param filters: A [Filter][pylemmy.filters.Filter] for the reports.
+        :param limit: Maximum number of reports.
+        :param kwargs: See optional arguments in [ListCommentReports](
+        https://join-lemmy.org/api/interfaces/ListCommentReports.html), except
+        `page`.
+        """
+        params, predicate = compile_filters(
+            filters, api.comment.ListCommentReports, kwargs
+        )
+        return paginate(
+            lambda **kw: (self.list_comment_reports(**kw), None),
+            lambda x: str(x.comment_report.id),
+            filter_fn=predicate,
+            limit=limit,
+            **params,
+        )
+
+    def post_reports_stream(self, **kwargs) -> Generator[PostReport, None, None]:
+        """Get a stream of Post reports.
+
+        Only unresolved reports are streamed, unless `unresolved_only=False` is given.
+
+        Example:
+
+            for report in lemmy.post_reports_stream():
+                if is_spam(report.report_view.post):
+                    report.resolve(resolved=True)
+
+        :param kwargs: See the optional arguments in
+        [stream_generator][pylemmy.utils.stream_generator] and
+        [list_post_reports][pylemmy.lemmy.Lemmy.list_post_reports].
+        """
+        kwargs.setdefault("unresolved_only", True)
+        return stream_generator(
+            lambda **kw: [PostReport(self, r) for r in self.list_post_reports(**kw)],
+            lambda x: str(x.report_view.post_report.id),
+            **kwargs,
+        )
+
+    def comment_reports_stream(self, **kwargs) -> Generator[CommentReport, None, None]:
+        """Get a stream of Comment reports.
+
+        Only unresolved reports are streamed, unless `unresolved_only=False` is given.
+
+        :param kwargs: See the optional arguments in
+        [stream_generator][pylemmy.utils.stream_generator] and
+        [list_comment_reports][pylemmy.lemmy.Lemmy.list_comment_reports].
+        """
+        kwargs.setdefault("unresolved_only", True)
+        return stream_generator(
+            lambda **kw: [
+                CommentReport(self, r) for r in self.list_comment_reports(**kw)
+            ],
+            lambda x: str(x.report_view.comment_report.id),
+            **kwargs,
+        )
+
+    def resolve_many(
+        self,
+        reports: Sequence[Union[PostReport, CommentReport]],
+        *,
+        resolved: bool = True,
+        max_workers: int = 8,
+    ) -> List[BatchResult]:
+        """Resolve many reports concurrently.
+
+        The requests respect the client's rate limit, if one was set. A failure to
+        resolve a report doesn't stop the others from being resolved.
+
+        Example:
+
+            reports = [PostReport(lemmy, r) for r in lemmy.list_post_reports()]
+            for result in lemmy.resolve_many(reports):
+                if not result.ok:
+                    print(result.key.report_view.post_report.id, result.error)
+
+        :param reports: The reports to resolve.
+        :param resolved: Either resolve or unresolve the reports.
+        :param max_workers: Maximum number of concurrent requests.
+        :return: One [BatchResult][pylemmy.utils.BatchResult] per report, in the same
+        order, whose `key` is the report and `value` the updated report.
+        """
+        if len(reports) > 0:
+            self.get_token_optional()  # login once, before the concurrent requests
+        return run_concurrently(
+            lambda r: r.resolve(resolved=resolved), reports, max_workers=max_workers
+        )
+
+    def map(self, fn: Callable[[K], T], items: Iterable[K]) -> List[BatchResult[K, T]]:
+        """Call a function for each item, concurrently, in the client's thread pool.
+
+        The pool has `max_workers` threads, and is reused across calls until the
+        client is closed. `fn` must not call `map` itself, which could wait forever
+        for a thread.
+
+        Example:
+
+            communities = [lemmy.get_community(name) for name in names]
+            results = lemmy.map(lambda c: c.get_posts(limit=10), communities)
+            posts = [p for r in results if r.ok for p in r.value]
+
+        :param fn: Function to call for each item.
+        :param items: The inputs of the function.
+        :return: One result per item, in the same order as `items`, with either the
+        value returned or the exception raised.
+        """
+        self.get_token_optional()  # login once, before the concurrent requests
+        return run_concurrently(fn, items, executor=self._get_executor())
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="pylemmy"
+                )
+            return self._executor
 
-        return parsed_result.comment_reports
+    def close(self):
+        """Stop the thread pool, and close the connections the client opened.
+
+        A transport or session given to the client isn't closed, since it may be
+        shared.
+        """
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        if self._owns_transport:
+            self.transport.close()
+
+    def __enter__(self) -> "Lemmy":
+        """Use the client until the end of the context."""
+        return self
+
+    def __exit__(self, *args):
+        """Close the client."""
+        self.close()
 
     def post_request(
         self,
         path: LemmyAPI,
-        params: Optional[BaseApiModel] = None,
+        params: Union[BaseApiModel, Dict[str, Any], None] = None,
+        *,
+        response_model: Optional[Type[BaseApiModel]] = None,
     ):
         """Send a POST request to the desired path.
 
         :param path: A Lemmy endpoint.
-        :param params: Parameters to send with the request (in the body).
+        :param params: Parameters to send with the request (in the body), as a model
+        or a dictionary.
+        :param response_model: If given, validate the response with this model, and
+        return it instead of the raw JSON data.
         """
         token = None if path is LemmyAPI.Login else self.get_token_optional()
-        response = self.session.post(
-            self._get_url(path),
-            json=params.dict() if params is not None else {},
-            headers={"Authorization": f"Bearer {token}" if token else None},
-            timeout=self.request_timeout,
-        )
-        response.raise_for_status()
-        return response.json()
+        result = self._send("POST", path, token, json=_payload(params))
+        if self.response_cache is not None:
+            self.response_cache.invalidate_after_write(path)
+        return self._validate("POST", path, response_model, result)
 
     def get_request(
         self,
         path: LemmyAPI,
-        params: Optional[BaseApiModel] = None,
+        params: Union[BaseApiModel, Dict[str, Any], None] = None,
+        *,
+        response_model: Optional[Type[BaseApiModel]] = None,
     ):
         """Send a GET request to the desired path.
 
         :param path: A Lemmy endpoint.
-        :param params: Parameters to send with the request (in the URL).
+        :param params: Parameters to send with the request (in the URL), as a model
+        or a dictionary.
+        :param response_model: If given, validate the response with this model, and
+        return it instead of the raw JSON data.
         """
         token = self.get_token_optional()
-        response = self.session.get(
-            self._get_url(path),
-            params=params.dict() if params is not None else {},
-            headers={"Authorization": f"Bearer {token}" if token else None},
-            timeout=self.request_timeout,
+        payload = _payload(params)
+        if self.response_cache is not None and self.response_cache.caches(path):
+            result = self.response_cache.get_or_fetch(
+                path, payload, token, lambda: self._coalesced_get(path, payload, token)
+            )
+        else:
+            result = self._coalesced_get(path, payload, token)
+        return self._validate("GET", path, response_model, result)
+
+    def _coalesced_get(
+        self, path: LemmyAPI, payload: Dict[str, Any], token: Optional[str]
+    ):
+        if self.single_flight is None:
+            return self._send_get(path, payload, token)
+        return self.single_flight.do(
+            self._request_key(path, payload, token),
+            lambda: self._send_get(path, payload, token),
         )
-        response.raise_for_status()
-        return response.json()
+
+    async def get_request_async(
+        self,
+        path: LemmyAPI,
+        params: Union[BaseApiModel, Dict[str, Any], None] = None,
+        *,
+        response_model: Optional[Type[BaseApiModel]] = None,
+    ):
+        """Send a GET request to the desired path, without blocking the event loop.
+
+        :param path: A Lemmy endpoint.
+        :param params: Parameters to send with the request (in the URL), as a model
+        or a dictionary.
+        :param response_model: If given, validate the response with this model, and
+        return it instead of the raw JSON data.
+        """
+        loop = asyncio.get_running_loop()
+        if self.response_cache is not None and self.response_cache.caches(path):
+            # The cache may block, e.g. on its SQLite file.
+            return await loop.run_in_executor(
+                None,
+                lambda: self.get_request(path, params, response_model=response_model),
+            )
+
+        token = self.get_token_optional()
+        payload = _payload(params)
+        if self.async_single_flight is None:
+            result = await self._send_get_async(path, payload, token)
+        else:
+            # Futures can't be shared across event loops, so the loop is in the key.
+            result = await self.async_single_flight.do(
+                (id(loop), self._request_key(path, payload, token)),
+                lambda: self._send_get_async(path, payload, token),
+            )
+        return self._validate("GET", path, response_model, result)
+
+    def coalescing_stats(self) -> Dict[str, int]:
+        """Count the GET requests sent, and the ones saved by coalescing them.
+
+        :return: A dictionary with the number of `requests` sent to the instance,
+        and the number of `shared` requests, that reused another one's response.
+        """
+        if self.single_flight is None or self.async_single_flight is None:
+            return {"requests": 0, "shared": 0}
+        return {
+            "requests": self.single_flight.calls + self.async_single_flight.calls,
+            "shared": self.single_flight.shared + self.async_single_flight.shared,
+        }
+
+    @staticmethod
+    def _request_key(path: LemmyAPI, payload: Dict[str, Any], token: Optional[str]):
+        return path.value, json.dumps(payload, sort_keys=True, default=str), token
+
+    def _send_get(self, path: LemmyAPI, payload: Dict[str, Any], token: Optional[str]):
+        return self._send("GET", path, token, params=payload)
+
+    def _send(
+        self,
+        method: str,
+        path: LemmyAPI,
+        token: Optional[str],
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+    ):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        url = self._get_url(path)
+        event = self._start_event(method, path, url)
+        try:
+            response = self.transport.request(
+                method,
+                url,
+                params=params,
+                json=json,
+                headers=self._headers(token),
+                timeout=self.timeout,
+            )
+        except Exception as e:
+            self._fail_event(event, e)
+            raise
+        return self._read_response(event, response)
+
+    async def _send_get_async(
+        self, path: LemmyAPI, payload: Dict[str, Any], token: Optional[str]
+    ):
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async()
+        url = self._get_url(path)
+        event = self._start_event("GET", path, url)
+        try:
+            response = await self.transport.request_async(
+                "GET",
+                url,
+                params=payload,
+                headers=self._headers(token),
+                timeout=self.timeout,
+            )
+        except Exception as e:
+            self._fail_event(event, e)
+            raise
+        return self._read_response(event, response)
+
+    def _start_event(
+        self, method: str, path: LemmyAPI, url: str
+    ) -> Optional[RequestEvent]:
+        if not self.hooks:
+            return None
+        event = RequestEvent(method, path, url)
+        for hook in self.hooks:
+            hook.on_request(event)
+        return event
+
+    def _fail_event(self, event: Optional[RequestEvent], error: Exception):
+        if event is not None:
+            for hook in self.hooks:
+                hook.on_error(event, error)
+
+    def _read_response(self, event: Optional[RequestEvent], response: Response):
+        if event is None:
+            response.raise_for_status()
+            return response.json()
+
+        event.network_seconds = time.perf_counter() - event.started
+        event.status = response.status_code
+        event.response_bytes = len(response.content)
+        try:
+            response.raise_for_status()
+        except Exception as e:
+            for hook in self.hooks:
+                hook.on_response(event)
+            self._fail_event(event, e)
+            raise
+        start = time.perf_counter()
+        result = response.json()
+        event.decode_seconds = time.perf_counter() - start
+        for hook in self.hooks:
+            hook.on_response(event)
+        return result
+
+    def _validate(
+        self,
+        method: str,
+        path: LemmyAPI,
+        response_model: Optional[Type[BaseApiModel]],
+        result: Any,
+    ):
+        if response_model is None:
+            return result
+        if not self.hooks:
+            return response_model(**result)
+        start = time.perf_counter()
+        parsed = response_model(**result)
+        seconds = time.perf_counter() - start
+        for hook in self.hooks:
+            hook.on_validate(method, path, seconds)
+        return parsed
 
     def put_request(
         self,
         path: LemmyAPI,
-        params: Optional[BaseApiModel] = None,
+        params: Union[BaseApiModel, Dict[str, Any], None] = None,
+        *,
+        response_model: Optional[Type[BaseApiModel]] = None,
     ):
         """Send a PUT request to the desired path.
 
         :param path: A Lemmy endpoint.
-        :param params: Parameters to send with the request (in the URL).
+        :param params: Parameters to send with the request (in the body), as a model
+        or a dictionary.
+        :param response_model: If given, validate the response with this model, and
+        return it instead of the raw JSON data.
         """
         token = self.get_token_optional()
-        response = self.session.put(
-            self._get_url(path),
-            params=params.dict() if params is not None else {},
-            headers={"Authorization": f"Bearer {token}" if token else None},
-            timeout=self.request_timeout,
-        )
-        return response.json()
+        result = self._send("PUT", path, token, json=_payload(params))
+        if self.response_cache is not None:
+            self.response_cache.invalidate_after_write(path)
+        return self._validate("PUT", path, response_model, result)
 
     def multi_communities_stream(
         self, communities: Iterable[Union[int, str, Community]]
@@ -0,0 +1,175 @@
+"""Implements a multi-pattern keyword matcher, to be used as a stream filter."""
+
+import re
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Union
+
+from pylemmy.models.comment import Comment
+from pylemmy.models.post import Post
+
+POST_FIELDS = ("post_view.post.name", "post_view.post.body")
+COMMENT_FIELDS = ("comment_view.comment.content",)
+
+
+def get_field(obj: Any, path: str) -> Any:
+    """Get a (possibly nested) attribute from an object.
+
+    :param obj: The object to get the attribute from.
+    :param path: A dot-separated path, e.g. `"post_view.post.name"`.
+    :return: The value of the attribute, or `None` if any part of the path is missing.
+    """
+    for attr in path.split("."):
+        obj = getattr(obj, attr, None)
+        if obj is None:
+            return None
+    return obj
+
+
+def _trie_pattern(phrases: Iterable[str]) -> str:
+    """Build a regular expression matching any of the phrases, shaped as a trie."""
+    trie: Dict[str, Any] = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = None
+
+    def to_pattern(node: Dict[str, Any]) -> str:
+        branches = [
+            re.escape(char) + to_pattern(child)
+            for char, child in sorted(node.items())
+            if char != ""
+        ]
+        if not branches:
+            return ""
+        pattern = (
+            branches[0]
+            if len(branches) == 1 and "" not in node
+            else "(?:" + "|".join(branches) + ")"
+        )
+        # A greedy optional group prefers the longest phrase ending here.
+        return pattern + "?" if "" in node else pattern
+
+    return to_pattern(trie)
+
+
+class KeywordMatcher:
+    """Matches many phrases or regular expressions in a single pass.
+
+    All the rules are compiled once into a single regular expression. Literal phrases
+    are arranged as a trie, so the cost of matching grows with the length of the
+    text rather than with the number of phrases.
+    Since an instance of this class is callable, it can be passed as `filter_fn` to
+    [stream_generator][pylemmy.utils.stream_generator].
+
+    Example:
+
+        matcher = KeywordMatcher(["what is", "who is", "what are"])
+        for post in community.stream.get_posts(filter_fn=matcher):
+            print(post.post_view.post.name, matcher.matches(post))
+    """
+
+    def __init__(
+        self,
+        rules: Union[Iterable[str], Mapping[str, str]],
+        *,
+        fields: Optional[Sequence[str]] = None,
+        regex: bool = False,
+        case_sensitive: bool = False,
+        whole_words: bool = False,
+    ):
+        """Initialize a KeywordMatcher.
+
+        :param rules: The phrases to look for. If a mapping is given, its keys are
+        the rule names reported by [matches][pylemmy.matcher.KeywordMatcher.matches]
+        and its values are the phrases. Otherwise, each phrase is its own name.
+        :param fields: Dot-separated attribute paths of the text to match against,
+        e.g. `["post_view.post.name"]`. By default, the name and body are used for
+        Posts, and the content for Comments.
+        :param regex: If `True`, the rules are regular expressions instead of
+        literal phrases.
+        :param case_sensitive: If `True`, the matching is case sensitive.
+        :param whole_words: If `True`, rules only match at word boundaries.
+        """
+        named_rules = (
+            dict(rules) if isinstance(rules, Mapping) else {r: r for r in rules}
+        )
+        if not named_rules:
+            msg = "Need at least one rule to build a KeywordMatcher."
+            raise ValueError(msg)
+        self.fields = fields
+        self.regex = regex
+        self.case_sensitive = case_sensitive
+
+        flags = 0 if case_sensitive else re.IGNORECASE
+        if regex:
+            # Named groups tell which rule matched, at the cost of trying every
+            # alternative at each position of the text.
+            self._group_names = {f"_r{i}": name for i, name in enumerate(named_rules)}
+            combined = "|".join(
+                f"(?P<_r{i}>{pattern})"
+                for i, pattern in enumerate(named_rules.values())
+            )
+        else:
+            # Literal phrases are merged into a trie-shaped pattern, so only the
+            # phrases sharing a prefix with the text are ever tried.
+            self._phrase_names: Dict[str, List[str]] = {}
+            for name, phrase in named_rules.items():
+                self._phrase_names.setdefault(self._normalize(phrase), []).append(name)
+            combined = _trie_pattern(self._phrase_names)
+        if whole_words:
+            combined = rf"\b(?:{combined})\b"
+
+        self._search = re.compile(combined, flags).search
+        # A lookahead lets `finditer` report matches starting at every position,
+        # including the ones overlapping a previous match.
+        self._overlapping = re.compile(f"(?=({combined}))", flags)
+
+    def _normalize(self, text: str) -> str:
+        return text if self.case_sensitive else text.lower()
+
+    def texts(self, item: Any) -> List[str]:
+        """Get the texts of an item that the rules are matched against.
+
+        :param item: Any object, usually a Post or a Comment.
+        """
+        if self.fields is not None:
+            fields: Sequence[str] = self.fields
+        elif isinstance(item, Post):
+            fields = POST_FIELDS
+        elif isinstance(item, Comment):
+            fields = COMMENT_FIELDS
+        else:
+            msg = f"No default fields for {type(item)}, please set `fields`."
+            raise ValueError(msg)
+        values = (get_field(item, f) for f in fields)
+        return [v for v in values if isinstance(v, str)]
+
+    def __call__(self, item: Any) -> bool:
+        """Check whether any rule matches the item.
+
+        :param item: Any object, usually a Post or a Comment.
+        """
+        return any(self._search(text) is not None for text in self.texts(item))
+
+    def matches(self, item: Any) -> List[str]:
+        """Get the names of the rules that match the item.
+
+        For literal phrases, only the longest phrase matching at each position of the
+        text is reported.
+
+        :param item: Any object, usually a Post or a Comment.
+        :return: The names of the matched rules, in order of first appearance.
+        """
+        found: Dict[str, None] = {}
+        for text in self.texts(item):
+            for m in self._overlapping.finditer(text):
+                if self.regex:
+                    names = [
+                        self._group_names[g]
+                        for g, v in m.groupdict().items()
+                        if v is not None
+                    ]
+                else:
+                    names = self._phrase_names[self._normalize(m.group(1))]
+                found.update(dict.fromkeys(names))
+        return list(found)
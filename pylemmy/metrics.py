@@ -0,0 +1,291 @@
+"""Implements hooks on the requests sent to Lemmy, and metrics built on them."""
+
+import bisect
+import collections
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pylemmy.endpoints import LemmyAPI
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+"""Upper bounds (in seconds) of the buckets of the latency histograms."""
+
+
+class RequestEvent:
+    """Describes a request sent to Lemmy, as it progresses."""
+
+    __slots__ = (
+        "method",
+        "endpoint",
+        "url",
+        "started",
+        "status",
+        "network_seconds",
+        "decode_seconds",
+        "response_bytes",
+    )
+
+    def __init__(self, method: str, endpoint: LemmyAPI, url: str):
+        """Initialize a RequestEvent.
+
+        :param method: HTTP method of the request.
+        :param endpoint: The Lemmy endpoint the request is sent to.
+        :param url: Full URL of the request.
+        """
+        self.method = method
+        self.endpoint = endpoint
+        self.url = url
+        self.started = time.perf_counter()
+        # Set once the response is received.
+        self.status: Optional[int] = None
+        self.network_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.response_bytes = 0
+
+
+class RequestHooks:
+    """Hooks called by a [Lemmy][pylemmy.lemmy.Lemmy] client around its requests.
+
+    Subclass this and override the hooks you need, then give an instance to the
+    client with its `hooks` argument. Hooks are called from the thread sending the
+    request, so they must be fast and thread-safe.
+    """
+
+    def on_request(self, event: RequestEvent):
+        """Called before a request is sent.
+
+        :param event: The request.
+        """
+
+    def on_response(self, event: RequestEvent):
+        """Called once a response is received, and its JSON decoded if successful.
+
+        :param event: The request, with its status, size and timings.
+        """
+
+    def on_error(self, event: RequestEvent, error: Exception):
+        """Called when a request fails, including with an HTTP error status.
+
+        :param event: The request, with its status if a response was received.
+        :param error: The exception raised.
+        """
+
+    def on_validate(self, method: str, endpoint: LemmyAPI, seconds: float):
+        """Called after a response is validated by its pydantic model.
+
+        :param method: HTTP method of the request.
+        :param endpoint: The Lemmy endpoint the request was sent to.
+        :param seconds: Time spent validating the response.
+        """
+
+
+class Histogram:
+    """Counts observations in buckets, as Prometheus histograms do."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """Initialize a Histogram.
+
+        :param buckets: Sorted upper bounds of the buckets.
+        """
+        self.buckets = tuple(buckets)
+        # The last count is for observations above all bounds.
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """Add an observation.
+
+        :param value: The observed value.
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile, as the upper bound of the bucket it falls in.
+
+        :param q: The quantile, between 0 and 1.
+        :return: The estimate, or `inf` if it is above all bounds.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, float]:
+        """Summarize the histogram: count, sum, mean, and estimated p50 and p95."""
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+        }
+
+
+class _EndpointMetrics:
+    def __init__(self, buckets: Sequence[float]):
+        self.requests = 0
+        self.statuses: collections.Counter[int] = collections.Counter()
+        self.errors: collections.Counter[str] = collections.Counter()
+        self.response_bytes = 0
+        self.network = Histogram(buckets)
+        self.decode = Histogram(buckets)
+        self.validate = Histogram(buckets)
+
+
+_TIMINGS = ("network", "decode", "validate")
+
+
+class Metrics(RequestHooks):
+    """Collects metrics on the requests sent to each Lemmy endpoint.
+
+    Timings are split into `network` (sending the request and receiving the
+    response, including the server's time), `decode` (parsing the JSON) and
+    `validate` (building the pydantic models).
+
+    Example:
+
+        metrics = Metrics()
+        lemmy = Lemmy(..., hooks=[metrics])
+        ...
+        print(metrics.snapshot()["GET GetPosts"]["network_seconds"]["p95"])
+        print(metrics.to_prometheus())
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """Initialize Metrics.
+
+        :param buckets: Upper bounds (in seconds) of the latency histograms.
+        """
+        self.buckets = tuple(buckets)
+
+        self._endpoints: Dict[Tuple[str, str], _EndpointMetrics] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, method: str, endpoint: LemmyAPI) -> _EndpointMetrics:
+        key = (method, endpoint.name)
+        metrics = self._endpoints.get(key)
+        if metrics is None:
+            metrics = self._endpoints.setdefault(key, _EndpointMetrics(self.buckets))
+        return metrics
+
+    def on_request(self, event: RequestEvent):
+        """Count a request."""
+        with self._lock:
+            self._get(event.method, event.endpoint).requests += 1
+
+    def on_response(self, event: RequestEvent):
+        """Record the status, size and timings of a response."""
+        with self._lock:
+            metrics = self._get(event.method, event.endpoint)
+            if event.status is not None:
+                metrics.statuses[event.status] += 1
+            metrics.response_bytes += event.response_bytes
+            metrics.network.observe(event.network_seconds)
+            if event.decode_seconds > 0:
+                metrics.decode.observe(event.decode_seconds)
+
+    def on_error(self, event: RequestEvent, error: Exception):
+        """Count an error, by exception type."""
+        with self._lock:
+            self._get(event.method, event.endpoint).errors[type(error).__name__] += 1
+
+    def on_validate(self, method: str, endpoint: LemmyAPI, seconds: float):
+        """Record the time spent validating a response."""
+        with self._lock:
+            self._get(method, endpoint).validate.observe(seconds)
+
+    def reset(self):
+        """Forget all the metrics collected so far."""
+        with self._lock:
+            self._endpoints.clear()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Get the current metrics of each endpoint.
+
+        :return: A dictionary keyed by `"<method> <endpoint>"`, e.g.
+        `"GET GetPosts"`, with the number of `requests`, counts of `statuses` and
+        `errors`, total `response_bytes`, and a summary of each histogram of
+        timings (`network_seconds`, `decode_seconds` and `validate_seconds`).
+        """
+        with self._lock:
+            return {
+                f"{method} {endpoint}": {
+                    "requests": m.requests,
+                    "statuses": dict(m.statuses),
+                    "errors": dict(m.errors),
+                    "response_bytes": m.response_bytes,
+                    **{
+                        f"{name}_seconds": getattr(m, name).snapshot()
+                        for name in _TIMINGS
+                    },
+                }
+                for (method, endpoint), m in sorted(self._endpoints.items())
+            }
+
+    def to_prometheus(self, prefix: str = "pylemmy") -> str:
+        """Export the metrics in the Prometheus text format.
+
+        :param prefix: Prefix of the metric names.
+        """
+        # Samples of the same metric must be grouped, after its type.
+        families: Dict[str, List[str]] = collections.defaultdict(list)
+        with self._lock:
+            for (method, endpoint), m in sorted(self._endpoints.items()):
+                labels = f'method="{method}",endpoint="{endpoint}"'
+                families["requests_total"].append(f"{{{labels}}} {m.requests}")
+                for status, count in sorted(m.statuses.items()):
+                    families["responses_total"].append(
+                        f'{{{labels},status="{status}"}} {count}'
+                    )
+                for error, count in sorted(m.errors.items()):
+                    families["errors_total"].append(
+                        f'{{{labels},error="{error}"}} {count}'
+                    )
+                families["response_bytes_total"].append(
+                    f"{{{labels}}} {m.response_bytes}"
+                )
+                for name in _TIMINGS:
+                    families[f"{name}_seconds"] += _histogram_samples(
+                        labels, getattr(m, name)
+                    )
+
+        lines = []
+        for family, samples in families.items():
+            kind = "histogram" if family.endswith("_seconds") else "counter"
+            lines.append(f"# TYPE {prefix}_{family} {kind}")
+            lines += [f"{prefix}_{family}{sample}" for sample in samples]
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_samples(labels: str, histogram: Histogram) -> List[str]:
+    samples = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        samples.append(f'_bucket{{{labels},le="{bound}"}} {cumulative}')
+    samples.append(f'_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    samples.append(f"_sum{{{labels}}} {histogram.sum}")
+    samples.append(f"_count{{{labels}}} {histogram.count}")
+    return samples
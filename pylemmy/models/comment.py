@@ -1,11 +1,16 @@
 """Implements the Comment class."""
 
+import threading
 from typing import Optional
 
 import pylemmy
 from pylemmy import api
 from pylemmy.endpoints import LemmyAPI
 
+# Guards the related objects fetched lazily by wrappers, so that all threads see
+# the same object. It isn't held while fetching.
+_related_lock = threading.Lock()
+
 
 class CommentReport:
     """A class for Comment reports."""
@@ -37,11 +42,16 @@ class CommentReport:
             report_id=self.report_view.comment_report.id,
             resolved=resolved,
         )
-        result = self.lemmy.put_request(LemmyAPI.ResolveCommentReport, params=payload)
-        parsed_result = api.comment.CommentReportView(**result)
+        parsed_result = self.lemmy.put_request(
+            LemmyAPI.ResolveCommentReport,
+            params=payload,
+            response_model=api.comment.CommentResolveResponse,
+        )
 
         return CommentReport(
-            lemmy=self.lemmy, report=parsed_result, comment=self.comment
+            lemmy=self.lemmy,
+            report=parsed_result.comment_report_view,
+            comment=self.comment,
         )
 
 
@@ -73,14 +83,20 @@ class Comment:
     def post(self) -> "pylemmy.models.post.Post":
         """The Post under which this comment was posted."""
         if self._post is None:
-            self._post = self.lemmy.get_post(post_id=self.comment_view.post.id)
+            post = self.lemmy.get_post(post_id=self.comment_view.post.id)
+            with _related_lock:
+                if self._post is None:
+                    self._post = post
         return self._post
 
     @property
     def community(self) -> "pylemmy.models.community.Community":
         """The Community in which this was posted."""
         if self._community is None:
-            self._community = self.lemmy.get_community(self.comment_view.community.id)
+            community = self.lemmy.get_community(self.comment_view.community.id)
+            with _related_lock:
+                if self._community is None:
+                    self._community = community
         return self._community
 
     def create_report(self, reason: str) -> CommentReport:
@@ -93,9 +109,11 @@ class Comment:
             comment_id=self.comment_view.comment.id,
             reason=reason,
         )
-        result = self.lemmy.post_request(LemmyAPI.CreateCommentReport, params=payload)
-
-        parsed_result = api.comment.CommentReportResponse(**result)
+        parsed_result = self.lemmy.post_request(
+            LemmyAPI.CreateCommentReport,
+            params=payload,
+            response_model=api.comment.CommentReportResponse,
+        )
         return CommentReport(
             lemmy=self.lemmy, report=parsed_result.comment_report_view, comment=self
         )
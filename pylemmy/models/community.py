@@ -1,15 +1,48 @@
 """Implements the Community class."""
 
-from typing import Any, Callable, Iterable, List, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from mypy_extensions import KwArg
 
 import pylemmy
 from pylemmy import api
+from pylemmy.changes import (
+    COMMENT_FLAGS,
+    POST_FLAGS,
+    ChangeTracker,
+    change_stream,
+    comment_fingerprint,
+    post_fingerprint,
+)
 from pylemmy.endpoints import LemmyAPI
-from pylemmy.models.comment import Comment
-from pylemmy.models.post import Post
-from pylemmy.utils import stream_apply, stream_generator
+from pylemmy.filters import Filter, compile_filters
+from pylemmy.models.comment import Comment, CommentReport
+from pylemmy.models.post import Post, PostReport
+from pylemmy.utils import (
+    PageSizer,
+    StreamStats,
+    paginate,
+    stream_apply,
+    stream_generator,
+)
+
+
+def _post_published(post: Post) -> str:
+    return post.post_view.post.published
+
+
+def _comment_published(comment: Comment) -> str:
+    return comment.comment_view.comment.published
 
 
 class Community:
@@ -43,50 +76,128 @@ class Community:
         """
         self.lemmy.get_token()
         payload = api.post.CreatePost(name=name, community_id=self.safe.id, **kwargs)
-        result = self.lemmy.post_request(LemmyAPI.Post, params=payload)
-        parsed_result = api.post.PostResponse(**result)
+        parsed_result = self.lemmy.post_request(
+            LemmyAPI.Post, params=payload, response_model=api.post.PostResponse
+        )
 
         return Post(self.lemmy, parsed_result.post_view, community=self)
 
-    def get_posts(self, **kwargs) -> List[Post]:
+    def get_posts(self, filters: Optional[Filter] = None, **kwargs) -> List[Post]:
         """Gets a list of Posts from this community.
 
+        :param filters: A [Filter][pylemmy.filters.Filter] for the Posts.
         :param kwargs: See optional arguments in [GetPosts](
         https://join-lemmy.org/api/interfaces/GetPosts.html).
         """
-        payload = api.post.GetPosts(community_id=self.safe.id, **kwargs)
-        result = self.lemmy.get_request(LemmyAPI.GetPosts, params=payload)
-        parsed_result = api.post.GetPostsResponse(**result)
+        params, predicate = compile_filters(filters, api.post.GetPosts, kwargs)
+        posts, _ = self._get_posts_page(**params)
+        return [p for p in posts if predicate(p)]
+
+    def _get_posts_page(self, **params) -> Tuple[List[Post], Optional[str]]:
+        payload = api.post.GetPosts(community_id=self.safe.id, **params)
+        parsed_result = self.lemmy.get_request(
+            LemmyAPI.GetPosts, params=payload, response_model=api.post.GetPostsResponse
+        )
+        posts = [Post(self.lemmy, post, community=self) for post in parsed_result.posts]
+        return posts, parsed_result.next_page
+
+    def iter_posts(
+        self, filters: Optional[Filter] = None, *, limit: Optional[int] = None, **kwargs
+    ) -> Generator[Post, None, None]:
+        """Iterate through the Posts of this community, page after page.
+
+        Pages are requested with cursors on instances supporting them, so that deep
+        pages are as fast as the first ones. See
+        [paginate][pylemmy.utils.paginate].
+
+        Example:
 
-        return [Post(self.lemmy, post, community=self) for post in parsed_result.posts]
+            for post in community.iter_posts(sort="Old", limit=5000):
+                export(post)
 
-    def get_comments(self, **kwargs) -> List[Comment]:
+        :param filters: A [Filter][pylemmy.filters.Filter] for the Posts.
+        :param limit: Maximum number of Posts.
+        :param kwargs: See optional arguments in [GetPosts](
+        https://join-lemmy.org/api/interfaces/GetPosts.html), except `page` and
+        `page_cursor`.
+        """
+        params, predicate = compile_filters(filters, api.post.GetPosts, kwargs)
+        return paginate(
+            self._get_posts_page,
+            lambda x: str(x.post_view.post.ap_id),
+            filter_fn=predicate,
+            limit=limit,
+            **params,
+        )
+
+    def get_comments(self, filters: Optional[Filter] = None, **kwargs) -> List[Comment]:
         """Gets a list of Comments from this community.
 
+        :param filters: A [Filter][pylemmy.filters.Filter] for the Comments.
         :param kwargs: See optional arguments in [GetComments](
         https://join-lemmy.org/api/interfaces/GetComments.html).
         """
-        payload = api.comment.GetComments(community_id=self.safe.id, **kwargs)
-        result = self.lemmy.get_request(LemmyAPI.GetComments, params=payload)
-        parsed_result = api.comment.GetCommentsResponse(**result)
+        params, predicate = compile_filters(filters, api.comment.GetComments, kwargs)
+        comments, _ = self._get_comments_page(**params)
+        return [c for c in comments if predicate(c)]
+
+    def _get_comments_page(self, **params) -> Tuple[List[Comment], Optional[str]]:
+        payload = api.comment.GetComments(community_id=self.safe.id, **params)
+        parsed_result = self.lemmy.get_request(
+            LemmyAPI.GetComments,
+            params=payload,
+            response_model=api.comment.GetCommentsResponse,
+        )
+        comments = [Comment(self.lemmy, comment) for comment in parsed_result.comments]
+        return comments, None
+
+    def iter_comments(
+        self, filters: Optional[Filter] = None, *, limit: Optional[int] = None, **kwargs
+    ) -> Generator[Comment, None, None]:
+        """Iterate through the Comments of this community, page after page.
 
-        return [Comment(self.lemmy, comment) for comment in parsed_result.comments]
+        See [iter_posts][pylemmy.models.community.Community.iter_posts]. Lemmy has
+        no cursors for comments, so pages are requested by number.
+
+        :param filters: A [Filter][pylemmy.filters.Filter] for the Comments.
+        :param limit: Maximum number of Comments.
+        :param kwargs: See optional arguments in [GetComments](
+        https://join-lemmy.org/api/interfaces/GetComments.html), except `page`.
+        """
+        params, predicate = compile_filters(filters, api.comment.GetComments, kwargs)
+        return paginate(
+            self._get_comments_page,
+            lambda x: str(x.comment_view.comment.ap_id),
+            filter_fn=predicate,
+            limit=limit,
+            **params,
+        )
 
-    def list_post_reports(self, **kwargs) -> List[api.post.PostReportView]:
+    def list_post_reports(
+        self, filters: Optional[Filter] = None, **kwargs
+    ) -> List[api.post.PostReportView]:
         """List post reports in this community.
 
+        :param filters: A [Filter][pylemmy.filters.Filter] for the reports.
         :param kwargs: See optional arguments in [ListPostReports](
         https://join-lemmy.org/api/interfaces/ListPostReports.html).
         """
-        return self.lemmy.list_post_reports(community_id=self.safe.id, **kwargs)
+        return self.lemmy.list_post_reports(
+            filters, community_id=self.safe.id, **kwargs
+        )
 
-    def list_comment_reports(self, **kwargs) -> List[api.comment.CommentReportView]:
+    def list_comment_reports(
+        self, filters: Optional[Filter] = None, **kwargs
+    ) -> List[api.comment.CommentReportView]:
         """List comment reports in this community.
 
+        :param filters: A [Filter][pylemmy.filters.Filter] for the reports.
         :param kwargs: See optional arguments in [ListCommentReports](
         https://join-lemmy.org/api/interfaces/ListCommentReports.html).
         """
-        return self.lemmy.list_comment_reports(community_id=self.safe.id, **kwargs)
+        return self.lemmy.list_comment_reports(
+            filters, community_id=self.safe.id, **kwargs
+        )
 
     @property
     def stream(self) -> "CommunityStream":
@@ -126,9 +237,13 @@ class CommunityStream:
     def get_posts(self, **kwargs):
         """Get a stream of Posts in the Community.
 
+        A [Filter][pylemmy.filters.Filter] can be given with the `filters` keyword,
+        and is passed on to [get_posts][pylemmy.models.community.Community.get_posts].
+
         :param kwargs: See the optional arguments in
         [stream_generator][pylemmy.utils.stream_generator].
         """
+        kwargs.setdefault("published_fn", _post_published)
         return stream_generator(
             self.community.get_posts,
             lambda x: str(x.post_view.post.ap_id),
@@ -138,15 +253,105 @@ class CommunityStream:
     def get_comments(self, **kwargs):
         """Get a stream of Comments in the Community.
 
+        A [Filter][pylemmy.filters.Filter] can be given with the `filters` keyword,
+        and is passed on to
+        [get_comments][pylemmy.models.community.Community.get_comments].
+
         :param kwargs: See the optional arguments in
         [stream_generator][pylemmy.utils.stream_generator].
         """
+        kwargs.setdefault("published_fn", _comment_published)
         return stream_generator(
             self.community.get_comments,
             lambda x: str(x.comment_view.comment.ap_id),
             **kwargs,
         )
 
+    def get_post_changes(self, *, max_items: int = 100_000, **kwargs):
+        """Get a stream of the changes of the Posts in the Community.
+
+        Unlike [get_posts][pylemmy.models.community.CommunityStream.get_posts], Posts
+        seen before are reported again when they are edited, deleted, removed,
+        locked or featured, as [ChangeEvent][pylemmy.changes.ChangeEvent]s. Only the
+        Posts returned by each poll are compared, so pass e.g. `sort="Active"` to
+        follow the ones being discussed.
+
+        Example:
+
+            for event in community.stream.get_post_changes(skip_existing=True):
+                if event.type is ChangeType.REMOVED:
+                    log_removal(event.item)
+
+        :param max_items: Maximum number of Posts whose fingerprint is kept.
+        :param kwargs: See the optional arguments in
+        [change_stream][pylemmy.changes.change_stream] and
+        [get_posts][pylemmy.models.community.Community.get_posts].
+        """
+        tracker = ChangeTracker(
+            lambda x: str(x.post_view.post.ap_id),
+            post_fingerprint,
+            POST_FLAGS,
+            max_items=max_items,
+        )
+        return change_stream(self.community.get_posts, tracker, **kwargs)
+
+    def get_comment_changes(self, *, max_items: int = 100_000, **kwargs):
+        """Get a stream of the changes of the Comments in the Community.
+
+        See
+        [get_post_changes][pylemmy.models.community.CommunityStream.get_post_changes].
+
+        :param max_items: Maximum number of Comments whose fingerprint is kept.
+        :param kwargs: See the optional arguments in
+        [change_stream][pylemmy.changes.change_stream] and
+        [get_comments][pylemmy.models.community.Community.get_comments].
+        """
+        tracker = ChangeTracker(
+            lambda x: str(x.comment_view.comment.ap_id),
+            comment_fingerprint,
+            COMMENT_FLAGS,
+            max_items=max_items,
+        )
+        return change_stream(self.community.get_comments, tracker, **kwargs)
+
+    def get_post_reports(self, **kwargs):
+        """Get a stream of Post reports in the Community.
+
+        Only unresolved reports are streamed, unless `unresolved_only=False` is given.
+
+        :param kwargs: See the optional arguments in
+        [stream_generator][pylemmy.utils.stream_generator] and
+        [list_post_reports][pylemmy.models.community.Community.list_post_reports].
+        """
+        kwargs.setdefault("unresolved_only", True)
+        return stream_generator(
+            lambda **kw: [
+                PostReport(self.community.lemmy, r)
+                for r in self.community.list_post_reports(**kw)
+            ],
+            lambda x: str(x.report_view.post_report.id),
+            **kwargs,
+        )
+
+    def get_comment_reports(self, **kwargs):
+        """Get a stream of Comment reports in the Community.
+
+        Only unresolved reports are streamed, unless `unresolved_only=False` is given.
+
+        :param kwargs: See the optional arguments in
+        [stream_generator][pylemmy.utils.stream_generator] and
+        [list_comment_reports][pylemmy.models.community.Community.list_comment_reports].
+        """
+        kwargs.setdefault("unresolved_only", True)
+        return stream_generator(
+            lambda **kw: [
+                CommentReport(self.community.lemmy, r)
+                for r in self.community.list_comment_reports(**kw)
+            ],
+            lambda x: str(x.report_view.comment_report.id),
+            **kwargs,
+        )
+
 
 class MultiCommunityStream:
     """Helper class to stream content from multiple communities.
@@ -170,8 +375,39 @@ class MultiCommunityStream:
         :param communities: A list of communities to monitor.
         """
         self.communities = communities
+        # Statistics of each source, e.g. "posts/<community name>".
+        self.stats: Dict[str, StreamStats] = {}
+        # Page sizers of each source, with `adaptive_limit=True`.
+        self.page_sizers: Dict[str, PageSizer] = {}
+
+    def _source_stats(self, kind: str) -> List[StreamStats]:
+        return [
+            self.stats.setdefault(f"{kind}/{c.safe.name}", StreamStats())
+            for c in self.communities
+        ]
+
+    def _source_page_sizers(self, kind: str) -> List[PageSizer]:
+        return [
+            self.page_sizers.setdefault(f"{kind}/{c.safe.name}", PageSizer())
+            for c in self.communities
+        ]
 
-    def posts_apply(self, callback: Callable[[Post], Any], **kwargs):
+    def stats_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Get the current statistics of each source of the streams.
+
+        :return: A dictionary keyed by `"posts/<community name>"` or
+        `"comments/<community name>"`, with the snapshots of their
+        [StreamStats][pylemmy.utils.StreamStats].
+        """
+        return {name: stats.snapshot() for name, stats in self.stats.items()}
+
+    def posts_apply(
+        self,
+        callback: Callable[[Post], Any],
+        *,
+        adaptive_limit: bool = False,
+        **kwargs,
+    ):
         """Apply a callback function to a stream of Posts in the Communities.
 
         Example:
@@ -184,16 +420,34 @@ class MultiCommunityStream:
             multi_stream.content_apply(process_content)
 
         :param callback: Function that will be called for each Post.
+        :param adaptive_limit: If `True`, size the pages of each source from its
+        rate of new items, with a [PageSizer][pylemmy.utils.PageSizer] kept in
+        `page_sizers`.
         :param kwargs: See the optional arguments in
-        [stream_generator][pylemmy.utils.stream_generator].
+        [stream_generator][pylemmy.utils.stream_generator]. A
+        [Filter][pylemmy.filters.Filter] can also be given with the `filters` keyword.
         """
         results_fns = [c.get_posts for c in self.communities]
         unique_keys_fns = [lambda x: str(x.post_view.post.ap_id)] * len(
             self.communities
         )
-        stream_apply(results_fns, unique_keys_fns, callback, **kwargs)
+        stream_apply(
+            results_fns,
+            unique_keys_fns,
+            callback,
+            stats=self._source_stats("posts"),
+            published_fns=[_post_published] * len(self.communities),
+            page_sizers=self._source_page_sizers("posts") if adaptive_limit else None,
+            **kwargs,
+        )
 
-    def comments_apply(self, callback: Callable[[Comment], Any], **kwargs):
+    def comments_apply(
+        self,
+        callback: Callable[[Comment], Any],
+        *,
+        adaptive_limit: bool = False,
+        **kwargs,
+    ):
         """Apply a callback function to a stream of Comments in the Communities.
 
         Example:
@@ -206,16 +460,36 @@ class MultiCommunityStream:
             multi_stream.content_apply(process_content)
 
         :param callback: Function that will be called for each Comment.
+        :param adaptive_limit: If `True`, size the pages of each source from its
+        rate of new items, with a [PageSizer][pylemmy.utils.PageSizer] kept in
+        `page_sizers`.
         :param kwargs: See the optional arguments in
-        [stream_generator][pylemmy.utils.stream_generator].
+        [stream_generator][pylemmy.utils.stream_generator]. A
+        [Filter][pylemmy.filters.Filter] can also be given with the `filters` keyword.
         """
         results_fns = [c.get_comments for c in self.communities]
         unique_keys_fns = [lambda x: str(x.comment_view.comment.ap_id)] * len(
             self.communities
         )
-        stream_apply(results_fns, unique_keys_fns, callback, **kwargs)
+        stream_apply(
+            results_fns,
+            unique_keys_fns,
+            callback,
+            stats=self._source_stats("comments"),
+            published_fns=[_comment_published] * len(self.communities),
+            page_sizers=(
+                self._source_page_sizers("comments") if adaptive_limit else None
+            ),
+            **kwargs,
+        )
 
-    def content_apply(self, callback: Callable[[Union[Comment, Post]], Any], **kwargs):
+    def content_apply(
+        self,
+        callback: Callable[[Union[Comment, Post]], Any],
+        *,
+        adaptive_limit: bool = False,
+        **kwargs,
+    ):
         """Apply a callback function to a stream of Comments and Posts.
 
         Example:
@@ -232,8 +506,13 @@ class MultiCommunityStream:
 
 
         :param callback: Function that will be called for each Comment/Post.
+        :param adaptive_limit: If `True`, size the pages of each source from its
+        rate of new items, with a [PageSizer][pylemmy.utils.PageSizer] kept in
+        `page_sizers`.
         :param kwargs: See the optional arguments in
-        [stream_generator][pylemmy.utils.stream_generator].
+        [stream_generator][pylemmy.utils.stream_generator]. A
+        [Filter][pylemmy.filters.Filter] can also be given with the `filters` keyword,
+        and is applied to both Posts and Comments.
         """
         posts_fns: List[Callable[[KwArg(Any)], Iterable[Union[Post, Comment]]]] = [
             c.get_posts for c in self.communities
@@ -248,9 +527,19 @@ class MultiCommunityStream:
         comments_unique_keys_fns = [
             lambda x: "comment_" + str(x.comment_view.comment.ap_id)
         ] * len(self.communities)
+        published_fns: List[Callable[[Any], str]] = [_post_published] * len(
+            self.communities
+        ) + [_comment_published] * len(self.communities)
+        page_sizers = None
+        if adaptive_limit:
+            page_sizers = self._source_page_sizers("posts")
+            page_sizers += self._source_page_sizers("comments")
         stream_apply(
             posts_fns + comments_fns,
             posts_unique_keys_fns + comments_unique_keys_fns,
             callback,
+            stats=self._source_stats("posts") + self._source_stats("comments"),
+            published_fns=published_fns,
+            page_sizers=page_sizers,
             **kwargs,
         )
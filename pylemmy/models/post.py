@@ -1,12 +1,17 @@
 """Implements the Post class."""
 
+import threading
 from typing import List, Optional
 
 import pylemmy
 from pylemmy import api
 from pylemmy.endpoints import LemmyAPI
+from pylemmy.filters import Filter, compile_filters
 from pylemmy.models.comment import Comment
 
+# Guards the Community fetched lazily, so that all threads see the same object.
+_related_lock = threading.Lock()
+
 
 class PostReport:
     """A class for Post reports."""
@@ -38,10 +43,15 @@ class PostReport:
             report_id=self.report_view.post_report.id,
             resolved=resolved,
         )
-        result = self.lemmy.put_request(LemmyAPI.ResolvePostReport, params=payload)
-        parsed_result = api.post.PostReportView(**result)
+        parsed_result = self.lemmy.put_request(
+            LemmyAPI.ResolvePostReport,
+            params=payload,
+            response_model=api.post.PostResolveResponse,
+        )
 
-        return PostReport(lemmy=self.lemmy, report=parsed_result, post=self.post)
+        return PostReport(
+            lemmy=self.lemmy, report=parsed_result.post_report_view, post=self.post
+        )
 
 
 class Post:
@@ -69,7 +79,10 @@ class Post:
     def community(self) -> "pylemmy.models.community.Community":
         """The Community in which this Post was posted."""
         if self._community is None:
-            self._community = self.lemmy.get_community(self.post_view.community.id)
+            community = self.lemmy.get_community(self.post_view.community.id)
+            with _related_lock:
+                if self._community is None:
+                    self._community = community
         return self._community
 
     def create_comment(self, content: str, **kwargs) -> Comment:
@@ -85,30 +98,37 @@ class Post:
             post_id=self.post_view.post.id,
             **kwargs,
         )
-        result = self.lemmy.post_request(LemmyAPI.Comment, params=payload)
-        parsed_result = api.comment.CommentResponse(**result)
+        parsed_result = self.lemmy.post_request(
+            LemmyAPI.Comment, params=payload, response_model=api.comment.CommentResponse
+        )
 
         return Comment(
             self.lemmy, parsed_result.comment_view, post=self, community=self._community
         )
 
-    def get_comments(self, **kwargs) -> List[Comment]:
+    def get_comments(self, filters: Optional[Filter] = None, **kwargs) -> List[Comment]:
         """Get Comments under this Post.
 
+        :param filters: A [Filter][pylemmy.filters.Filter] for the Comments.
         :param kwargs: See optional arguments in [GetComments](
         https://join-lemmy.org/api/interfaces/GetComments.html).
         """
+        params, predicate = compile_filters(filters, api.comment.GetComments, kwargs)
         payload = api.comment.GetComments(
             post_id=self.post_view.post.id,
-            **kwargs,
+            **params,
+        )
+        parsed_result = self.lemmy.get_request(
+            LemmyAPI.GetComments,
+            params=payload,
+            response_model=api.comment.GetCommentsResponse,
         )
-        result = self.lemmy.get_request(LemmyAPI.GetComments, params=payload)
-        parsed_result = api.comment.GetCommentsResponse(**result)
 
-        return [
+        comments = [
             Comment(self.lemmy, comment, post=self, community=self._community)
             for comment in parsed_result.comments
         ]
+        return [c for c in comments if predicate(c)]
 
     def create_report(self, reason: str) -> PostReport:
         """Report this post.
@@ -119,9 +139,11 @@ class Post:
         payload = api.post.CreatePostReport(
             post_id=self.post_view.post.id, reason=reason
         )
-        result = self.lemmy.post_request(LemmyAPI.CreatePostReport, params=payload)
-
-        parsed_result = api.post.PostReportResponse(**result)
+        parsed_result = self.lemmy.post_request(
+            LemmyAPI.CreatePostReport,
+            params=payload,
+            response_model=api.post.PostReportResponse,
+        )
         return PostReport(
             lemmy=self.lemmy, report=parsed_result.post_report_view, post=self
         )
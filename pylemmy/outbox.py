@@ -0,0 +1,290 @@
+"""Implements an outbox, which sends writes to Lemmy in the background."""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+
+import pylemmy
+from pylemmy import api
+from pylemmy.api.utils import BaseApiModel
+from pylemmy.endpoints import LemmyAPI
+from pylemmy.models.comment import Comment, CommentReport
+from pylemmy.models.community import Community
+from pylemmy.models.post import Post, PostReport
+from pylemmy.transport import is_unsent, retry_after
+
+_WRITES: Dict[str, Tuple[LemmyAPI, Type[BaseApiModel]]] = {
+    "comment": (LemmyAPI.Comment, api.comment.CreateComment),
+    "post": (LemmyAPI.Post, api.post.CreatePost),
+    "post_report": (LemmyAPI.CreatePostReport, api.post.CreatePostReport),
+    "comment_report": (
+        LemmyAPI.CreateCommentReport,
+        api.comment.CreateCommentReport,
+    ),
+}
+
+
+class _Write:
+    def __init__(
+        self,
+        row_id: Optional[int],
+        kind: str,
+        payload: Dict[str, Any],
+        context: Any = None,
+    ):
+        self.row_id = row_id
+        self.kind = kind
+        self.payload = payload
+        self.context = context
+        self.future: Future[Any] = Future()
+
+
+class Outbox:
+    """Queues writes to Lemmy, and sends them from background threads.
+
+    This keeps slow requests, or waits due to rate limits, from blocking the code
+    creating the content, e.g. a bot replying to a stream of posts.
+    Failed requests are retried with exponential backoff when they surely weren't
+    applied: the connection couldn't be opened, or the server answered HTTP 429.
+    Other errors (e.g. timeouts or 5xx responses) fail the write without resending
+    it, since the server may have applied it, and a retry would create a duplicate.
+    Each write is then sent at most once successfully, except for writes recovered
+    from the journal after a crash in the middle of their request.
+    If a `journal_path` is given, pending writes are kept in an SQLite file, and
+    sent when an Outbox is next created with the same file.
+
+    Example:
+
+        with Outbox(lemmy) as outbox:
+            for post in community.stream.get_posts(limit=10):
+                future = outbox.create_comment(post, "Hello!")
+                future.add_done_callback(lambda f: print(f.result()))
+    """
+
+    def __init__(
+        self,
+        lemmy: "pylemmy.Lemmy",
+        *,
+        workers: int = 2,
+        journal_path: Optional[str] = None,
+        max_retries: int = 5,
+        min_retry_wait: float = 1,
+        max_retry_wait: float = 60,
+    ):
+        """Initialize an Outbox, and start its worker threads.
+
+        :param lemmy: A Lemmy instance, logged in as the user doing the writes.
+        :param workers: Number of threads sending the writes.
+        :param journal_path: Path to an SQLite file where pending writes are kept.
+        If not given, pending writes are lost if the process stops.
+        :param max_retries: Maximum number of retries for each write.
+        :param min_retry_wait: Time (in seconds) to wait before the first retry.
+        :param max_retry_wait: Maximum time (in seconds) to wait between retries.
+        """
+        self.lemmy = lemmy
+        self.max_retries = max_retries
+        self.min_retry_wait = min_retry_wait
+        self.max_retry_wait = max_retry_wait
+
+        self._queue: queue.Queue[Optional[_Write]] = queue.Queue()
+        self._journal_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._journal: Optional[sqlite3.Connection] = None
+        # Futures for the writes that were pending in the journal.
+        self.recovered: List[Future[Any]] = []
+        if journal_path is not None:
+            self._journal = sqlite3.connect(journal_path, check_same_thread=False)
+            with self._journal:
+                self._journal.execute(
+                    "CREATE TABLE IF NOT EXISTS outbox "
+                    "(id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, payload TEXT)"
+                )
+            rows = self._journal.execute(
+                "SELECT id, kind, payload FROM outbox ORDER BY id"
+            ).fetchall()
+            for row_id, kind, payload in rows:
+                write = _Write(row_id, kind, json.loads(payload))
+                self.recovered.append(write.future)
+                self._queue.put(write)
+
+        self._threads = [
+            threading.Thread(target=self._work, name=f"pylemmy-outbox-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def create_comment(
+        self, post: Union[Post, int], content: str, **kwargs
+    ) -> "Future[Comment]":
+        """Queue the creation of a Comment.
+
+        :param post: The Post (or its id) to comment on.
+        :param content: Content of the comment.
+        :param kwargs: See optional arguments in [CreateComment](
+        https://join-lemmy.org/api/interfaces/CreateComment.html).
+        :return: A future for the created Comment.
+        """
+        post_id = post.post_view.post.id if isinstance(post, Post) else post
+        payload = api.comment.CreateComment(content=content, post_id=post_id, **kwargs)
+        return self._enqueue("comment", payload, post)
+
+    def create_post(
+        self, community: Union[Community, int], name: str, **kwargs
+    ) -> "Future[Post]":
+        """Queue the creation of a Post.
+
+        :param community: The Community (or its id) to post in.
+        :param name: Name of the post.
+        :param kwargs: See optional arguments in [CreatePost](
+        https://join-lemmy.org/api/interfaces/CreatePost.html).
+        :return: A future for the created Post.
+        """
+        community_id = (
+            community.safe.id if isinstance(community, Community) else community
+        )
+        payload = api.post.CreatePost(name=name, community_id=community_id, **kwargs)
+        return self._enqueue("post", payload, community)
+
+    def create_report(
+        self, item: Union[Post, Comment], reason: str
+    ) -> "Future[Union[PostReport, CommentReport]]":
+        """Queue a report of a Post or Comment.
+
+        :param item: The Post or Comment to report.
+        :param reason: A reason for the report.
+        :return: A future for the created report.
+        """
+        if isinstance(item, Post):
+            return self._enqueue(
+                "post_report",
+                api.post.CreatePostReport(
+                    post_id=item.post_view.post.id, reason=reason
+                ),
+                item,
+            )
+        return self._enqueue(
+            "comment_report",
+            api.comment.CreateCommentReport(
+                comment_id=item.comment_view.comment.id, reason=reason
+            ),
+            item,
+        )
+
+    @property
+    def pending(self) -> int:
+        """Approximate number of writes waiting to be sent."""
+        return self._queue.unfinished_tasks
+
+    def flush(self):
+        """Block until all the queued writes were sent, or failed."""
+        self._queue.join()
+
+    def close(self, *, wait: bool = True):
+        """Stop the worker threads.
+
+        :param wait: If `True`, send all queued writes before stopping. Otherwise,
+        writes not yet sent stay in the journal, if there is one.
+        """
+        if wait:
+            self.flush()
+        else:
+            self._stopping.set()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        if self._journal is not None:
+            with self._journal_lock:
+                self._journal.close()
+
+    def __enter__(self) -> "Outbox":
+        """Use the Outbox as a context manager, closing it on exit."""
+        return self
+
+    def __exit__(self, *args):
+        """Send all the queued writes, and stop the worker threads."""
+        self.close()
+
+    def _enqueue(self, kind: str, payload: BaseApiModel, context: Any) -> "Future":
+        data = payload.model_dump()
+        row_id = None
+        if self._journal is not None:
+            with self._journal_lock, self._journal:
+                cursor = self._journal.execute(
+                    "INSERT INTO outbox (kind, payload) VALUES (?, ?)",
+                    (kind, json.dumps(data)),
+                )
+                row_id = cursor.lastrowid
+        write = _Write(row_id, kind, data, context)
+        self._queue.put(write)
+        return write.future
+
+    def _work(self):
+        while True:
+            write = self._queue.get()
+            try:
+                if write is None:
+                    return
+                if self._stopping.is_set():
+                    write.future.cancel()
+                    continue
+                if write.future.set_running_or_notify_cancel():
+                    try:
+                        write.future.set_result(self._send(write))
+                    except Exception as e:
+                        write.future.set_exception(e)
+                if self._journal is not None and write.row_id is not None:
+                    with self._journal_lock, self._journal:
+                        self._journal.execute(
+                            "DELETE FROM outbox WHERE id = ?", (write.row_id,)
+                        )
+            finally:
+                self._queue.task_done()
+
+    def _send(self, write: _Write) -> Any:
+        path, model = _WRITES[write.kind]
+        payload = model(**write.payload)
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.lemmy.get_token()
+                result = self.lemmy.post_request(path, params=payload)
+                break
+            except Exception as e:
+                if attempt == self.max_retries or not is_unsent(e):
+                    raise
+                wait = min(self.min_retry_wait * 2**attempt, self.max_retry_wait)
+                time.sleep(max(wait, retry_after(e) or 0))
+        return self._build(write, result)
+
+    def _build(self, write: _Write, result: Dict[str, Any]) -> Any:
+        context = write.context
+        if write.kind == "comment":
+            post = context if isinstance(context, Post) else None
+            return Comment(
+                self.lemmy,
+                api.comment.CommentResponse(**result).comment_view,
+                post=post,
+                community=post._community if post is not None else None,
+            )
+        if write.kind == "post":
+            return Post(
+                self.lemmy,
+                api.post.PostResponse(**result).post_view,
+                community=context if isinstance(context, Community) else None,
+            )
+        if write.kind == "post_report":
+            return PostReport(
+                self.lemmy,
+                api.post.PostReportResponse(**result).post_report_view,
+                post=context,
+            )
+        return CommentReport(
+            self.lemmy,
+            api.comment.CommentReportResponse(**result).comment_report_view,
+            comment=context,
+        )
@@ -0,0 +1,289 @@
+"""Implements a local proxy sharing one client between the bots of a host.
+
+Run it with:
+
+    python -m pylemmy.proxy --url https://lemmy.ml --socket /run/pylemmy/lemmy.sock
+
+with the credentials in the `LEMMY_USERNAME` and `LEMMY_PASSWORD` environment
+variables, and point the bots to it with a
+[UnixSocketTransport][pylemmy.transport.UnixSocketTransport].
+"""
+
+import argparse
+import collections
+import json
+import os
+import socketserver
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import requests
+
+import pylemmy
+from pylemmy.cache import DEFAULT_TTLS, ResponseCache, SQLiteCacheBackend
+from pylemmy.endpoints import LemmyAPI
+
+_ENDPOINTS = {endpoint.value: endpoint for endpoint in LemmyAPI}
+
+
+class JsonRequestHandler(BaseHTTPRequestHandler):
+    """Answers requests with JSON, from the `answer` method of its server.
+
+    The server's `answer(method, path, params)` gets the parameters of the query
+    string and of the JSON body, and returns the status, data and headers of the
+    response. This handler is shared by the proxy and the
+    [FakeLemmyServer][pylemmy.fake_server.FakeLemmyServer].
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def _answer(self, method: str):
+        parts = urllib.parse.urlsplit(self.path)
+        params: Dict[str, Any] = {
+            k: v[-1] for k, v in urllib.parse.parse_qs(parts.query).items()
+        }
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > 0:
+            params.update(json.loads(self.rfile.read(length)))
+
+        status, data, headers = self.server.answer(  # type: ignore[attr-defined]
+            method, parts.path, params
+        )
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):  # noqa: N802
+        """Answer a GET request."""
+        self._answer("GET")
+
+    def do_POST(self):  # noqa: N802
+        """Answer a POST request."""
+        self._answer("POST")
+
+    def do_PUT(self):  # noqa: N802
+        """Answer a PUT request."""
+        self._answer("PUT")
+
+    def log_message(self, *args):
+        """Don't log requests."""
+
+
+class _Handler(JsonRequestHandler):
+    server: "LemmyProxy"
+
+    def address_string(self) -> str:
+        # Unix sockets have no client address.
+        return self.server.path
+
+
+class LemmyProxy(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves the Lemmy API on a unix socket, through a single shared client.
+
+    Bots on the same host send their requests to the proxy with a
+    [UnixSocketTransport][pylemmy.transport.UnixSocketTransport], and the proxy
+    sends them to the instance with its own [Lemmy][pylemmy.lemmy.Lemmy] client.
+    The client's options then apply to all the bots together: concurrent identical
+    GET requests are coalesced, responses are cached with its `response_cache`, and
+    its rate limit is shared. N bots cost the instance about as much as one.
+
+    Authentication is shared too: the proxy logs in once with the client's
+    credentials, and sends all the requests as that user. A `Login` request gets
+    the proxy's session, whatever its credentials. Anyone who can open the socket
+    acts as that user, so keep its permissions (see `mode`) tight.
+
+    Example:
+
+        upstream = Lemmy(
+            "https://lemmy.ml",
+            "bot",
+            password,
+            "bot fleet",
+            requests_per_second=5,
+            response_cache=ResponseCache(stale_ttl=60),
+        )
+        with LemmyProxy(upstream, "/run/pylemmy/lemmy.ml.sock"):
+            ...
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, lemmy: "pylemmy.Lemmy", path: str, *, mode: int = 0o600):
+        """Initialize a LemmyProxy, and its socket. Serving starts with `start`.
+
+        :param lemmy: The client sending the requests to the instance.
+        :param path: Path to the unix socket. A stale socket file there is replaced.
+        :param mode: Permissions of the socket file.
+        """
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, _Handler)
+        os.chmod(path, mode)
+        self.lemmy = lemmy
+        self.path = path
+        # Number of requests received, by endpoint.
+        self.requests: collections.Counter[str] = collections.Counter()
+
+        self._counter_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def answer(
+        self, method: str, path: str, params: Dict[str, Any]
+    ) -> Tuple[int, Any, Dict[str, str]]:
+        """Answer a request, by sending it to the instance unless it can be avoided.
+
+        :param method: HTTP method of the request.
+        :param path: Path of the request.
+        :param params: Parameters of the request, from the URL and the body.
+        :return: The status, JSON data and extra headers of the response.
+        """
+        endpoint = _ENDPOINTS.get(path)
+        if endpoint is None:
+            return 404, {"error": "not_found"}, {}
+        with self._counter_lock:
+            self.requests[path] += 1
+
+        try:
+            if endpoint is LemmyAPI.Login and self.lemmy.username is not None:
+                return 200, self.lemmy.login().model_dump(), {}
+            if method == "GET":
+                return 200, self.lemmy.get_request(endpoint, params), {}
+            if method == "POST":
+                return 200, self.lemmy.post_request(endpoint, params), {}
+            return 200, self.lemmy.put_request(endpoint, params), {}
+        except requests.HTTPError as e:
+            response = e.response
+            if response is None:
+                return 502, {"error": "unknown"}, {}
+            try:
+                data = response.json()
+            except ValueError:
+                data = {"error": "unknown"}
+            headers = {}
+            if "Retry-After" in response.headers:
+                headers["Retry-After"] = response.headers["Retry-After"]
+            return response.status_code, data, headers
+        except requests.Timeout:
+            return 504, {"error": "upstream_timeout"}, {}
+        except requests.ConnectionError:
+            return 502, {"error": "upstream_unavailable"}, {}
+        except Exception:
+            return 500, {"error": "unknown"}, {}
+
+    def stats(self) -> Dict[str, Any]:
+        """Count the requests received, and the ones the shared client saved.
+
+        :return: A dictionary with the `requests` received by endpoint, the
+        `coalescing` stats of the client and the stats of its `cache`, if any.
+        """
+        with self._counter_lock:
+            received = dict(self.requests)
+        cache = self.lemmy.response_cache
+        return {
+            "requests": received,
+            "coalescing": self.lemmy.coalescing_stats(),
+            "cache": cache.stats() if cache is not None else {},
+        }
+
+    def start(self):
+        """Start serving requests in a background thread."""
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="pylemmy-proxy", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving requests, and remove the socket."""
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def server_close(self):
+        """Close the socket, and remove its file."""
+        super().server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def __enter__(self) -> "LemmyProxy":
+        """Serve requests until the end of the context."""
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        """Stop serving requests."""
+        self.stop()
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """Run a proxy until interrupted.
+
+    The credentials are read from the `LEMMY_USERNAME` and `LEMMY_PASSWORD`
+    environment variables, if set.
+
+    :param argv: Command line arguments, defaulting to `sys.argv[1:]`.
+    """
+    parser = argparse.ArgumentParser(description="Share a Lemmy client between bots.")
+    parser.add_argument("--url", required=True, help="URL of the Lemmy instance")
+    parser.add_argument("--socket", required=True, help="path to the unix socket")
+    parser.add_argument("--user-agent", default="pylemmy proxy")
+    parser.add_argument("--requests-per-second", type=float)
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument(
+        "--cache", help="path to an SQLite file caching responses, instead of memory"
+    )
+    parser.add_argument(
+        "--listing-ttl",
+        type=float,
+        default=2,
+        help="seconds the responses of GetPosts and GetComments are cached",
+    )
+    parser.add_argument(
+        "--stale-ttl",
+        type=float,
+        default=0,
+        help="seconds expired responses are served while being refreshed",
+    )
+    parser.add_argument(
+        "--mode", type=lambda x: int(x, 8), default=0o600, help="socket permissions"
+    )
+    args = parser.parse_args(argv)
+
+    ttls = {
+        **DEFAULT_TTLS,
+        LemmyAPI.GetPosts: args.listing_ttl,
+        LemmyAPI.GetComments: args.listing_ttl,
+    }
+    backend = (
+        SQLiteCacheBackend(args.cache, max_age=max(ttls.values()) + args.stale_ttl)
+        if args.cache
+        else None
+    )
+    lemmy = pylemmy.Lemmy(
+        args.url,
+        os.environ.get("LEMMY_USERNAME"),
+        os.environ.get("LEMMY_PASSWORD"),
+        args.user_agent,
+        requests_per_second=args.requests_per_second,
+        burst=args.burst,
+        response_cache=ResponseCache(ttls, backend=backend, stale_ttl=args.stale_ttl),
+    )
+    with LemmyProxy(lemmy, args.socket, mode=args.mode) as proxy:
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+    lemmy.close()
+    print(proxy.stats())  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
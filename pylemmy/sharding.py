@@ -0,0 +1,422 @@
+"""Implements streams split across several workers, which deliver each item once."""
+
+import bisect
+import datetime
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Protocol,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+import pylemmy
+from pylemmy.models.comment import Comment
+from pylemmy.models.community import Community, MultiCommunityStream
+from pylemmy.models.post import Post
+from pylemmy.utils import parse_time
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), "big"
+    )
+
+
+class ConsistentHashRing:
+    """Assigns keys to nodes, moving few keys when nodes are added or removed.
+
+    Each node is placed at `replicas` points of a ring of hashes, and a key belongs
+    to the node at the first point after the key's hash. Adding a node to a ring of
+    `n` moves about `1 / (n + 1)` of the keys, all to the new node.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), *, replicas: int = 100):
+        """Initialize a ConsistentHashRing.
+
+        :param nodes: Names of the nodes.
+        :param replicas: Number of points of each node on the ring. More points
+        spread the keys more evenly.
+        """
+        self.replicas = replicas
+
+        self._points: List[Tuple[int, str]] = []
+        self._nodes: Set[str] = set()
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        """Names of the nodes, sorted."""
+        return sorted(self._nodes)
+
+    def add(self, node: str):
+        """Add a node to the ring.
+
+        :param node: Name of the node.
+        """
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        for replica in range(self.replicas):
+            bisect.insort(self._points, (_hash(f"{node}#{replica}"), node))
+
+    def remove(self, node: str):
+        """Remove a node from the ring.
+
+        :param node: Name of the node.
+        """
+        self._nodes.discard(node)
+        self._points = [p for p in self._points if p[1] != node]
+
+    def node_for(self, key: str) -> str:
+        """Get the node a key belongs to.
+
+        :param key: The key, e.g. a community name.
+        """
+        if not self._points:
+            msg = "The ring has no nodes."
+            raise LookupError(msg)
+        index = bisect.bisect(self._points, (_hash(key), ""))
+        return self._points[index % len(self._points)][1]
+
+    def nodes_for(self, key: str, n: int) -> List[str]:
+        """Get the `n` distinct nodes following a key on the ring.
+
+        The first one is [node_for][pylemmy.sharding.ConsistentHashRing.node_for],
+        and the others are the nodes taking over the key if it is removed.
+
+        :param key: The key, e.g. a community name.
+        :param n: Number of nodes, at most the number of nodes of the ring.
+        """
+        index = bisect.bisect(self._points, (_hash(key), ""))
+        nodes: List[str] = []
+        for offset in range(len(self._points)):
+            if len(nodes) >= n:
+                break
+            node = self._points[(index + offset) % len(self._points)][1]
+            if node not in nodes:
+                nodes.append(node)
+        return nodes
+
+    def assign(self, keys: Iterable[str]) -> Dict[str, List[str]]:
+        """Split keys between the nodes.
+
+        :param keys: The keys to split.
+        :return: The keys of each node, in their original order.
+        """
+        assignments: Dict[str, List[str]] = {node: [] for node in self.nodes}
+        for key in keys:
+            assignments[self.node_for(key)].append(key)
+        return assignments
+
+    def __len__(self) -> int:
+        """Number of nodes."""
+        return len(self._nodes)
+
+
+class DedupStore(Protocol):
+    """Interface of the storage shared by [StreamWorker][pylemmy.sharding.StreamWorker].
+
+    It must be safe to use from several threads, and from all the workers sharing
+    it.
+    """
+
+    def claim(self, keys: Sequence[str]) -> List[bool]:
+        """Mark keys as seen, and tell which ones weren't seen before, atomically."""
+
+    def get_checkpoint(self, source: str) -> Optional[str]:
+        """Get the checkpoint of a source, if it has one."""
+
+    def set_checkpoint(self, source: str, value: str):
+        """Set the checkpoint of a source."""
+
+    def prune(self, before: float):
+        """Forget the keys claimed before a time."""
+
+
+class MemoryDedupStore:
+    """Keeps the seen keys in memory, to share them between workers in one process."""
+
+    def __init__(self):
+        """Initialize a MemoryDedupStore."""
+        self._keys: Dict[str, float] = {}
+        self._checkpoints: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, keys: Sequence[str]) -> List[bool]:
+        """Mark keys as seen, and tell which ones weren't seen before.
+
+        :param keys: Unique keys of items.
+        :return: For each key, whether it is new (and now claimed by the caller).
+        """
+        now = time.time()
+        new = []
+        with self._lock:
+            for key in keys:
+                new.append(key not in self._keys)
+                self._keys.setdefault(key, now)
+        return new
+
+    def get_checkpoint(self, source: str) -> Optional[str]:
+        """Get the checkpoint of a source, if it has one.
+
+        :param source: Name of the source.
+        """
+        with self._lock:
+            return self._checkpoints.get(source)
+
+    def set_checkpoint(self, source: str, value: str):
+        """Set the checkpoint of a source.
+
+        :param source: Name of the source.
+        :param value: The checkpoint.
+        """
+        with self._lock:
+            self._checkpoints[source] = value
+
+    def prune(self, before: float):
+        """Forget the keys claimed before a time.
+
+        :param before: A Unix timestamp.
+        """
+        with self._lock:
+            self._keys = {k: t for k, t in self._keys.items() if t >= before}
+
+    def __len__(self) -> int:
+        """Number of keys seen."""
+        return len(self._keys)
+
+
+class SQLiteDedupStore:
+    """Keeps the seen keys in an SQLite file, shared by workers on the same host."""
+
+    def __init__(self, path: str):
+        """Initialize an SQLiteDedupStore.
+
+        :param path: Path to the SQLite database file.
+        """
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS seen "
+                "(key TEXT PRIMARY KEY, claimed_at REAL) WITHOUT ROWID"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS seen_claimed_at ON seen (claimed_at)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints "
+                "(source TEXT PRIMARY KEY, value TEXT)"
+            )
+
+    def claim(self, keys: Sequence[str]) -> List[bool]:
+        """Mark keys as seen, and tell which ones weren't seen before.
+
+        Keys are claimed in a single transaction, so that when workers claim the
+        same key, exactly one of them gets it.
+
+        :param keys: Unique keys of items.
+        :return: For each key, whether it is new (and now claimed by the caller).
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            return [
+                self._connection.execute(
+                    "INSERT OR IGNORE INTO seen VALUES (?, ?)", (key, now)
+                ).rowcount
+                == 1
+                for key in keys
+            ]
+
+    def get_checkpoint(self, source: str) -> Optional[str]:
+        """Get the checkpoint of a source, if it has one.
+
+        :param source: Name of the source.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM checkpoints WHERE source = ?", (source,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def set_checkpoint(self, source: str, value: str):
+        """Set the checkpoint of a source.
+
+        :param source: Name of the source.
+        :param value: The checkpoint.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?)", (source, value)
+            )
+
+    def prune(self, before: float):
+        """Forget the keys claimed before a time.
+
+        :param before: A Unix timestamp.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM seen WHERE claimed_at < ?", (before,))
+
+    def __len__(self) -> int:
+        """Number of keys seen."""
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+
+def _community_key(community: Union[int, str, Community]) -> str:
+    if isinstance(community, Community):
+        return str(community.safe.id)
+    return str(community)
+
+
+class StreamWorker:
+    """Streams the communities assigned to one worker of a fleet.
+
+    Communities are split between the workers with a
+    [ConsistentHashRing][pylemmy.sharding.ConsistentHashRing], on their ids or
+    names as given. All the workers share a [DedupStore][pylemmy.sharding.DedupStore],
+    so that an item is delivered by a single worker, even while communities move
+    between workers after a change of the fleet, or after a restart.
+
+    The store also keeps a checkpoint per source: the `published` time of the
+    newest item delivered. Items published more than `replay_window` before it
+    are dropped without checking the store, so keys older than that can be pruned.
+
+    Example:
+
+        store = SQLiteDedupStore("/var/lib/bot/dedup.sqlite")
+        worker = StreamWorker(
+            lemmy, communities, worker="bot-2", workers=["bot-1", "bot-2"], store=store
+        )
+        worker.content_apply(process_content)
+    """
+
+    def __init__(
+        self,
+        lemmy: "pylemmy.Lemmy",
+        communities: Iterable[Union[int, str, Community]],
+        *,
+        worker: str,
+        workers: Sequence[str],
+        store: DedupStore,
+        replicas: int = 100,
+        replay_window: float = 3600,
+    ):
+        """Initialize a StreamWorker.
+
+        :param lemmy: A Lemmy instance.
+        :param communities: All the communities streamed by the fleet, as ids,
+        names or instances of [Community][pylemmy.models.community.Community]. Every
+        worker must be given the same identifiers.
+        :param worker: Name of this worker.
+        :param workers: Names of all the workers of the fleet, including this one.
+        :param store: The store shared by all the workers.
+        :param replicas: Number of points of each worker on the hash ring.
+        :param replay_window: Time (in seconds) before the checkpoint of a source
+        from which items are still checked against the store.
+        """
+        if worker not in workers:
+            msg = f"Worker {worker!r} isn't one of the workers {list(workers)}."
+            raise ValueError(msg)
+        self.lemmy = lemmy
+        self.worker = worker
+        self.store = store
+        self.replay_window = replay_window
+        self.ring = ConsistentHashRing(workers, replicas=replicas)
+
+        self.assigned = [
+            c for c in communities if self.ring.node_for(_community_key(c)) == worker
+        ]
+        self.stream: MultiCommunityStream = lemmy.multi_communities_stream(
+            self.assigned
+        )
+        self.delivered = 0
+        self.duplicates = 0
+
+        self._checkpoints: Dict[str, datetime.datetime] = {}
+
+    def _deliver(
+        self, callback: Callable[[Any], Any]
+    ) -> Callable[[Union[Post, Comment]], None]:
+        def deliver(item: Union[Post, Comment]):
+            if isinstance(item, Post):
+                key = "post_" + str(item.post_view.post.ap_id)
+                source = f"posts/{item.post_view.community.id}"
+                published = item.post_view.post.published
+            else:
+                key = "comment_" + str(item.comment_view.comment.ap_id)
+                source = f"comments/{item.comment_view.community.id}"
+                published = item.comment_view.comment.published
+
+            checkpoint = self._checkpoint(source)
+            moment = parse_time(published)
+            if checkpoint is not None and (
+                (checkpoint - moment).total_seconds() > self.replay_window
+            ):
+                self.duplicates += 1
+                return
+            if not self.store.claim([key])[0]:
+                self.duplicates += 1
+                return
+
+            callback(item)
+            self.delivered += 1
+            if checkpoint is None or moment > checkpoint:
+                self._checkpoints[source] = moment
+                self.store.set_checkpoint(source, published)
+
+        return deliver
+
+    def _checkpoint(self, source: str) -> Optional[datetime.datetime]:
+        if source not in self._checkpoints:
+            value = self.store.get_checkpoint(source)
+            if value is None:
+                return None
+            self._checkpoints[source] = parse_time(value)
+        return self._checkpoints[source]
+
+    def posts_apply(self, callback: Callable[[Post], Any], **kwargs):
+        """Apply a callback function to the new Posts of the assigned communities.
+
+        :param callback: Function that will be called once per Post, across the
+        fleet.
+        :param kwargs: See
+        [posts_apply][pylemmy.models.community.MultiCommunityStream.posts_apply].
+        """
+        self.stream.posts_apply(self._deliver(callback), **kwargs)
+
+    def comments_apply(self, callback: Callable[[Comment], Any], **kwargs):
+        """Apply a callback function to the new Comments of the assigned communities.
+
+        :param callback: Function that will be called once per Comment, across the
+        fleet.
+        :param kwargs: See
+        [comments_apply][pylemmy.models.community.MultiCommunityStream.comments_apply].
+        """
+        self.stream.comments_apply(self._deliver(callback), **kwargs)
+
+    def content_apply(self, callback: Callable[[Union[Post, Comment]], Any], **kwargs):
+        """Apply a callback function to the new content of the assigned communities.
+
+        :param callback: Function that will be called once per Post or Comment,
+        across the fleet.
+        :param kwargs: See
+        [content_apply][pylemmy.models.community.MultiCommunityStream.content_apply].
+        """
+        self.stream.content_apply(self._deliver(callback), **kwargs)
@@ -0,0 +1 @@
+"""Tools to test and benchmark code using pylemmy, without a Lemmy instance."""
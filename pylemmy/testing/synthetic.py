@@ -0,0 +1,583 @@
+"""Generates synthetic Lemmy content, for tests and benchmarks."""
+
+import collections
+import datetime
+import itertools
+import random
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pylemmy import api
+from pylemmy.endpoints import LemmyAPI
+
+_EPOCH = datetime.datetime(2023, 6, 1, 12, tzinfo=datetime.timezone.utc)
+_WORDS = (
+    "lemmy federation post comment community python rust question answer news "
+    "update release bug feature cat dog music game science art photo help"
+).split()
+
+
+def timestamp(seconds: float = 0) -> str:
+    """Format a time as Lemmy does, as an offset from a fixed date.
+
+    :param seconds: Seconds after the fixed date.
+    """
+    return format_time(_EPOCH + datetime.timedelta(seconds=seconds))
+
+
+def format_time(moment: datetime.datetime) -> str:
+    """Format a time as Lemmy does.
+
+    :param moment: A time, in UTC.
+    """
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+def make_person(person_id: int, host: str = "lemmy.test") -> api.base.Person:
+    """Build a Person.
+
+    :param person_id: Id of the person.
+    :param host: Host of the instance the person belongs to.
+    """
+    return api.base.Person(
+        actor_id=f"https://{host}/u/user{person_id}",
+        banned=False,
+        bot_account=False,
+        deleted=False,
+        id=person_id,
+        instance_id=1,
+        local=True,
+        name=f"user{person_id}",
+        published=timestamp(),
+    )
+
+
+def make_community(community_id: int, host: str = "lemmy.test") -> api.base.Community:
+    """Build a Community.
+
+    :param community_id: Id of the community.
+    :param host: Host of the instance the community belongs to.
+    """
+    return api.base.Community(
+        actor_id=f"https://{host}/c/community{community_id}",
+        deleted=False,
+        hidden=False,
+        id=community_id,
+        instance_id=1,
+        local=True,
+        name=f"community{community_id}",
+        nsfw=False,
+        posting_restricted_to_mods=False,
+        published=timestamp(),
+        removed=False,
+        title=f"Community {community_id}",
+    )
+
+
+def make_community_view(
+    community_id: int, host: str = "lemmy.test"
+) -> api.community.CommunityView:
+    """Build a CommunityView.
+
+    :param community_id: Id of the community.
+    :param host: Host of the instance the community belongs to.
+    """
+    return api.community.CommunityView(
+        blocked=False,
+        community=make_community(community_id, host),
+        counts=api.community.CommunityAggregates(
+            comments=0,
+            community_id=community_id,
+            posts=0,
+            published=timestamp(),
+            subscribers=1,
+            users_active_day=1,
+            users_active_half_year=1,
+            users_active_month=1,
+            users_active_week=1,
+        ),
+        subscribed=api.base.SubscribedType.NotSubscribed,
+    )
+
+
+def make_post(
+    post_id: int,
+    name: str = "A post",
+    body: Optional[str] = None,
+    *,
+    community_id: int = 1,
+    published: Optional[str] = None,
+    host: str = "lemmy.test",
+) -> api.base.Post:
+    """Build a Post.
+
+    :param post_id: Id of the post.
+    :param name: Title of the post.
+    :param body: Body of the post.
+    :param community_id: Id of the community of the post.
+    :param published: When the post was published.
+    :param host: Host of the instance the post was made on.
+    """
+    return api.base.Post(
+        ap_id=f"https://{host}/post/{post_id}",
+        body=body,
+        community_id=community_id,
+        creator_id=1,
+        deleted=False,
+        featured_local=False,
+        id=post_id,
+        language_id=0,
+        local=True,
+        locked=False,
+        name=name,
+        nsfw=False,
+        published=published or timestamp(),
+        removed=False,
+    )
+
+
+def make_post_view(
+    post_id: int,
+    name: str = "A post",
+    body: Optional[str] = None,
+    *,
+    community_id: int = 1,
+    published: Optional[str] = None,
+    host: str = "lemmy.test",
+) -> api.post.PostView:
+    """Build a PostView.
+
+    :param post_id: Id of the post.
+    :param name: Title of the post.
+    :param body: Body of the post.
+    :param community_id: Id of the community of the post.
+    :param published: When the post was published.
+    :param host: Host of the instance the post was made on.
+    """
+    post = make_post(
+        post_id,
+        name,
+        body,
+        community_id=community_id,
+        published=published,
+        host=host,
+    )
+    return api.post.PostView(
+        community=make_community(community_id, host),
+        counts=api.post.PostAggregates(
+            comments=0,
+            downvotes=0,
+            newest_comment_time=post.published,
+            post_id=post_id,
+            published=post.published,
+            score=1,
+            upvotes=1,
+        ),
+        creator=make_person(1, host),
+        creator_banned_from_community=False,
+        creator_blocked=False,
+        post=post,
+        read=False,
+        saved=False,
+        subscribed=api.base.SubscribedType.NotSubscribed,
+        unread_comments=0,
+    )
+
+
+def make_comment_view(
+    comment_id: int,
+    content: str = "A comment",
+    post_id: int = 1,
+    *,
+    community_id: int = 1,
+    published: Optional[str] = None,
+    host: str = "lemmy.test",
+) -> api.comment.CommentView:
+    """Build a CommentView.
+
+    :param comment_id: Id of the comment.
+    :param content: Content of the comment.
+    :param post_id: Id of the post the comment is under.
+    :param community_id: Id of the community of the comment.
+    :param published: When the comment was published.
+    :param host: Host of the instance the comment was made on.
+    """
+    published = published or timestamp()
+    return api.comment.CommentView(
+        comment=api.base.Comment(
+            id=comment_id,
+            creator_id=1,
+            post_id=post_id,
+            content=content,
+            removed=False,
+            published=published,
+            deleted=False,
+            ap_id=f"https://{host}/comment/{comment_id}",
+            local=True,
+            path=f"0.{comment_id}",
+            distinguished=False,
+            language_id=0,
+        ),
+        community=make_community(community_id, host),
+        counts=api.comment.CommentAggregates(
+            comment_id=comment_id,
+            score=1,
+            upvotes=1,
+            downvotes=0,
+            published=published,
+            child_count=0,
+        ),
+        creator=make_person(1, host),
+        creator_banned_from_community=False,
+        creator_blocked=False,
+        post=make_post(post_id, community_id=community_id, host=host),
+        saved=False,
+        subscribed=api.base.SubscribedType.NotSubscribed,
+    )
+
+
+Route = Callable[[Dict[str, Any]], Any]
+
+
+class SyntheticInstance:
+    """An in-memory Lemmy instance, with generated communities, posts and comments.
+
+    The responses are JSON-like dictionaries, as returned by a real instance. It is
+    safe to add content from one thread while others read it.
+    """
+
+    def __init__(
+        self,
+        n_communities: int = 1,
+        *,
+        host: str = "lemmy.test",
+        seed: int = 0,
+        realtime: bool = False,
+        page_cursors: bool = False,
+    ):
+        """Initialize a SyntheticInstance.
+
+        :param n_communities: Number of communities to create, with ids starting at 1.
+        :param host: Host name used in the generated `ap_id`s.
+        :param seed: Seed for the random generation of content.
+        :param realtime: If `True`, new content is published at the current time.
+        Otherwise, each new item is published one second after the previous one,
+        starting from a fixed date.
+        :param page_cursors: If `True`, posts are paginated with cursors, as in Lemmy
+        0.19 and later.
+        """
+        self.host = host
+        self.realtime = realtime
+        self.page_cursors = page_cursors
+        self.communities: Dict[int, Dict[str, Any]] = {
+            i: make_community_view(i, host).model_dump()
+            for i in range(1, n_communities + 1)
+        }
+        # Newest content last.
+        self.posts: List[Dict[str, Any]] = []
+        self.comments: List[Dict[str, Any]] = []
+
+        self._posts_by_id: Dict[int, Dict[str, Any]] = {}
+        self._comments_by_id: Dict[int, Dict[str, Any]] = {}
+        self._posts_by_community: Dict[int, List[Dict[str, Any]]] = (
+            collections.defaultdict(list)
+        )
+        self._comments_by_community: Dict[int, List[Dict[str, Any]]] = (
+            collections.defaultdict(list)
+        )
+        self._comments_by_post: Dict[int, List[Dict[str, Any]]] = (
+            collections.defaultdict(list)
+        )
+        self._random = random.Random(seed)  # noqa: S311
+        self._ids = itertools.count(1)
+        self._clock = 0.0
+        self._lock = threading.Lock()
+
+    def _text(self, n_words: int) -> str:
+        return " ".join(self._random.choices(_WORDS, k=n_words))
+
+    def _published(self) -> str:
+        if self.realtime:
+            return format_time(datetime.datetime.now(datetime.timezone.utc))
+        self._clock += 1
+        return timestamp(self._clock)
+
+    def add_post(
+        self,
+        community_id: Optional[int] = None,
+        name: Optional[str] = None,
+        body: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Add a new post.
+
+        :param community_id: Community of the post, random if not given.
+        :param name: Title of the post, random if not given.
+        :param body: Body of the post, random if not given.
+        :return: The PostView of the new post.
+        """
+        with self._lock:
+            if community_id is None:
+                community_id = self._random.randint(1, len(self.communities))
+            view = make_post_view(
+                next(self._ids),
+                name or self._text(6),
+                body or self._text(30),
+                community_id=community_id,
+                published=self._published(),
+                host=self.host,
+            ).model_dump()
+            self.posts.append(view)
+            self._posts_by_id[view["post"]["id"]] = view
+            self._posts_by_community[community_id].append(view)
+        return view
+
+    def add_comment(
+        self, post_id: Optional[int] = None, content: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Add a new comment.
+
+        :param post_id: Post the comment is under, random if not given.
+        :param content: Content of the comment, random if not given.
+        :return: The CommentView of the new comment.
+        """
+        with self._lock:
+            post = (
+                self._random.choice(self.posts)
+                if post_id is None
+                else self._posts_by_id[post_id]
+            )
+            community_id = post["community"]["id"]
+            view = make_comment_view(
+                next(self._ids),
+                content or self._text(20),
+                post["post"]["id"],
+                community_id=community_id,
+                published=self._published(),
+                host=self.host,
+            ).model_dump()
+            self.comments.append(view)
+            self._comments_by_id[view["comment"]["id"]] = view
+            self._comments_by_community[community_id].append(view)
+            self._comments_by_post[post["post"]["id"]].append(view)
+        return view
+
+    def vote(
+        self,
+        *,
+        post_id: Optional[int] = None,
+        comment_id: Optional[int] = None,
+        upvotes: int = 0,
+        downvotes: int = 0,
+    ):
+        """Add votes to a post or a comment.
+
+        :param post_id: Id of the post.
+        :param comment_id: Id of the comment, if no post is given.
+        :param upvotes: Number of upvotes to add.
+        :param downvotes: Number of downvotes to add.
+        """
+        with self._lock:
+            if post_id is not None:
+                counts = self._posts_by_id[post_id]["counts"]
+            elif comment_id is not None:
+                counts = self._comments_by_id[comment_id]["counts"]
+            else:
+                msg = "Need to give either a post id or a comment id."
+                raise ValueError(msg)
+            counts["upvotes"] += upvotes
+            counts["downvotes"] += downvotes
+            counts["score"] += upvotes - downvotes
+
+    def edit(
+        self,
+        *,
+        post_id: Optional[int] = None,
+        comment_id: Optional[int] = None,
+        **fields: Any,
+    ):
+        """Change fields of a post or a comment, e.g. `removed=True`.
+
+        Changing its `name`, `body` or `content` also sets its `updated` time.
+
+        :param post_id: Id of the post.
+        :param comment_id: Id of the comment, if no post is given.
+        :param fields: New values of the fields of the post or comment.
+        """
+        with self._lock:
+            if post_id is not None:
+                item = self._posts_by_id[post_id]["post"]
+            elif comment_id is not None:
+                item = self._comments_by_id[comment_id]["comment"]
+            else:
+                msg = "Need to give either a post id or a comment id."
+                raise ValueError(msg)
+            item.update(fields)
+            if {"name", "body", "content"} & fields.keys():
+                item["updated"] = self._published()
+
+    def generate(self, n_posts: int, n_comments: int = 0):
+        """Add random posts and comments.
+
+        :param n_posts: Number of posts to add.
+        :param n_comments: Number of comments to add, under random posts.
+        """
+        for _ in range(n_posts):
+            self.add_post()
+        for _ in range(n_comments):
+            self.add_comment()
+
+    @staticmethod
+    def _page(items: List[Dict[str, Any]], params: Dict[str, Any]):
+        limit = int(params.get("limit") or 10)
+        page = int(params.get("page") or 1)
+        end = len(items) - (page - 1) * limit
+        return items[max(end - limit, 0) : max(end, 0)][::-1]
+
+    def get_posts(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a GetPosts request, newest posts first."""
+        community_id = params.get("community_id")
+        with self._lock:
+            posts = (
+                self.posts
+                if community_id is None
+                else self._posts_by_community.get(int(community_id), [])
+            )
+            cursor = params.get("page_cursor")
+            if not self.page_cursors:
+                return {"posts": self._page(posts, params)}
+            if cursor is not None:
+                # Posts older than the last one of the previous page.
+                last_id = int(cursor[1:])
+                posts = [p for p in posts if p["post"]["id"] < last_id]
+                params = {**params, "page": 1}
+            page = self._page(posts, params)
+            next_page = f"P{page[-1]['post']['id']}" if page else None
+            return {"posts": page, "next_page": next_page}
+
+    def get_comments(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a GetComments request, newest comments first."""
+        community_id = params.get("community_id")
+        post_id = params.get("post_id")
+        with self._lock:
+            if post_id is not None:
+                comments = self._comments_by_post.get(int(post_id), [])
+            elif community_id is not None:
+                comments = self._comments_by_community.get(int(community_id), [])
+            else:
+                comments = self.comments
+            return {"comments": self._page(comments, params)}
+
+    def get_community(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a GetCommunity request."""
+        if params.get("id") is not None:
+            view = self.communities[int(params["id"])]
+        else:
+            view = next(
+                c
+                for c in self.communities.values()
+                if c["community"]["name"] == params.get("name")
+            )
+        return {"community_view": view, "discussion_languages": [], "moderators": []}
+
+    def list_communities(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a ListCommunities request."""
+        communities = list(self.communities.values())[::-1]
+        return {"communities": self._page(communities, params)}
+
+    def get_post(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a GetPost request."""
+        post = self._posts_by_id[int(params["id"])]
+        return {
+            "community_view": self.communities[post["community"]["id"]],
+            "cross_posts": [],
+            "moderators": [],
+            "post_view": post,
+        }
+
+    def get_comment(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a GetComment request."""
+        return {
+            "comment_view": self._comments_by_id[int(params["id"])],
+            "recipient_ids": [],
+        }
+
+    def get_person(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a GetPersonDetails request. All content is by the same person."""
+        person_id = int(params.get("person_id") or 1)
+        return {
+            "comments": [],
+            "moderates": [],
+            "person_view": {
+                "counts": {
+                    "comment_count": len(self.comments),
+                    "comment_score": len(self.comments),
+                    "id": person_id,
+                    "person_id": person_id,
+                    "post_count": len(self.posts),
+                    "post_score": len(self.posts),
+                },
+                "person": make_person(person_id, self.host).model_dump(),
+            },
+            "posts": [],
+        }
+
+    def get_site(self, params: Dict[str, Any]) -> Dict[str, Any]:  # noqa: ARG002
+        """Answer a GetSite request."""
+        return {
+            "site_view": {
+                "site": {
+                    "actor_id": f"https://{self.host}/",
+                    "id": 1,
+                    "inbox_url": f"https://{self.host}/site_inbox",
+                    "instance_id": 1,
+                    "last_refreshed_at": timestamp(),
+                    "name": self.host,
+                    "public_key": "",
+                    "published": timestamp(),
+                },
+            },
+            "admins": [],
+            "version": "synthetic",
+        }
+
+    def create_post(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a CreatePost request."""
+        post = self.add_post(
+            int(params["community_id"]), params["name"], params.get("body")
+        )
+        return {"post_view": post}
+
+    def create_comment(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a CreateComment request."""
+        comment = self.add_comment(int(params["post_id"]), params["content"])
+        return {"comment_view": comment, "recipient_ids": []}
+
+    @staticmethod
+    def login(params: Dict[str, Any]) -> Dict[str, Any]:  # noqa: ARG004
+        """Answer a Login request, accepting any credentials."""
+        return {
+            "jwt": "synthetic-token",
+            "registration_created": False,
+            "verify_email_sent": False,
+        }
+
+    def routes(self) -> Dict[Tuple[str, LemmyAPI], Route]:
+        """Map the (method, endpoint) of requests to the functions answering them.
+
+        Reports aren't supported: they are always listed as empty.
+        """
+        return {
+            ("GET", LemmyAPI.GetPosts): self.get_posts,
+            ("GET", LemmyAPI.GetComments): self.get_comments,
+            ("GET", LemmyAPI.Community): self.get_community,
+            ("GET", LemmyAPI.ListCommunities): self.list_communities,
+            ("GET", LemmyAPI.Post): self.get_post,
+            ("GET", LemmyAPI.Comment): self.get_comment,
+            ("GET", LemmyAPI.Person): self.get_person,
+            ("GET", LemmyAPI.GetSite): self.get_site,
+            ("GET", LemmyAPI.ListPostReports): lambda _: {"post_reports": []},
+            ("GET", LemmyAPI.ListCommentReports): lambda _: {"comment_reports": []},
+            ("POST", LemmyAPI.Login): self.login,
+            ("POST", LemmyAPI.Post): self.create_post,
+            ("POST", LemmyAPI.Comment): self.create_comment,
+        }
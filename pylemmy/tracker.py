@@ -0,0 +1,443 @@
+"""Implements a tracker of the vote counts of posts and comments over time."""
+
+import array
+import collections
+import functools
+import math
+import threading
+import time
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+import pylemmy
+from pylemmy import api
+from pylemmy.endpoints import LemmyAPI
+from pylemmy.models.comment import Comment
+from pylemmy.models.post import Post
+from pylemmy.utils import parse_time, run_concurrently
+
+POST_FIELDS = ("score", "upvotes", "downvotes", "comments")
+"""Counters of [PostAggregates][pylemmy.api.post.PostAggregates] tracked for posts."""
+
+COMMENT_FIELDS = ("score", "upvotes", "downvotes", "child_count")
+"""Counters of [CommentAggregates][pylemmy.api.comment.CommentAggregates] tracked
+for comments."""
+
+
+class CounterSeries:
+    """Ring buffer of the timestamped counters of one post or comment.
+
+    The samples are stored in flat typed arrays (8 bytes per value), instead of
+    the whole views, and the oldest ones are overwritten once it is full.
+    """
+
+    def __init__(self, fields: Sequence[str], capacity: int):
+        """Initialize an empty CounterSeries.
+
+        :param fields: Names of the counters.
+        :param capacity: Maximum number of samples kept.
+        """
+        if capacity < 2:  # noqa: PLR2004
+            msg = f"Need a capacity of at least 2 samples, got {capacity}."
+            raise ValueError(msg)
+        self.capacity = capacity
+        self._times = array.array("d", [0.0]) * capacity
+        self._values = {field: array.array("q", [0]) * capacity for field in fields}
+        # Position of the oldest sample.
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        """Number of samples kept."""
+        return self._size
+
+    def append(self, timestamp: float, counts: Dict[str, int]):
+        """Add a sample, overwriting the oldest one if the buffer is full.
+
+        :param timestamp: Time of the sample (in seconds since the epoch).
+        :param counts: Value of each counter.
+        """
+        i = (self._start + self._size) % self.capacity
+        if self._size == self.capacity:
+            self._start = (self._start + 1) % self.capacity
+        else:
+            self._size += 1
+        self._times[i] = timestamp
+        for field, values in self._values.items():
+            values[i] = counts[field]
+
+    def _position(self, n: int) -> int:
+        return (self._start + n) % self.capacity
+
+    def timestamps(self) -> List[float]:
+        """Get the times of the samples, oldest first."""
+        return [self._times[self._position(n)] for n in range(self._size)]
+
+    def values(self, field: str) -> List[int]:
+        """Get the values of a counter, oldest first.
+
+        :param field: Name of the counter.
+        """
+        values = self._values[field]
+        return [values[self._position(n)] for n in range(self._size)]
+
+    def _sample(self, field: str, n: int) -> Tuple[float, int]:
+        if self._size == 0:
+            msg = "The series has no samples."
+            raise IndexError(msg)
+        i = self._position(n)
+        return self._times[i], self._values[field][i]
+
+    def oldest(self, field: str) -> Tuple[float, int]:
+        """Get the first sample of a counter still kept.
+
+        :param field: Name of the counter.
+        :return: The time and value of the sample.
+        """
+        return self._sample(field, 0)
+
+    def latest(self, field: str) -> Tuple[float, int]:
+        """Get the last sample of a counter.
+
+        :param field: Name of the counter.
+        :return: The time and value of the sample.
+        """
+        return self._sample(field, self._size - 1)
+
+    def at(self, field: str, timestamp: float) -> Optional[Tuple[float, int]]:
+        """Get the last sample of a counter taken at or before a time.
+
+        :param field: Name of the counter.
+        :param timestamp: The time.
+        :return: The time and value of the sample, or `None` if all the samples are
+        more recent.
+        """
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._times[self._position(mid)] <= timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None if lo == 0 else self._sample(field, lo - 1)
+
+
+class ScoreTracker:
+    """Tracks how the vote counts of posts or comments change over time.
+
+    Each [poll][pylemmy.tracker.ScoreTracker.poll] re-fetches all the watched items
+    and stores their counters (see `POST_FIELDS` and `COMMENT_FIELDS`) in a
+    [CounterSeries][pylemmy.tracker.CounterSeries] per item. The items are fetched
+    in batches: the newest posts of each community (or comments of each post) are
+    listed, a page of `page_size` items per request, and only the items missing
+    from these listings are fetched one by one. Communities are polled
+    concurrently.
+
+    Items older than `max_age` stop being tracked, so that the tracker follows the
+    first hours of each item, when brigading shows.
+
+    Example:
+
+        tracker = ScoreTracker(lemmy)
+        for post in community.get_posts(sort="New"):
+            tracker.watch([post])
+        while True:
+            tracker.poll()
+            for post_id in tracker.outliers("downvotes", window=600):
+                alert(post_id)
+            time.sleep(60)
+    """
+
+    def __init__(
+        self,
+        lemmy: "pylemmy.Lemmy",
+        kind: str = "posts",
+        *,
+        capacity: int = 360,
+        max_age: Optional[float] = 6 * 3600,
+        page_size: int = 50,
+        max_pages: int = 2,
+        max_workers: int = 8,
+    ):
+        """Initialize a ScoreTracker, watching no items.
+
+        :param lemmy: The client fetching the items.
+        :param kind: Either `"posts"` or `"comments"`.
+        :param capacity: Number of samples kept per item.
+        :param max_age: Age (in seconds since publication) after which items stop
+        being tracked, or `None` to track them until they are unwatched.
+        :param page_size: Number of items per listing request.
+        :param max_pages: Maximum number of listing pages requested per community
+        (or post) and poll, before fetching the remaining items one by one.
+        :param max_workers: Maximum number of concurrent requests.
+        """
+        if kind not in ("posts", "comments"):
+            msg = f"Unknown kind {kind!r}, expected 'posts' or 'comments'."
+            raise ValueError(msg)
+        self.lemmy = lemmy
+        self.kind = kind
+        self.fields = POST_FIELDS if kind == "posts" else COMMENT_FIELDS
+        self.capacity = capacity
+        self.max_age = max_age
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.max_workers = max_workers
+        # Number of listing requests, and of items fetched one by one.
+        self.listing_requests = 0
+        self.single_requests = 0
+
+        self._lock = threading.Lock()
+        self._series: Dict[int, CounterSeries] = {}
+        # Community (or post, for comments) of each item, if known yet.
+        self._groups: Dict[int, Optional[int]] = {}
+        self._published: Dict[int, float] = {}
+
+    def __len__(self) -> int:
+        """Number of items tracked."""
+        return len(self._groups)
+
+    def __contains__(self, item_id: object) -> bool:
+        """Whether an item is tracked."""
+        return item_id in self._groups
+
+    def watch(self, items: Iterable[Union[Post, Comment, int]]):
+        """Start tracking items. Their counters are sampled from the next poll.
+
+        :param items: Posts or Comments, or their ids.
+        """
+        with self._lock:
+            for item in items:
+                if isinstance(item, Post):
+                    view: Any = item.post_view
+                    item_id, group = view.post.id, view.community.id
+                    published = view.post.published
+                elif isinstance(item, Comment):
+                    view = item.comment_view
+                    item_id, group = view.comment.id, view.post.id
+                    published = view.comment.published
+                else:
+                    item_id, group, published = item, None, None
+                if item_id not in self._groups or group is not None:
+                    self._groups[item_id] = group
+                if published is not None:
+                    self._published[item_id] = parse_time(published).timestamp()
+                if item_id not in self._series:
+                    self._series[item_id] = CounterSeries(self.fields, self.capacity)
+
+    def unwatch(self, item_ids: Iterable[int]):
+        """Stop tracking items, and forget their samples.
+
+        :param item_ids: Ids of the items.
+        """
+        with self._lock:
+            for item_id in item_ids:
+                self._groups.pop(item_id, None)
+                self._published.pop(item_id, None)
+                self._series.pop(item_id, None)
+
+    def poll(self, now: Optional[float] = None) -> int:
+        """Fetch the counters of all the tracked items, and store a sample of each.
+
+        :param now: Time of the samples, defaulting to the current time.
+        :return: Number of items sampled. Items that couldn't be fetched are
+        skipped until the next poll.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if self.max_age is not None:
+                expired = [
+                    item_id
+                    for item_id, published in self._published.items()
+                    if now - published > self.max_age
+                ]
+                for item_id in expired:
+                    del self._groups[item_id], self._published[item_id]
+                    del self._series[item_id]
+            by_group: Dict[Optional[int], Set[int]] = collections.defaultdict(set)
+            for item_id, group in self._groups.items():
+                by_group[group].add(item_id)
+
+        self.lemmy.get_token_optional()  # login once, before the concurrent requests
+        singles = by_group.pop(None, set())
+        found: Dict[int, Tuple[int, str, Any]] = {}
+        for result in run_concurrently(
+            functools.partial(self._list_group, by_group),
+            list(by_group),
+            max_workers=self.max_workers,
+        ):
+            if result.ok:
+                found.update(result.unwrap())
+            group = result.key
+            singles.update(i for i in by_group[group] if i not in found)
+        for single in run_concurrently(
+            self._get_item, sorted(singles), max_workers=self.max_workers
+        ):
+            if single.ok:
+                found[single.key] = single.unwrap()
+
+        with self._lock:
+            for item_id, (group, published, counts) in found.items():
+                series = self._series.get(item_id)
+                if series is None:  # unwatched meanwhile
+                    continue
+                self._groups[item_id] = group
+                self._published[item_id] = parse_time(published).timestamp()
+                series.append(now, {f: getattr(counts, f) for f in self.fields})
+        return len(found)
+
+    def _list_group(
+        self, by_group: Dict[Optional[int], Set[int]], group: int
+    ) -> Dict[int, Tuple[int, str, Any]]:
+        """List the newest items of a community (or post), and keep the watched ones."""
+        wanted = by_group[group]
+        oldest = min(wanted)
+        found: Dict[int, Tuple[int, str, Any]] = {}
+        for page in range(1, self.max_pages + 1):
+            if self.kind == "posts":
+                views: List[Any] = self.lemmy.get_request(
+                    LemmyAPI.GetPosts,
+                    params=api.post.GetPosts(
+                        community_id=group,
+                        sort=api.listing.SortType.New,
+                        limit=self.page_size,
+                        page=page,
+                    ),
+                    response_model=api.post.GetPostsResponse,
+                ).posts
+                items = [(v.post.id, v.post.published, v.counts) for v in views]
+            else:
+                views = self.lemmy.get_request(
+                    LemmyAPI.GetComments,
+                    params=api.comment.GetComments(
+                        post_id=group,
+                        sort=api.comment.CommentSortType.New,
+                        limit=self.page_size,
+                        page=page,
+                    ),
+                    response_model=api.comment.GetCommentsResponse,
+                ).comments
+                items = [(v.comment.id, v.comment.published, v.counts) for v in views]
+            with self._lock:
+                self.listing_requests += 1
+            for item_id, published, counts in items:
+                if item_id in wanted:
+                    found[item_id] = (group, published, counts)
+            # Ids grow with time, so older pages can't have watched items anymore.
+            if (
+                len(items) < self.page_size
+                or len(found) == len(wanted)
+                or min(item_id for item_id, _, _ in items) <= oldest
+            ):
+                break
+        return found
+
+    def _get_item(self, item_id: int) -> Tuple[int, str, Any]:
+        """Fetch a single item, bypassing the entity cache of the client."""
+        with self._lock:
+            self.single_requests += 1
+        if self.kind == "posts":
+            post_view = self.lemmy.get_request(
+                LemmyAPI.Post,
+                params=api.post.GetPost(id=item_id),
+                response_model=api.post.GetPostResponse,
+            ).post_view
+            return post_view.community.id, post_view.post.published, post_view.counts
+        comment_view = self.lemmy.get_request(
+            LemmyAPI.Comment,
+            params=api.comment.GetComment(id=item_id),
+            response_model=api.comment.CommentResponse,
+        ).comment_view
+        return (
+            comment_view.post.id,
+            comment_view.comment.published,
+            comment_view.counts,
+        )
+
+    def series(self, item_id: int, field: str) -> List[Tuple[float, int]]:
+        """Get the samples of a counter of an item.
+
+        :param item_id: Id of the item.
+        :param field: Name of the counter.
+        :return: The time and value of each sample, oldest first.
+        """
+        with self._lock:
+            series = self._series[item_id]
+            return list(zip(series.timestamps(), series.values(field)))
+
+    def latest(self, field: str) -> Dict[int, int]:
+        """Get the last value of a counter, for all the sampled items.
+
+        :param field: Name of the counter.
+        :return: A dictionary keyed by item id.
+        """
+        with self._lock:
+            return {
+                item_id: series.latest(field)[1]
+                for item_id, series in self._series.items()
+                if len(series) > 0
+            }
+
+    def rates(self, field: str, window: float) -> Dict[int, float]:
+        """Get how fast a counter changed, for all the items sampled twice or more.
+
+        The rate compares the last sample of each item to its last sample taken at
+        least `window` seconds before (or its oldest sample, if none is).
+
+        :param field: Name of the counter.
+        :param window: Time span (in seconds) of the change.
+        :return: A dictionary keyed by item id, with the change per second.
+        """
+        rates = {}
+        with self._lock:
+            for item_id, series in self._series.items():
+                if len(series) < 2:  # noqa: PLR2004
+                    continue
+                end, last = series.latest(field)
+                start_time, first = series.at(field, end - window) or series.oldest(
+                    field
+                )
+                if end > start_time:
+                    rates[item_id] = (last - first) / (end - start_time)
+        return rates
+
+    def zscores(self, field: str, window: float) -> Dict[int, float]:
+        """Compare how fast a counter changed for each item, to the other items.
+
+        :param field: Name of the counter.
+        :param window: Time span (in seconds) of the change, see
+        [rates][pylemmy.tracker.ScoreTracker.rates].
+        :return: A dictionary keyed by item id, with the number of standard
+        deviations between its rate and the mean rate of all the items.
+        """
+        rates = self.rates(field, window)
+        if not rates:
+            return {}
+        mean = math.fsum(rates.values()) / len(rates)
+        std = math.sqrt(math.fsum((r - mean) ** 2 for r in rates.values()) / len(rates))
+        if std == 0:
+            return {item_id: 0.0 for item_id in rates}
+        return {item_id: (rate - mean) / std for item_id, rate in rates.items()}
+
+    def outliers(
+        self, field: str = "score", window: float = 600, threshold: float = 3
+    ) -> List[int]:
+        """Find the items whose counter changed much faster than the others'.
+
+        :param field: Name of the counter.
+        :param window: Time span (in seconds) of the change.
+        :param threshold: Minimum z-score of the outliers, see
+        [zscores][pylemmy.tracker.ScoreTracker.zscores].
+        :return: Ids of the outliers, highest z-score first.
+        """
+        zscores = self.zscores(field, window)
+        outliers = [item_id for item_id, z in zscores.items() if z >= threshold]
+        return sorted(outliers, key=lambda item_id: -zscores[item_id])
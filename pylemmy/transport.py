@@ -0,0 +1,947 @@
+"""Implements the HTTP layer used to talk to Lemmy instances.
+
+Requests go through a [Transport][pylemmy.transport.Transport], which can be
+swapped to send them differently, or not at all (see
+[FakeTransport][pylemmy.transport.FakeTransport]).
+"""
+
+import abc
+import asyncio
+import http.client
+import json
+import socket
+import ssl
+import threading
+import time
+import urllib.parse
+import weakref
+from collections import Counter
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.exceptions import NewConnectionError
+
+from pylemmy.endpoints import LemmyAPI
+
+if TYPE_CHECKING:
+    from pylemmy.testing.synthetic import SyntheticInstance
+
+Timeout = Union[None, float, Tuple[float, float]]
+
+
+class Response:
+    """A response to an HTTP request, whatever the transport that sent it."""
+
+    def __init__(
+        self,
+        status_code: int,
+        content: bytes,
+        headers: Optional[Mapping[str, str]] = None,
+        url: str = "",
+    ):
+        """Initialize a Response.
+
+        :param status_code: HTTP status code.
+        :param content: Body of the response.
+        :param headers: Headers of the response.
+        :param url: URL the request was sent to.
+        """
+        self.status_code = status_code
+        self.content = content
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.url = url
+
+    @classmethod
+    def from_json(cls, data: Any, status_code: int = 200, url: str = "") -> "Response":
+        """Build a Response with a JSON body.
+
+        :param data: The data to encode in the body.
+        :param status_code: HTTP status code.
+        :param url: URL the request was sent to.
+        """
+        return cls(
+            status_code,
+            json.dumps(data).encode(),
+            {"Content-Type": "application/json"},
+            url,
+        )
+
+    def json(self) -> Any:
+        """Decode the JSON body of the response."""
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        """Raise a `requests.HTTPError` if the status is an error."""
+        if self.status_code >= 400:  # noqa: PLR2004
+            msg = f"{self.status_code} Error for url: {self.url}"
+            raise requests.HTTPError(msg, response=self)
+
+
+class Transport(abc.ABC):
+    """Sends HTTP requests for a [Lemmy][pylemmy.lemmy.Lemmy] client.
+
+    Subclasses implement `request`, and may override `request_async` when they can
+    send requests without blocking the event loop. Errors are raised as the
+    exceptions of `requests` (`ConnectionError`, `Timeout`), so that callers handle
+    all transports the same way.
+    """
+
+    @abc.abstractmethod
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Any] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Timeout = None,
+    ) -> Response:
+        """Send a request.
+
+        :param method: HTTP method, e.g. `GET`.
+        :param url: URL to send the request to.
+        :param params: Parameters to send in the URL.
+        :param json: Data to send in the body, encoded as JSON.
+        :param headers: Headers to send.
+        :param timeout: Timeout (in seconds), or (connect, read) timeouts.
+        """
+
+    async def request_async(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Any] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Timeout = None,
+    ) -> Response:
+        """Send a request without blocking the event loop.
+
+        By default, `request` is run in the loop's executor.
+        See [request][pylemmy.transport.Transport.request] for the arguments.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None,
+            lambda: self.request(
+                method, url, params=params, json=json, headers=headers, timeout=timeout
+            ),
+        )
+
+    def close(self):
+        """Release the resources (e.g. connections) held by the transport."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed request is worth retrying.
+
+    :param error: The exception raised by the request.
+    """
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status == 429 or status >= 500  # noqa: PLR2004
+    return False
+
+
+def is_unsent(error: Exception) -> bool:
+    """Whether a failed request surely wasn't applied by the server.
+
+    This is the case when the connection couldn't be opened, or the server answered
+    with HTTP 429. After a timeout, a reset connection or a 5xx response, the server
+    may have applied the request, so resending a write could apply it twice.
+
+    :param error: The exception raised by the request.
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if isinstance(error, requests.HTTPError):
+        status = error.response.status_code if error.response is not None else None
+        return status == 429  # noqa: PLR2004
+    if isinstance(error, requests.ConnectionError):
+        # requests wraps the errors of urllib3, other transports chain the OSError.
+        unsent = (NewConnectionError, ConnectionRefusedError, FileNotFoundError)
+        wrapped = error.args[0] if error.args else None
+        return isinstance(getattr(wrapped, "reason", wrapped), unsent) or isinstance(
+            error.__cause__, unsent
+        )
+    return False
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Time (in seconds) the server asked to wait before retrying, if any.
+
+    :param error: The exception raised by the request.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+class RetryTransport(Transport):
+    """Retries the requests of another transport when they fail transiently.
+
+    Connection errors, timeouts, and HTTP 429 and 5xx responses are retried with
+    exponential backoff, honoring the `Retry-After` header. Note that writes may be
+    applied twice, if the server fails after applying them.
+    """
+
+    def __init__(
+        self,
+        inner: Transport,
+        *,
+        max_retries: int = 3,
+        min_retry_wait: float = 0.5,
+        max_retry_wait: float = 30,
+    ):
+        """Initialize a RetryTransport.
+
+        :param inner: The transport sending the requests.
+        :param max_retries: Maximum number of retries for each request.
+        :param min_retry_wait: Time (in seconds) to wait before the first retry.
+        :param max_retry_wait: Maximum time (in seconds) to wait between retries.
+        """
+        self.inner = inner
+        self.max_retries = max_retries
+        self.min_retry_wait = min_retry_wait
+        self.max_retry_wait = max_retry_wait
+        self.retries = 0
+
+        self._lock = threading.Lock()
+
+    def _wait(self, attempt: int, error: Exception) -> Optional[float]:
+        """Time to wait before retrying, or `None` if the error must be raised."""
+        if attempt == self.max_retries or not is_retryable(error):
+            return None
+        with self._lock:
+            self.retries += 1
+        wait = min(self.min_retry_wait * 2**attempt, self.max_retry_wait)
+        return max(wait, retry_after(error) or 0)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Any] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Timeout = None,
+    ) -> Response:
+        """Send a request, retrying it if it fails transiently.
+
+        See [request][pylemmy.transport.Transport.request] for the arguments.
+        """
+        attempt = 0
+        while True:
+            try:
+                response = self.inner.request(
+                    method,
+                    url,
+                    params=params,
+                    json=json,
+                    headers=headers,
+                    timeout=timeout,
+                )
+                response.raise_for_status()
+                return response
+            except Exception as e:
+                wait = self._wait(attempt, e)
+                if wait is None:
+                    raise
+            time.sleep(wait)
+            attempt += 1
+
+    async def request_async(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Any] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Timeout = None,
+    ) -> Response:
+        """Send a request without blocking the event loop, retrying it if it fails.
+
+        See [request][pylemmy.transport.Transport.request] for the arguments.
+        """
+        attempt = 0
+        while True:
+            try:
+                response = await self.inner.request_async(
+                    method,
+                    url,
+                    params=params,
+                    json=json,
+                    headers=headers,
+                    timeout=timeout,
+                )
+                response.raise_for_status()
+                return response
+            except Exception as e:
+                wait = self._wait(attempt, e)
+                if wait is None:
+                    raise
+            await asyncio.sleep(wait)
+            attempt += 1
+
+    def close(self):
+        """Close the inner transport."""
+        self.inner.close()
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """An HTTPAdapter that reports how often its connections are reused."""
+
+    def connection_stats(self, url: Optional[str] = None) -> Dict[str, int]:
+        """Count the connections opened and the requests sent through them.
+
+        Only hosts whose connection pool is still open are counted.
+
+        :param url: If given, only count the connections to the host of this URL.
+        :return: A dictionary with the number of `connections` opened, `requests`
+        sent, and `reused` connections (requests that didn't need a new connection).
+        """
+        keys = list(self.poolmanager.pools.keys())
+        if url is not None:
+            parts = urllib.parse.urlsplit(url)
+            host = (
+                parts.scheme,
+                (parts.hostname or "").lower(),
+                parts.port or (443 if parts.scheme == "https" else 80),
+            )
+            keys = [
+                key
+                for key in keys
+                if (key.key_scheme, key.key_host, key.key_port) == host
+            ]
+        pools = [self.poolmanager.pools[key] for key in keys]
+        connections = sum(pool.num_connections for pool in pools)
+        requests_sent = sum(pool.num_requests for pool in pools)
+        return {
+            "connections": connections,
+            "requests": requests_sent,
+            "reused": max(requests_sent - connections, 0),
+        }
+
+
+def create_session(
+    *,
+    pool_connections: int = 10,
+    pool_maxsize: int = 10,
+    keep_alive: bool = True,
+) -> requests.Session:
+    """Create a session with tuned connection pools.
+
+    A session can be shared by several [Lemmy][pylemmy.lemmy.Lemmy] clients, so
+    that they reuse the same connections.
+
+    :param pool_connections: Number of hosts to keep connection pools for.
+    :param pool_maxsize: Maximum number of connections kept open to each host.
+    This should be at least the number of threads sending requests concurrently.
+    :param keep_alive: If `False`, close connections after each request.
+    """
+    session = requests.Session()
+    adapter = PooledHTTPAdapter(
+        pool_connections=pool_connections, pool_maxsize=pool_maxsize
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
+
+
+class RequestsTransport(Transport):
+    """Sends requests with a `requests` session. This is the default transport.
+
+    A `requests.Session` isn't guaranteed to be thread-safe. With
+    `per_thread=True`, each thread sends requests with its own session, which
+    mirrors the settings of `session` (headers, cookies, proxies, `verify`, auth,
+    ...) before each request, and shares its connection pools.
+    """
+
+    def __init__(
+        self, session: Optional[requests.Session] = None, *, per_thread: bool = False
+    ):
+        """Initialize a RequestsTransport.
+
+        :param session: The session to send requests with. Defaults to one created
+        by [create_session][pylemmy.transport.create_session].
+        :param per_thread: If `True`, each thread uses its own copy of `session`.
+        By default, all threads use `session`.
+        """
+        self.session = create_session() if session is None else session
+        self.per_thread = per_thread
+
+        self._local = threading.local()
+
+    def _get_session(self) -> requests.Session:
+        if not self.per_thread:
+            return self.session
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        # The settings are shared rather than copied once, so that changes made to
+        # `session` later apply to all threads. Sharing the adapters shares their
+        # connection pools.
+        for name in requests.Session.__attrs__:
+            setattr(session, name, getattr(self.session, name))
+        return session
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Any] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Timeout = None,
+    ) -> Response:
+        """Send a request.
+
+        See [request][pylemmy.transport.Transport.request] for the arguments.
+        """
+        response = self._get_session().request(
+            method, url, params=params, json=json, headers=headers, timeout=timeout
+        )
+        return Response(
+            response.status_code, response.content, response.headers, response.url
+        )
+
+    def connection_stats(self, url: str) -> Dict[str, int]:
+        """Count the connections opened to a host, and how often they're reused.
+
+        See [connection_stats][pylemmy.transport.PooledHTTPAdapter.connection_stats].
+        If the session wasn't created by
+        [create_session][pylemmy.transport.create_session], the counts are zero.
+
+        :param url: A URL on the host.
+        """
+        adapter = self.session.get_adapter(url)
+        if isinstance(adapter, PooledHTTPAdapter):
+            return adapter.connection_stats(url)
+        return {"connections": 0, "requests": 0, "reused": 0}
+
+    def close(self):
+        """Close the session, and its connections.
+
+        The sessions of the threads share its adapters, so they are closed too.
+        """
+        self.session.close()
+
+
+_Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class AsyncioTransport(Transport):
+    """Sends requests with asyncio streams, without blocking the event loop.
+
+    This is a minimal HTTP/1.1 client, with keep-alive connections pooled per event
+    loop. It has no dependencies, but no support for proxies or redirects either.
+    Blocking calls to `request` run on a private event loop, in a background thread
+    started by the first call, so that they reuse their connections too.
+    """
+
+    def __init__(self, *, pool_maxsize: int = 10, ssl_context=None):
+        """Initialize an AsyncioTransport.
+
+        :param pool_maxsize: Maximum number of idle connections kept open to each
+        host.
+        :param ssl_context: SSL context for HTTPS connections. Defaults to
+        `ssl.create_default_context()`.
+        """
+        self.pool_maxsize = pool_maxsize
+        self.ssl_context = ssl_context
+
+        # Streams are bound to the loop that opened them.
+        self._pools: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, Dict[Tuple[str, str, int], List[_Connection]]
+        ] = weakref.WeakKeyDictionary()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever, daemon=True
+                )
+                self._loop_thread.start()
+            return self._loop
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Any] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Timeout = None,
+    ) -> Response:
+        """Send a request, blocking until it is answered.
+
+        See [request][pylemmy.transport.Transport.request] for the arguments.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self.request_async(
+                method, url, params=params, json=json, headers=headers, timeout=timeout
+            ),
+            self._get_loop(),
+        )
+        return future.result()
+
+    async def request_async(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Any] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Timeout = None,
+    ) -> Response:
+        """Send a request without blocking the event loop.
+
+        See [request][pylemmy.transport.Transport.request] for the arguments.
+        """
+        connect_timeout, read_timeout = (
+            timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        )
+        parts = urllib.parse.urlsplit(url)
+        target = parts.path or "/"
+        query = urllib.parse.urlencode(
+            {k: v for k, v in (params or {}).items() if v is not None}, doseq=True
+        )
+        if parts.query or query:
+            target += "?" + "&".join(q for q in (parts.query, query) if q)
+
+        body = b"" if json is None else _encode_json(json)
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {parts.netloc}"]
+        all_headers = {"Accept": "application/json", **(headers or {})}
+        if json is not None:
+            all_headers["Content-Type"] = "application/json"
+        all_headers["Content-Length"] = str(len(body))
+        lines += [f"{k}: {v}" for k, v in all_headers.items() if v is not None]
+        data = ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+
+        key = (
+            parts.scheme,
+            parts.hostname or "",
+            parts.port or (443 if parts.scheme == "https" else 80),
+        )
+        reader, writer = await self._connect(key, connect_timeout)
+        try:
+            writer.write(data)
+            await writer.drain()
+            status, response_headers, content, reusable = await asyncio.wait_for(
+                _read_response(reader), read_timeout
+            )
+        except asyncio.TimeoutError as e:
+            writer.close()
+            msg = f"Read timed out: {url}"
+            raise requests.ReadTimeout(msg) from e
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            writer.close()
+            msg = f"Connection failed: {url}"
+            raise requests.ConnectionError(msg) from e
+
+        if reusable and all_headers.get("Connection") != "close":
+            self._release(key, (reader, writer))
+        else:
+            writer.close()
+        return Response(status, content, response_headers, url)
+
+    async def _connect(
+        self, key: Tuple[str, str, int], connect_timeout: Optional[float]
+    ) -> _Connection:
+        idle = self._pools.get(asyncio.get_running_loop(), {}).get(key, [])
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer
+            writer.close()
+
+        scheme, host, port = key
+        context = None
+        if scheme == "https":
+            context = self.ssl_context or ssl.create_default_context()
+        try:
+            return await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=context), connect_timeout
+            )
+        except asyncio.TimeoutError as e:
+            msg = f"Connection to {host}:{port} timed out"
+            raise requests.ConnectTimeout(msg) from e
+        except OSError as e:
+            msg = f"Connection to {host}:{port} failed"
+            raise requests.ConnectionError(msg) from e
+
+    def _release(self, key: Tuple[str, str, int], connection: _Connection):
+        pools = self._pools.setdefault(asyncio.get_running_loop(), {})
+        idle = pools.setdefault(key, [])
+        if len(idle) < self.pool_maxsize:
+            idle.append(connection)
+        else:
+            connection[1].close()
+
+    async def _close_idle(self):
+        for idle in self._pools.pop(asyncio.get_running_loop(), {}).values():
+            for _, writer in idle:
+                writer.close()
+                await writer.wait_closed()
+
+    def close(self):
+        """Close the idle connections, and stop the loop of the blocking calls."""
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+            thread, self._loop_thread = self._loop_thread, None
+        if loop is not None and thread is not None:
+            asyncio.run_coroutine_threadsafe(self._close_idle(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+        # The connections of a closed loop can't be closed anymore.
+        for other_loop, pools in list(self._pools.items()):
+            if other_loop.is_closed():
+                continue
+            for idle in pools.values():
+                for _, writer in idle:
+                    other_loop.call_soon_threadsafe(writer.close)
+        self._pools.clear()
+
+
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: Optional[float]):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class UnixSocketTransport(Transport):
+    """Sends requests over a unix socket, to a [LemmyProxy][pylemmy.proxy.LemmyProxy].
+
+    The host of the URLs is ignored: only their path and query are sent. Each
+    thread keeps its own keep-alive connection to the socket.
+
+    Example:
+
+        lemmy = Lemmy(
+            "https://lemmy.ml",
+            None,
+            None,
+            "my bot",
+            transport=UnixSocketTransport("/run/pylemmy/lemmy.ml.sock"),
+        )
+    """
+
+    def __init__(self, path: str):
+        """Initialize a UnixSocketTransport.
+
+        :param path: Path to the unix socket.
+        """
+        self.path = path
+
+        self._local = threading.local()
+        self._connections: List[_UnixHTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def _get_connection(self) -> _UnixHTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = _UnixHTTPConnection(self.path, None)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    @staticmethod
+    def _send(
+        connection: _UnixHTTPConnection,
+        method: str,
+        target: str,
+        body: Optional[bytes],
+        headers: Dict[str, str],
+        timeouts: Tuple[Optional[float], Optional[float]],
+    ):
+        connect_timeout, read_timeout = timeouts
+        if connection.sock is None:
+            connection.timeout = connect_timeout
+            connection.connect()
+        connection.sock.settimeout(read_timeout)
+        connection.request(method, target, body=body, headers=headers)
+
+    @staticmethod
+    def _receive(connection: _UnixHTTPConnection) -> Tuple[int, Dict[str, str], bytes]:
+        response = connection.getresponse()
+        content = response.read()
+        if response.will_close:
+            connection.close()
+        return response.status, dict(response.getheaders()), content
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Any] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Timeout = None,
+    ) -> Response:
+        """Send a request.
+
+        See [request][pylemmy.transport.Transport.request] for the arguments.
+        """
+        timeouts = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        parts = urllib.parse.urlsplit(url)
+        target = parts.path or "/"
+        query = urllib.parse.urlencode(
+            {k: v for k, v in (params or {}).items() if v is not None}, doseq=True
+        )
+        if parts.query or query:
+            target += "?" + "&".join(q for q in (parts.query, query) if q)
+        body = None if json is None else _encode_json(json)
+        all_headers = {"Accept": "application/json", **(headers or {})}
+        if body is not None:
+            all_headers["Content-Type"] = "application/json"
+
+        connection = self._get_connection()
+        # The server may have closed a reused connection while it was idle. The
+        # request is then resent on a new connection, unless it was fully sent and
+        # isn't idempotent, as the server may have applied it.
+        retry = connection.sock is not None
+        try:
+            while True:
+                sent = False
+                try:
+                    self._send(connection, method, target, body, all_headers, timeouts)
+                    sent = True
+                    status, response_headers, content = self._receive(connection)
+                    break
+                except (BrokenPipeError, ConnectionResetError):
+                    if not retry or (sent and method not in _IDEMPOTENT_METHODS):
+                        raise
+                    retry = False
+                    connection.close()
+        except socket.timeout as e:
+            connection.close()
+            msg = f"Read timed out: {url}"
+            raise requests.ReadTimeout(msg) from e
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            msg = f"Connection to {self.path} failed"
+            raise requests.ConnectionError(msg) from e
+        return Response(status, content, response_headers, url)
+
+    def close(self):
+        """Close the connections of all the threads."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+
+
+def _encode_json(data: Any) -> bytes:
+    # The `json` arguments of the transports shadow the module.
+    return json.dumps(data).encode()
+
+
+async def _read_response(
+    reader: asyncio.StreamReader,
+) -> Tuple[int, Dict[str, str], bytes, bool]:
+    status_line = await reader.readuntil(b"\r\n")
+    _, status, *_ = status_line.decode("latin-1").split(" ", 2)
+    headers: Dict[str, str] = {}
+    while True:
+        line = (await reader.readuntil(b"\r\n")).decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip()] = value.strip()
+    lowered = {k.lower(): v.lower() for k, v in headers.items()}
+
+    reusable = lowered.get("connection") != "close"
+    if lowered.get("transfer-encoding") == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            chunk = await reader.readexactly(size + 2)
+            if size == 0:
+                # The last chunk may be followed by trailers, ended by a blank line.
+                while chunk != b"\r\n":
+                    chunk = await reader.readuntil(b"\r\n")
+                break
+            chunks.append(chunk[:-2])
+        content = b"".join(chunks)
+    elif "content-length" in lowered:
+        content = await reader.readexactly(int(lowered["content-length"]))
+    else:
+        content = await reader.read()
+        reusable = False
+    return int(status), headers, content, reusable
+
+
+Handler = Union[Callable[[Dict[str, Any]], Any], Any]
+
+
+class FakeTransport(Transport):
+    """Answers requests from memory, without any network access.
+
+    Each route maps an HTTP method and Lemmy endpoint to either a canned response,
+    or a function of the request's parameters (or JSON body) returning one.
+    Responses are JSON-like data, or a [Response][pylemmy.transport.Response], e.g.
+    to simulate errors. Requests to unknown routes get a 404 response.
+    This makes pipelines testable and benchmarkable deterministically.
+
+    Example:
+
+        instance = SyntheticInstance(n_communities=10)
+        instance.generate(n_posts=1000, n_comments=5000)
+        transport = FakeTransport(instance=instance, latency=0.05)
+        lemmy = Lemmy("http://lemmy.test", None, None, "bench", transport=transport)
+        for post in lemmy.get_community(1).stream.get_posts():
+            ...
+    """
+
+    def __init__(
+        self,
+        routes: Optional[Dict[LemmyAPI, Handler]] = None,
+        *,
+        instance: Optional["SyntheticInstance"] = None,
+        latency: Union[float, Callable[[], float]] = 0,
+    ):
+        """Initialize a FakeTransport.
+
+        :param routes: Handlers for GET requests to each endpoint. More can be added
+        with [route][pylemmy.transport.FakeTransport.route].
+        :param instance: A
+        [SyntheticInstance][pylemmy.testing.synthetic.SyntheticInstance] answering
+        the requests it has routes for (see its `routes` method).
+        :param latency: Time (in seconds) to wait before answering each request, or
+        a function returning it (e.g. `lambda: random.expovariate(20)`).
+        """
+        self.latency = latency
+        # Number of requests received by each (method, path).
+        self.calls: Counter[Tuple[str, str]] = Counter()
+
+        self._routes: Dict[Tuple[str, str], Handler] = {}
+        self._lock = threading.Lock()
+        from pylemmy.testing.synthetic import SyntheticInstance
+
+        self.route(LemmyAPI.Login, SyntheticInstance.login, method="POST")
+        if instance is not None:
+            for (method, path), handler in instance.routes().items():
+                self.route(path, handler, method=method)
+        for path, handler in (routes or {}).items():
+            self.route(path, handler)
+
+    def route(self, path: LemmyAPI, handler: Handler, *, method: str = "GET"):
+        """Set how requests to an endpoint are answered.
+
+        :param path: A Lemmy endpoint.
+        :param handler: The response, or a function of the request's parameters
+        returning it.
+        :param method: HTTP method of the requests.
+        """
+        self._routes[(method.upper(), path.value)] = handler
+
+    def _delay(self) -> float:
+        return self.latency() if callable(self.latency) else self.latency
+
+    def _answer(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        json: Optional[Any],
+    ) -> Response:
+        path = urllib.parse.urlsplit(url).path
+        key = (method.upper(), path)
+        with self._lock:
+            self.calls[key] += 1
+        handler = self._routes.get(key)
+        if handler is None:
+            return Response.from_json({"error": "not_found"}, 404, url)
+        data = params if json is None else json
+        result = handler(dict(data or {})) if callable(handler) else handler
+        return (
+            result
+            if isinstance(result, Response)
+            else Response.from_json(result, url=url)
+        )
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Any] = None,
+        headers: Optional[Dict[str, str]] = None,  # noqa: ARG002
+        timeout: Timeout = None,  # noqa: ARG002
+    ) -> Response:
+        """Answer a request.
+
+        See [request][pylemmy.transport.Transport.request] for the arguments.
+        """
+        delay = self._delay()
+        if delay > 0:
+            time.sleep(delay)
+        return self._answer(method, url, params, json)
+
+    async def request_async(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Any] = None,
+        headers: Optional[Dict[str, str]] = None,  # noqa: ARG002
+        timeout: Timeout = None,  # noqa: ARG002
+    ) -> Response:
+        """Answer a request, waiting without blocking the event loop.
+
+        See [request][pylemmy.transport.Transport.request] for the arguments.
+        """
+        delay = self._delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self._answer(method, url, params, json)
@@ -1,23 +1,531 @@
 """General utilities package."""
 
 import asyncio
+import datetime
+import math
+import sys
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
 from typing import (
     Any,
     AsyncGenerator,
+    Awaitable,
     Callable,
+    Dict,
     Generator,
+    Generic,
+    Hashable,
     Iterable,
+    List,
     Optional,
     Sequence,
     Set,
+    Tuple,
     TypeVar,
 )
 
-from aiostream import stream
 from mypy_extensions import KwArg
 
+from pylemmy.metrics import Histogram
+
 T = TypeVar("T")
+K = TypeVar("K", bound=Hashable)
+
+
+LAG_BUCKETS: Tuple[float, ...] = (0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+"""Upper bounds (in seconds) of the buckets of the lag histograms of streams."""
+
+
+def parse_time(published: str) -> datetime.datetime:
+    """Parse a time formatted as Lemmy does, e.g. the `published` date of a post.
+
+    :param published: The formatted time, in UTC.
+    """
+    moment = datetime.datetime.fromisoformat(published.rstrip("Z").split("+")[0])
+    return moment.replace(tzinfo=datetime.timezone.utc)
+
+
+class RateLimiter:
+    """A thread-safe token bucket, limiting how often an action can happen."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """Initialize a RateLimiter.
+
+        :param rate: Average number of actions allowed per second.
+        :param burst: Maximum number of actions allowed back-to-back.
+        """
+        if rate <= 0 or burst < 1:
+            msg = f"Need a positive rate and burst, got {rate} and {burst}."
+            raise ValueError(msg)
+        self.rate = rate
+        self.burst = burst
+
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token, and return how long to wait until it's available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._last) * self.rate
+            )
+            self._last = now
+            self._tokens -= 1
+            return 0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        """Block until the action is allowed."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait, without blocking the event loop, until the action is allowed."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class LRUCache(Generic[K, T]):
+    """A thread-safe mapping which drops the least recently used entries."""
+
+    def __init__(self, max_size: int):
+        """Initialize an LRUCache.
+
+        :param max_size: Maximum number of entries to keep.
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self._data: OrderedDict[K, T] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: K) -> Optional[T]:
+        """Get the value of a key, or `None` if it isn't cached.
+
+        :param key: The key to look up.
+        """
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key: K, value: T):
+        """Cache a value, possibly dropping the least recently used entry.
+
+        :param key: The key to store the value under.
+        :param value: The value to store.
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key: K) -> Optional[T]:
+        """Remove a key from the cache, returning its value if it was cached.
+
+        :param key: The key to remove.
+        """
+        with self._lock:
+            return self._data.pop(key, None)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        """Number of cached entries."""
+        return len(self._data)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into a single call.
+
+    While a call for a key is running, other threads asking for the same key wait
+    for it and share its result (or exception), instead of making their own call.
+    """
+
+    def __init__(self):
+        """Initialize a SingleFlight."""
+        self.calls = 0
+        self.shared = 0
+
+        self._running: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Call a function, unless a call with the same key is already running.
+
+        :param key: Identifies calls that are interchangeable.
+        :param fn: The function to call.
+        :return: The result of the function, possibly from another thread's call.
+        """
+        with self._lock:
+            call = self._running.get(key)
+            leader = call is None
+            if call is None:
+                call = self._running[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._running[key]
+            call.done.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """Coalesces concurrent coroutines with the same key, in a single event loop.
+
+    See [SingleFlight][pylemmy.utils.SingleFlight].
+    """
+
+    def __init__(self):
+        """Initialize an AsyncSingleFlight."""
+        self.calls = 0
+        self.shared = 0
+
+        self._running: Dict[Hashable, asyncio.Future[Any]] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await a coroutine function, unless one with the same key is running.
+
+        :param key: Identifies calls that are interchangeable.
+        :param fn: The coroutine function to call.
+        :return: The result of the function, possibly from another task's call.
+        """
+        running = self._running.get(key)
+        if running is not None:
+            self.shared += 1
+            return await asyncio.shield(running)
+
+        self.calls += 1
+        future = asyncio.ensure_future(fn())
+        self._running[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done():
+                del self._running[key]
+            else:
+                future.add_done_callback(lambda _: self._running.pop(key, None))
+
+
+class BatchResult(Generic[K, T]):
+    """The outcome of one element of a batch operation."""
+
+    def __init__(
+        self, key: K, value: Optional[T] = None, error: Optional[Exception] = None
+    ):
+        """Initialize a BatchResult.
+
+        :param key: The input this result corresponds to.
+        :param value: The result, if the operation succeeded.
+        :param error: The exception raised, if the operation failed.
+        """
+        self.key = key
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        """Whether the operation succeeded."""
+        return self.error is None
+
+    def unwrap(self) -> T:
+        """Get the result, raising the original exception if the operation failed."""
+        if self.error is not None:
+            raise self.error
+        return self.value  # type: ignore[return-value]
+
+    def __repr__(self) -> str:
+        """Representation of the result."""
+        outcome = f"value={self.value!r}" if self.ok else f"error={self.error!r}"
+        return f"BatchResult(key={self.key!r}, {outcome})"
+
+
+def run_concurrently(
+    fn: Callable[[K], T],
+    keys: Iterable[K],
+    *,
+    max_workers: int = 8,
+    executor: Optional[Executor] = None,
+) -> List[BatchResult[K, T]]:
+    """Call a function for each key in a thread pool, collecting errors.
+
+    :param fn: Function to call for each key.
+    :param keys: The inputs of the function.
+    :param max_workers: Maximum number of concurrent calls.
+    :param executor: An executor to run the calls in, instead of a new thread pool
+    of `max_workers` threads.
+    :return: One result per key, in the same order as `keys`.
+    """
+
+    def call(key: K) -> BatchResult[K, T]:
+        try:
+            return BatchResult(key, value=fn(key))
+        except Exception as e:
+            return BatchResult(key, error=e)
+
+    if executor is not None:
+        return list(executor.map(call, keys))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(call, keys))
+
+
+def get_many(
+    fetch_fn: Callable[[K], T],
+    keys: Iterable[K],
+    *,
+    cache: Optional[LRUCache[K, T]] = None,
+    max_workers: int = 8,
+) -> List[BatchResult[K, T]]:
+    """Fetch many objects concurrently, skipping duplicates and cached keys.
+
+    :param fetch_fn: Function fetching the object for one key.
+    :param keys: Keys of the objects to fetch, which may contain duplicates.
+    :param cache: A cache checked before fetching, and filled with the fetched
+    objects.
+    :param max_workers: Maximum number of concurrent calls to `fetch_fn`.
+    :return: One result per key, in the same order as `keys`.
+    """
+    keys = list(keys)
+    results: Dict[K, BatchResult[K, T]] = {}
+    for key in keys:
+        if key not in results and cache is not None:
+            value = cache.get(key)
+            if value is not None:
+                results[key] = BatchResult(key, value=value)
+    misses = [k for k in dict.fromkeys(keys) if k not in results]
+    for result in run_concurrently(fetch_fn, misses, max_workers=max_workers):
+        results[result.key] = result
+        if cache is not None and result.ok:
+            cache.set(result.key, result.value)  # type: ignore[arg-type]
+    return [results[key] for key in keys]
+
+
+def paginate(
+    page_fn: Callable[[KwArg(Any)], Tuple[Sequence[T], Optional[str]]],
+    unique_key_fn: Callable[[T], str],
+    *,
+    filter_fn: Callable[[T], bool] = lambda _: True,
+    limit: Optional[int] = None,
+    **function_kwargs: Any,
+) -> Generator[T, None, None]:
+    """Iterate through all the pages of a listing.
+
+    If the server returns a cursor to the next page (`next_page`, since Lemmy
+    0.19), the following pages are requested with it (as `page_cursor`): each page
+    costs the same, and the pages don't shift when items are added or removed.
+    Otherwise, pages are requested by number (as `page`) until an empty or short
+    page, and the items seen are skipped if they show up again, because new items
+    pushed them to the next pages.
+
+    :param page_fn: A function returning the items of a page, and the cursor to the
+    next page, if any. It is called with either `page` or `page_cursor`.
+    :param unique_key_fn: A function that takes an object and outputs a unique id.
+    :param filter_fn: Only yield objects for which this function returns `True`.
+    :param limit: Maximum number of objects to yield.
+    :param function_kwargs: Keyword parameters that are passed to the function.
+    """
+    if limit is not None and limit <= 0:
+        return
+    count = 0
+    page = 1
+    page_size = 0
+    cursor: Optional[str] = None
+    seen_keys: Set[str] = set()
+    while True:
+        position = {"page": page} if cursor is None else {"page_cursor": cursor}
+        items, next_cursor = page_fn(**function_kwargs, **position)
+        keys: Set[str] = set()
+        for item in items:
+            key = unique_key_fn(item)
+            if key in seen_keys or key in keys:
+                continue
+            keys.add(key)
+            if filter_fn(item):
+                yield item
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+        if cursor is None and next_cursor is None:
+            # Pages by number shift by the number of new items, which can be more
+            # than a page: a page of repeated items isn't the end, but an empty or
+            # short one is. All the keys are kept, as items may come back from any
+            # of the previous pages.
+            page_size = max(page_size, len(items))
+            if not items or len(items) < page_size:
+                return
+            seen_keys |= keys
+            page += 1
+        else:
+            # An empty page, or one with only repeated items, is past the end.
+            if not keys or (cursor is not None and next_cursor is None):
+                return
+            seen_keys = keys
+            cursor = next_cursor
+
+
+class StreamStats:
+    """Live statistics of one source of a stream, to tune how often it is polled.
+
+    Give it to a stream with its `stats` argument, e.g. to
+    [stream_generator][pylemmy.utils.stream_generator], and read it while the stream
+    runs.
+
+    Example:
+
+        stats = StreamStats()
+        for post in community.stream.get_posts(stats=stats):
+            ...
+            print(stats.snapshot())
+    """
+
+    def __init__(self, lag_buckets: Sequence[float] = LAG_BUCKETS):
+        """Initialize StreamStats.
+
+        :param lag_buckets: Upper bounds (in seconds) of the buckets of the lag
+        histogram.
+        """
+        self.polls = 0
+        # Polls which returned no new results.
+        self.empty_polls = 0
+        self.new_items = 0
+        # Results discarded because they were already seen.
+        self.duplicates = 0
+        # Current time (in seconds) between polls.
+        self.wait_time = 0.0
+        # Size of the set of keys of the results seen.
+        self.dedup_keys = 0
+        self.dedup_bytes = 0
+        # Time between the publication of results and their delivery.
+        self.lag = Histogram(lag_buckets)
+        # Page size of the next poll, and pages requested beyond the first, when
+        # sized by a PageSizer.
+        self.page_limit = 0
+        self.extra_pages = 0
+
+    @property
+    def items_per_poll(self) -> float:
+        """Average number of new results per poll."""
+        return self.new_items / self.polls if self.polls else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the current statistics, as a dictionary."""
+        return {
+            "polls": self.polls,
+            "empty_polls": self.empty_polls,
+            "new_items": self.new_items,
+            "items_per_poll": self.items_per_poll,
+            "duplicates": self.duplicates,
+            "wait_time": self.wait_time,
+            "dedup_keys": self.dedup_keys,
+            "dedup_bytes": self.dedup_bytes,
+            "lag_seconds": self.lag.snapshot(),
+            "page_limit": self.page_limit,
+            "extra_pages": self.extra_pages,
+        }
+
+
+class PageSizer:
+    """Sizes the pages requested by the polls of a source, from its arrival rate.
+
+    Polls request `limit` items: a quiet source then downloads and validates few
+    items it has already seen, and a busy one gets bigger pages, up to
+    `max_limit`. When a whole page is new, the next page is requested right away,
+    so that no item is missed before the page size catches up.
+
+    Give it to a stream with its `page_sizer` argument, e.g. to
+    [stream_generator][pylemmy.utils.stream_generator]. The polled function needs
+    to accept `limit` and `page` arguments, as
+    [get_posts][pylemmy.models.community.Community.get_posts] does.
+
+    Example:
+
+        for post in community.stream.get_posts(page_sizer=PageSizer()):
+            ...
+    """
+
+    def __init__(
+        self,
+        *,
+        initial_limit: int = 10,
+        min_limit: int = 2,
+        max_limit: int = 50,
+        max_pages: int = 10,
+        headroom: float = 2,
+        smoothing: float = 0.5,
+    ):
+        """Initialize a PageSizer.
+
+        :param initial_limit: Page size of the first poll. Lemmy's default is 10.
+        :param min_limit: Minimum page size.
+        :param max_limit: Maximum page size. Lemmy allows up to 50.
+        :param max_pages: Maximum number of pages requested in one poll.
+        :param headroom: Ratio between the page size and the expected number of new
+        items per poll.
+        :param smoothing: Weight of the previous estimate of the number of new items
+        per poll, against the number found by the last poll.
+        """
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_pages = max_pages
+        self.headroom = headroom
+        self.smoothing = smoothing
+        # Estimated number of new items per poll.
+        self.rate: Optional[float] = None
+
+    def update(self, new_items: int, limit: int):
+        """Size the next page, after a poll.
+
+        :param new_items: Number of new items found by the poll.
+        :param limit: Page size of the poll.
+        """
+        if self.rate is None:
+            self.rate = float(new_items)
+        else:
+            self.rate = self.smoothing * self.rate + (1 - self.smoothing) * new_items
+        # One more item than expected, to see an already seen one.
+        next_limit = math.ceil(self.headroom * self.rate) + 1
+        if new_items >= limit:
+            # The whole page was new: grow at least twice as big.
+            next_limit = max(next_limit, 2 * limit)
+        self.limit = max(self.min_limit, min(next_limit, self.max_limit))
 
 
 class StreamYielder:
@@ -32,12 +540,16 @@ class StreamYielder:
         limit: Optional[int],
         min_wait_time: int,
         max_wait_time: int,
+        stats: Optional[StreamStats] = None,
+        published_fn: Optional[Callable[[T], str]] = None,
+        page_sizer: Optional[PageSizer] = None,
     ):
         """Initialize StreamYielder.
 
         :param unique_key_fn: A function that takes an object and outputs a unique id.
         This is used to keep track of what results were already yielded.
-        :param filter_fn: Ignore objects which return `True` for this function.
+        :param filter_fn: Only yield objects for which this function returns `True`.
+        The others are still tracked as seen.
         :param limit: Maximum number of objects to yield.
         :param max_wait_time: If a function returns no new results, the time between
         calls to it increases. This sets the maximum time (in seconds) to wait before
@@ -47,39 +559,124 @@ class StreamYielder:
         :param skip_existing: If `True`, skip existing results and return only future
         ones.
         In practice, this means the results from the first request are ignored.
+        :param stats: [StreamStats][pylemmy.utils.StreamStats] to update.
+        :param published_fn: A function that takes an object and outputs its
+        `published` time, used to measure the lag of the stream in `stats`.
+        :param page_sizer: A [PageSizer][pylemmy.utils.PageSizer] sizing the pages
+        requested by `fetch`.
         """
         self.skip_existing = skip_existing
         self.filter_fn = filter_fn
         self.unique_key_fn = unique_key_fn
         self.limit = limit
+        self.stats = stats
+        self.published_fn = published_fn
+        self.page_sizer = page_sizer
 
         self.results_count = 0
         self.requests_count = 0
         self.found_keys: Set[str] = set()
         self.last_seen_key = ""
+        self._key_bytes = 0
 
         self.wait_time = min_wait_time
         self.min_wait_time = min_wait_time
         self.max_wait_time = max_wait_time
 
+    def fetch(
+        self,
+        results_fn: Callable[[KwArg(Any)], Iterable[T]],
+        function_kwargs: Dict[str, Any],
+    ) -> Iterable[T]:
+        """Poll the function, with pages sized by the `page_sizer`, if any.
+
+        :param results_fn: The function to call, which outputs a list of objects.
+        :param function_kwargs: Keyword parameters that are passed to the function.
+        :return: The results of the poll, to give to `yield_results`.
+        """
+        sizer = self.page_sizer
+        if sizer is None:
+            return results_fn(**function_kwargs)
+        first_limit = limit = sizer.limit
+        results: List[Any] = []
+        new_keys: Set[str] = set()
+        page = pages = 1
+        while True:
+            page_results: List[Any] = list(
+                results_fn(limit=limit, page=page, **function_kwargs)
+            )
+            results.extend(page_results)
+            page_new = 0
+            for r in page_results:
+                unique_key = self.unique_key_fn(r)
+                if unique_key not in self.found_keys:
+                    new_keys.add(unique_key)
+                    page_new += 1
+            # The first poll only gets one page, as without a sizer.
+            if (
+                self.requests_count == 0
+                or len(page_results) < limit
+                or page_new < len(page_results)
+                or pages >= sizer.max_pages
+            ):
+                break
+            pages += 1
+            if limit < sizer.max_limit:
+                # The whole page is new: catch up with the biggest pages, from the
+                # start, as pages of different sizes don't line up.
+                limit, page = sizer.max_limit, 1
+            else:
+                page += 1
+        if self.requests_count > 0:
+            # The first poll has all the existing items, not the new ones.
+            sizer.update(len(new_keys), first_limit)
+        if self.stats is not None:
+            self.stats.page_limit = sizer.limit
+            self.stats.extra_pages += pages - 1
+        return results
+
     def yield_results(self, results: Iterable[T]) -> Generator[Optional[T], None, None]:
         """Iterate through the results.
 
         :param results: Results from one to the generator function.
         """
-        skipping_yield = False
-        if self.requests_count == 1 and self.skip_existing:
-            skipping_yield = True
-        for r in filter(self.filter_fn, results):  # type: ignore[var-annotated, arg-type]
-            unique_key = self.unique_key_fn(r)
-            if unique_key not in self.found_keys:
+        self.requests_count += 1
+        skipping_yield = self.skip_existing and self.requests_count == 1
+        stats = self.stats
+        if stats is not None:
+            stats.polls += 1
+        new_items = 0
+        r: Any
+        try:
+            for r in results:
+                unique_key = self.unique_key_fn(r)
+                if unique_key in self.found_keys:
+                    if stats is not None:
+                        stats.duplicates += 1
+                    continue
                 self.last_seen_key = unique_key
-                if not skipping_yield:
+                self.found_keys.add(unique_key)
+                self._key_bytes += sys.getsizeof(unique_key)
+                new_items += 1
+                if stats is not None:
+                    stats.new_items += 1
+                # The keys of filtered out results are kept too, so that how many
+                # results are new is measured on the whole pages.
+                if not skipping_yield and self.filter_fn(r):
+                    if stats is not None and self.published_fn is not None:
+                        lag = datetime.datetime.now(datetime.timezone.utc) - parse_time(
+                            self.published_fn(r)
+                        )
+                        stats.lag.observe(lag.total_seconds())
                     yield r
                     self.results_count += 1
                 if self.limit is not None and self.results_count >= self.limit:
                     yield None
-                self.found_keys.add(unique_key)
+        finally:
+            if stats is not None:
+                stats.empty_polls += new_items == 0
+                stats.dedup_keys = len(self.found_keys)
+                stats.dedup_bytes = sys.getsizeof(self.found_keys) + self._key_bytes
 
     def get_wait_time(self, first_key: str) -> int:
         """Get how long we should wait.
@@ -92,6 +689,8 @@ class StreamYielder:
             self.wait_time = min(2 * self.wait_time, self.max_wait_time)
         else:
             self.wait_time = self.min_wait_time
+        if self.stats is not None:
+            self.stats.wait_time = self.wait_time
         return self.wait_time
 
 
@@ -104,6 +703,9 @@ def stream_generator(
     max_wait_time: int = 300,
     min_wait_time: int = 1,
     skip_existing: bool = False,
+    stats: Optional[StreamStats] = None,
+    published_fn: Optional[Callable[[T], str]] = None,
+    page_sizer: Optional[PageSizer] = None,
     **function_kwargs: Any,
 ) -> Generator[T, None, None]:
     """Helper function to generate streams.
@@ -111,7 +713,7 @@ def stream_generator(
     :param results_fn: A function to call repeatedly, which outputs a list of objects.
     :param unique_key_fn: A function that takes an object and outputs a unique id.
     This is used to keep track of what results were already yielded.
-    :param filter_fn: Ignore objects which return `True` for this function.
+    :param filter_fn: Only keep objects for which this function returns `True`.
     :param limit: Maximum number of objects to yield.
     :param max_wait_time: If a function returns no new results, the time between calls
     to it increases. This sets the maximum time (in seconds) to wait before calling it
@@ -120,6 +722,12 @@ def stream_generator(
     again.
     :param skip_existing: If `True`, skip existing results and return only future ones.
     In practice, this means the results from the first request are ignored.
+    :param stats: [StreamStats][pylemmy.utils.StreamStats] updated as the stream
+    runs.
+    :param published_fn: A function that takes an object and outputs its `published`
+    time, used to measure the lag of the stream in `stats`.
+    :param page_sizer: A [PageSizer][pylemmy.utils.PageSizer] passing `limit` and
+    `page` to the function, to size its pages from the rate of new results.
     :param function_kwargs: Keyword parameters that are passed to the function.
     """
     stream_obj = StreamYielder(
@@ -129,10 +737,13 @@ def stream_generator(
         limit=limit,
         min_wait_time=min_wait_time,
         max_wait_time=max_wait_time,
+        stats=stats,
+        published_fn=published_fn,
+        page_sizer=page_sizer,
     )
     while True:
         first_key = stream_obj.last_seen_key
-        results = results_fn(**function_kwargs)
+        results = stream_obj.fetch(results_fn, function_kwargs)
         for r in stream_obj.yield_results(results):
             if r is None:
                 return
@@ -150,6 +761,9 @@ async def async_stream_generator(
     max_wait_time: int = 300,
     min_wait_time: int = 1,
     skip_existing: bool = False,
+    stats: Optional[StreamStats] = None,
+    published_fn: Optional[Callable[[T], str]] = None,
+    page_sizer: Optional[PageSizer] = None,
     **function_kwargs: Any,
 ) -> AsyncGenerator[T, None]:
     """Helper function to generate streams.
@@ -157,7 +771,7 @@ async def async_stream_generator(
     :param results_fn: A function to call repeatedly, which outputs a list of objects.
     :param unique_key_fn: A function that takes an object and outputs a unique id.
     This is used to keep track of what results were already yielded.
-    :param filter_fn: Ignore objects which return `True` for this function.
+    :param filter_fn: Only keep objects for which this function returns `True`.
     :param limit: Maximum number of objects to yield.
     :param max_wait_time: If a function returns no new results, the time between calls
     to it increases. This sets the maximum time (in seconds) to wait before calling it
@@ -166,6 +780,12 @@ async def async_stream_generator(
     again.
     :param skip_existing: If `True`, skip existing results and return only future ones.
     In practice, this means the results from the first request are ignored.
+    :param stats: [StreamStats][pylemmy.utils.StreamStats] updated as the stream
+    runs.
+    :param published_fn: A function that takes an object and outputs its `published`
+    time, used to measure the lag of the stream in `stats`.
+    :param page_sizer: A [PageSizer][pylemmy.utils.PageSizer] passing `limit` and
+    `page` to the function, to size its pages from the rate of new results.
     :param function_kwargs: Keyword parameters that are passed to the function.
     """
     stream_obj = StreamYielder(
@@ -175,10 +795,13 @@ async def async_stream_generator(
         limit=limit,
         min_wait_time=min_wait_time,
         max_wait_time=max_wait_time,
+        stats=stats,
+        published_fn=published_fn,
+        page_sizer=page_sizer,
     )
     while True:
         first_key = stream_obj.last_seen_key
-        results = results_fn(**function_kwargs)
+        results = stream_obj.fetch(results_fn, function_kwargs)
         for r in stream_obj.yield_results(results):
             if r is None:
                 return
@@ -196,10 +819,14 @@ async def _merge_streams(
     limit: Optional[int] = None,
     max_wait_time: int = 300,
     min_wait_time: int = 1,
+    stats: Optional[Sequence[StreamStats]] = None,
+    published_fns: Optional[Sequence[Callable[[T], str]]] = None,
+    page_sizers: Optional[Sequence[PageSizer]] = None,
     **function_kwargs: Any,
 ):
     if limit is not None and limit <= 0:
         return None
+    n_sources = len(results_fns)
     streams = [
         async_stream_generator(
             gen,
@@ -208,11 +835,23 @@ async def _merge_streams(
             limit=limit,
             max_wait_time=max_wait_time,
             min_wait_time=min_wait_time,
+            stats=source_stats,
+            published_fn=published_fn,
+            page_sizer=page_sizer,
             **function_kwargs,
         )
-        for gen, uniq in zip(results_fns, unique_key_fns)
+        for gen, uniq, source_stats, published_fn, page_sizer in zip(
+            results_fns,
+            unique_key_fns,
+            stats if stats is not None else [None] * n_sources,
+            published_fns if published_fns is not None else [None] * n_sources,
+            page_sizers if page_sizers is not None else [None] * n_sources,
+        )
     ]
 
+    # aiostream is only needed here, and slow to import.
+    from aiostream import stream
+
     merged_streams = stream.merge(*streams)
     count = 0
     async with merged_streams.stream() as streamer:
@@ -232,6 +871,9 @@ def stream_apply(
     limit: Optional[int] = None,
     max_wait_time: int = 300,
     min_wait_time: int = 1,
+    stats: Optional[Sequence[StreamStats]] = None,
+    published_fns: Optional[Sequence[Callable[[T], str]]] = None,
+    page_sizers: Optional[Sequence[PageSizer]] = None,
     **function_kwargs: Any,
 ):
     """Helper function to generate streams.
@@ -242,21 +884,34 @@ def stream_apply(
     each of them takes an object and outputs a unique id.
     This is used to keep track of what results were already yielded.
     :param callback: A function that is applied to each of the objects.
-    :param filter_fn: Ignore objects which return `True` for this function.
+    :param filter_fn: Only keep objects for which this function returns `True`.
     :param limit: Maximum number of objects to yield.
     :param max_wait_time: If a function returns no new results, the time between calls
     to it increases. This sets the maximum time (in seconds) to wait before calling it
     again.
     :param min_wait_time: Minimum time (in seconds) to wait before calling the function
     again.
+    :param stats: A list of [StreamStats][pylemmy.utils.StreamStats] (same length as
+    `results_fns`), updated as each source is polled.
+    :param published_fns: A list of functions (same length as `results_fns`), where
+    each of them takes an object and outputs its `published` time, used to measure
+    the lag of the stream in `stats`.
+    :param page_sizers: A list of [PageSizer][pylemmy.utils.PageSizer] (same length
+    as `results_fns`), sizing the pages of each source from its rate of new results.
     :param function_kwargs: Keyword parameters that are passed to the function.
     """
-    if len(results_fns) != len(unique_key_fns):
-        msg = (
-            f"The lengths of `generator_fns` and `unique_key_fns` need to be the same. "
-            f"Got {len(results_fns)} and {len(unique_key_fns)}."
-        )
-        raise ValueError(msg)
+    for name, fns in (
+        ("unique_key_fns", unique_key_fns),
+        ("stats", stats),
+        ("published_fns", published_fns),
+        ("page_sizers", page_sizers),
+    ):
+        if fns is not None and len(fns) != len(results_fns):
+            msg = (
+                f"The lengths of `results_fns` and `{name}` need to be the same. "
+                f"Got {len(results_fns)} and {len(fns)}."
+            )
+            raise ValueError(msg)
     asyncio.run(
         _merge_streams(
             results_fns,
@@ -266,6 +921,9 @@ def stream_apply(
             limit=limit,
             max_wait_time=max_wait_time,
             min_wait_time=min_wait_time,
+            stats=stats,
+            published_fns=published_fns,
+            page_sizers=page_sizers,
             **function_kwargs,
         )
     )
@@ -0,0 +1,45 @@
+"""Shared fixtures for the unit tests."""
+
+from typing import Optional
+
+import pytest
+
+from pylemmy import Lemmy, api
+from pylemmy.testing.synthetic import make_comment_view, make_post_view
+
+
+def build_post_view(
+    post_id: int, name: str = "A post", body: Optional[str] = None
+) -> api.post.PostView:
+    """Build a valid PostView with the given id, title and body."""
+    return make_post_view(post_id, name, body)
+
+
+def build_comment_view(
+    comment_id: int, content: str = "A comment", post_id: int = 1
+) -> api.comment.CommentView:
+    """Build a valid CommentView with the given id, content and post id."""
+    return make_comment_view(comment_id, content, post_id)
+
+
+@pytest.fixture
+def post_view_factory():
+    """Fixture returning a function that builds PostViews."""
+    return build_post_view
+
+
+@pytest.fixture
+def comment_view_factory():
+    """Fixture returning a function that builds CommentViews."""
+    return build_comment_view
+
+
+@pytest.fixture
+def lemmy():
+    """Fixture for a Lemmy client pointing to an unreachable instance."""
+    return Lemmy(
+        lemmy_url="http://lemmy.test",
+        username=None,
+        password=None,
+        user_agent="pylemmy unit tests",
+    )
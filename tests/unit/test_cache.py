@@ -0,0 +1,100 @@
+"""Test the cache for responses of GET requests."""
+
+import time
+
+from pylemmy.cache import MemoryCacheBackend, ResponseCache, SQLiteCacheBackend
+from pylemmy.endpoints import LemmyAPI
+
+
+class Counter:
+    """Test fetch function, counting how many times it was called."""
+
+    def __init__(self):
+        """Initialize the counter."""
+        self.calls = 0
+
+    def __call__(self):
+        """Return a new response on each call."""
+        self.calls += 1
+        return {"call": self.calls}
+
+
+def test_ttl_and_invalidation():
+    """Responses are reused until they expire, or a write outdates them."""
+    cache = ResponseCache({LemmyAPI.Community: 60})
+    fetch = Counter()
+
+    def get(name, token=None):
+        return cache.get_or_fetch(LemmyAPI.Community, {"name": name}, token, fetch)
+
+    assert get("a") == {"call": 1}
+    assert get("a") == {"call": 1}
+    assert get("a", token="jwt") == {"call": 2}
+    assert get("b") == {"call": 3}
+    assert cache.stats() == {"hits": 1, "stale_hits": 0, "misses": 3, "hit_ratio": 0.25}
+
+    cache.invalidate_after_write(LemmyAPI.Community)
+    assert get("a") == {"call": 4}
+    assert not cache.caches(LemmyAPI.GetPosts)
+
+
+def test_stale_while_revalidate():
+    """Expired responses are returned while being refreshed in the background."""
+    cache = ResponseCache({LemmyAPI.Person: 0}, stale_ttl=60)
+    fetch = Counter()
+
+    def get():
+        return cache.get_or_fetch(LemmyAPI.Person, {}, None, fetch)
+
+    assert get() == {"call": 1}
+    assert get() == {"call": 1}
+    # The refreshed response is stored after the fetch returns.
+    key = cache.key(LemmyAPI.Person, {}, None)
+    for _ in range(100):
+        cached = cache.backend.get(key)
+        if cached is not None and cached[1] == {"call": 2}:
+            break
+        time.sleep(0.01)
+    assert get() == {"call": 2}
+    assert cache.stale_hits == 2
+
+
+def test_memory_backend_bounds():
+    """The least recently used responses are dropped first."""
+    backend = MemoryCacheBackend(max_entries=2, max_bytes=100)
+    backend.set("a", "e", {"x": 1}, 0)
+    backend.set("b", "e", {"x": 2}, 0)
+    backend.get("a")
+    backend.set("c", "e", {"x": 3}, 0)
+    assert backend.get("b") is None
+    assert backend.get("a") == (0, {"x": 1})
+
+    backend.set("d", "e", {"x": "y" * 100}, 0)
+    assert backend.get("a") is None
+    assert backend.get("d") is not None
+
+
+def test_sqlite_backend_shared(tmp_path):
+    """Responses stored by one SQLite backend are seen by another one."""
+    path = str(tmp_path / "cache.db")
+    SQLiteCacheBackend(path).set("key", "endpoint", {"x": 1}, 10)
+
+    other = SQLiteCacheBackend(path)
+    assert other.get("key") == (10, {"x": 1})
+    other.invalidate(["endpoint"])
+    assert other.get("key") is None
+
+
+def test_sqlite_backend_bounds(tmp_path):
+    """The expired responses are deleted, then the oldest ones beyond the limit."""
+    backend = SQLiteCacheBackend(
+        str(tmp_path / "cache.db"), max_entries=2, max_age=60, sweep_every=4
+    )
+    now = time.time()
+    backend.set("expired", "e", {"x": 0}, now - 120)
+    for i in range(3):
+        backend.set(str(i), "e", {"x": i}, now + i)
+    assert backend.get("expired") is None
+    assert backend.get("0") is None
+    assert backend.get("1") == (now + 1, {"x": 1})
+    assert backend.get("2") == (now + 2, {"x": 2})
@@ -0,0 +1,43 @@
+"""Test recording and replaying requests with cassettes."""
+
+import gzip
+
+import pytest
+
+from pylemmy import Lemmy
+from pylemmy.cassette import CassetteMissError
+from pylemmy.testing.synthetic import SyntheticInstance
+from pylemmy.transport import FakeTransport
+
+
+def test_record_and_replay(tmp_path):
+    """Replayed requests get the recorded responses, in order."""
+    instance = SyntheticInstance()
+    instance.generate(n_posts=5)
+    transport = FakeTransport(instance=instance, latency=0.05)
+    lemmy = Lemmy("http://lemmy.test", "user", "secret", "tests", transport=transport)
+    cassette = str(tmp_path / "cassette.jsonl.gz")
+
+    with lemmy.record(cassette) as recorder:
+        community = lemmy.get_community(1)
+        first = [p.post_view.post.id for p in community.get_posts()]
+        instance.generate(n_posts=2)
+        second = [p.post_view.post.id for p in community.get_posts()]
+    assert recorder.recorded == 4
+    with gzip.open(cassette, "rt") as file:
+        assert "secret" not in file.read()
+
+    offline = Lemmy("http://other.test", "user", "secret", "replay")
+    with offline.replay(cassette) as replayer:
+        community = offline.get_community(1)
+        assert [p.post_view.post.id for p in community.get_posts()] == first
+        assert [p.post_view.post.id for p in community.get_posts()] == second
+        # The last response is repeated.
+        assert [p.post_view.post.id for p in community.get_posts()] == second
+        with pytest.raises(CassetteMissError):
+            offline.get_community(2)
+        assert offline.get_token() == "replayed-token"
+    assert replayer.replayed == 5
+    # The replayed login isn't used by the requests sent after the replay.
+    offline.transport = transport
+    assert offline.get_token() != "replayed-token"
@@ -0,0 +1,73 @@
+"""Test the streams of changes."""
+
+import itertools
+
+from pylemmy import Lemmy
+from pylemmy.changes import ChangeTracker, ChangeType
+from pylemmy.testing.synthetic import SyntheticInstance
+from pylemmy.transport import FakeTransport
+from pylemmy.utils import StreamStats
+
+
+def test_change_tracker_eviction():
+    """Dropped fingerprints are bounded, and don't make old items look new."""
+    tracker = ChangeTracker(
+        lambda x: str(x[0]),
+        lambda x: (hash(x[1]), 0, x[0]),
+        [],
+        max_items=2,
+    )
+    assert [e.type for e in tracker.observe((1, "a"))] == [ChangeType.CREATED]
+    assert [e.type for e in tracker.observe((2, "b"))] == [ChangeType.CREATED]
+    assert [e.type for e in tracker.observe((3, "c"))] == [ChangeType.CREATED]
+    assert len(tracker) == 2
+    assert tracker.evicted == 1
+
+    assert tracker.observe((1, "a")) == []
+    assert tracker.observe((3, "c")) == []
+    assert [e.type for e in tracker.observe((3, "d"))] == [ChangeType.EDITED]
+    assert [e.type for e in tracker.observe((4, "e"))] == [ChangeType.CREATED]
+    assert tracker.unchanged == 1
+
+
+def test_post_changes():
+    """Edits and flag changes of posts seen before are streamed."""
+    instance = SyntheticInstance(n_communities=1)
+    posts = [instance.add_post(1)["post"]["id"] for _ in range(5)]
+    lemmy = Lemmy(
+        "http://lemmy.test",
+        None,
+        None,
+        "tests",
+        transport=FakeTransport(instance=instance),
+    )
+    stats = StreamStats()
+    changes = lemmy.get_community(1).stream.get_post_changes(
+        min_wait_time=0, max_wait_time=0, stats=stats
+    )
+
+    created = list(itertools.islice(changes, 5))
+    assert {e.type for e in created} == {ChangeType.CREATED}
+    assert sorted(e.item.post_view.post.id for e in created) == posts
+
+    instance.edit(post_id=posts[0], name="edited")
+    instance.edit(post_id=posts[1], removed=True, locked=True)
+    new_post = instance.add_post(1)["post"]["id"]
+    events = {(e.type, e.item.post_view.post.id) for e in itertools.islice(changes, 4)}
+    assert events == {
+        (ChangeType.CREATED, new_post),
+        (ChangeType.EDITED, posts[0]),
+        (ChangeType.REMOVED, posts[1]),
+        (ChangeType.LOCKED, posts[1]),
+    }
+    assert stats.polls == 1
+    assert stats.duplicates == 0
+
+    instance.edit(post_id=posts[1], removed=False)
+    event = next(changes)
+    assert (event.type, event.item.post_view.post.removed) == (
+        ChangeType.UNREMOVED,
+        False,
+    )
+    assert stats.polls == 2
+    assert stats.duplicates == 3
@@ -0,0 +1,62 @@
+"""Test the fake Lemmy server, and its fault injection."""
+
+import pytest
+import requests
+
+from pylemmy import Lemmy
+from pylemmy.endpoints import LemmyAPI
+from pylemmy.fake_server import FakeLemmyServer, Faults
+from pylemmy.testing.synthetic import SyntheticInstance
+from pylemmy.transport import FakeTransport, RequestsTransport, Response, RetryTransport
+
+
+def test_fake_server():
+    """The server answers like a Lemmy instance, with the instance's content."""
+    instance = SyntheticInstance(n_communities=3)
+    instance.generate(n_posts=20, n_comments=20)
+    with FakeLemmyServer(instance) as server:
+        lemmy = Lemmy(server.url, "user", "password", "tests")
+        community = lemmy.get_community("community2")
+        posts = community.get_posts(limit=50)
+        assert posts
+        assert {p.post_view.community.id for p in posts} == {2}
+
+        comment = lemmy.get_post(post_id=posts[0].post_view.post.id).create_comment(
+            "Hello!"
+        )
+        assert instance.comments[-1]["comment"]["id"] == comment.comment_view.comment.id
+        assert server.responses[(LemmyAPI.Comment.value, 200)] == 1
+
+        with pytest.raises(requests.HTTPError):
+            lemmy.get_comment(10_000)
+
+
+def test_faults():
+    """Requests beyond the rate limit get a 429, and errors can be retried."""
+    faults = Faults(rate_limit=1, burst=2)
+    with FakeLemmyServer(faults=faults) as server:
+        lemmy = Lemmy(server.url, None, None, "tests")
+        lemmy.get_community(1)
+        lemmy.get_community(1)
+        with pytest.raises(requests.HTTPError) as error:
+            lemmy.get_community(1)
+        assert error.value.response.status_code == 429
+        assert error.value.response.headers["Retry-After"] == "1"
+
+    faults = Faults(error_rate=1)
+    with FakeLemmyServer(faults=faults) as server:
+        transport = RetryTransport(RequestsTransport(), min_retry_wait=0.01)
+        lemmy = Lemmy(server.url, None, None, "tests", transport=transport)
+        with pytest.raises(requests.HTTPError):
+            lemmy.get_community(1)
+        assert transport.retries == transport.max_retries
+
+
+def test_retry_transport():
+    """Transient errors are retried until the request succeeds."""
+    answers = [Response.from_json({}, 503), Response.from_json({}, 502), {"ok": 1}]
+    inner = FakeTransport({LemmyAPI.GetSite: lambda _: answers.pop(0)})
+    transport = RetryTransport(inner, min_retry_wait=0.01)
+    lemmy = Lemmy("http://lemmy.test", None, None, "tests", transport=transport)
+    assert lemmy.get_request(LemmyAPI.GetSite) == {"ok": 1}
+    assert transport.retries == 2
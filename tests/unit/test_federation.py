@@ -0,0 +1,89 @@
+"""Test the streams of communities followed from several instances."""
+
+import pytest
+
+from pylemmy import Lemmy
+from pylemmy.federation import FederatedStream
+from pylemmy.testing.synthetic import SyntheticInstance
+from pylemmy.transport import FakeTransport
+
+
+def client(instance):
+    """Get a client of a synthetic instance."""
+    return Lemmy(
+        f"http://{instance.host}",
+        None,
+        None,
+        "tests",
+        transport=FakeTransport(instance=instance),
+    )
+
+
+def federate(view, home, post_id):
+    """Make a PostView of a mirror instance a copy of a post of the home instance."""
+    view["post"]["ap_id"] = f"https://{home.host}/post/{post_id}"
+    view["post"]["local"] = False
+    view["community"]["actor_id"] = home.communities[1]["community"]["actor_id"]
+
+
+@pytest.fixture
+def instances():
+    """Fixture for a home instance, and a mirror following its community."""
+    home = SyntheticInstance(host="home.test")
+    mirror = SyntheticInstance(host="mirror.test")
+    community = mirror.communities[1]["community"]
+    community["actor_id"] = home.communities[1]["community"]["actor_id"]
+    community["local"] = False
+    return home, mirror
+
+
+def test_assignments(instances):
+    """Communities are polled on their home instance, then on the others."""
+    home, mirror = instances
+    home_client, mirror_client = client(home), client(mirror)
+    actor_id = home.communities[1]["community"]["actor_id"]
+
+    stream = FederatedStream([mirror_client, home_client], ["community1"])
+    assert stream.assignments() == {
+        "http://home.test/": [actor_id],
+        "http://mirror.test/": [],
+    }
+    stream = FederatedStream([mirror_client, home_client], ["community1"], redundancy=2)
+    assert stream.assignments() == {
+        "http://home.test/": [actor_id],
+        "http://mirror.test/": [actor_id],
+    }
+    with pytest.raises(LookupError):
+        FederatedStream([home_client], ["missing"])
+
+
+def test_federated_stream(instances):
+    """Items are delivered once, from their home instance when it has them."""
+    home, mirror = instances
+    for _ in range(3):
+        home.add_post()
+    for post_id in range(1, 5):
+        federate(mirror.add_post(), home, post_id)
+    stream = FederatedStream(
+        [client(home), client(mirror)],
+        ["community1"],
+        redundancy=2,
+        local_grace=0.2,
+    )
+
+    posts = list(stream.get_posts(limit=4, min_wait_time=0.01, max_wait_time=0.01))
+    by_ap_id = {p.post_view.post.ap_id: p.post_view.post for p in posts}
+    assert len(by_ap_id) == 4
+    # The fourth post didn't reach its home instance yet: the copy is delivered.
+    assert [by_ap_id[f"https://home.test/post/{i}"].local for i in range(1, 5)] == [
+        True,
+        True,
+        True,
+        False,
+    ]
+    assert stream.delivered == 4
+    assert stream.duplicates == 3
+    assert set(stream.stats_snapshot()) == {
+        "posts/community1@home.test",
+        "posts/community1@mirror.test",
+    }
@@ -0,0 +1,80 @@
+"""Test the declarative filters."""
+
+from pylemmy import Lemmy, api
+from pylemmy.filters import Filter
+from pylemmy.models.comment import Comment
+from pylemmy.models.post import Post
+from pylemmy.testing.synthetic import SyntheticInstance
+from pylemmy.transport import FakeTransport
+
+
+def test_pushdown_by_endpoint():
+    """Conditions are sent to the server only when the endpoint supports them."""
+    filters = Filter(sort="New", saved=True, max_depth=2, unresolved=True)
+
+    params, _ = filters.compile(api.post.GetPosts)
+    assert params == {"sort": "New", "saved_only": True}
+
+    params, _ = filters.compile(api.comment.GetComments)
+    assert params == {"sort": "New", "saved_only": True, "max_depth": 2}
+
+    params, _ = filters.compile(api.post.ListPostReports)
+    assert params == {"unresolved_only": True}
+
+
+def test_client_side_remainder(lemmy, comment_view_factory):
+    """Conditions that can't be pushed down are evaluated on each object."""
+    shallow = Comment(lemmy, comment_view_factory(1))
+    deep = Comment(lemmy, comment_view_factory(2))
+    deep.comment_view.comment.path = "0.1.2.3"
+
+    filters = Filter(
+        saved=False, max_depth=2, where=lambda c: c.comment_view.comment.id != 3
+    )
+    params, predicate = filters.compile(api.post.GetPosts)
+    assert params == {}
+    assert predicate(shallow)
+    assert not predicate(deep)
+
+    shallow.comment_view.saved = True
+    assert not predicate(shallow)
+
+
+def test_shared_filter_across_models(lemmy, comment_view_factory):
+    """A filter shared by posts and comments only sends the sorts each supports."""
+    params, _ = Filter(sort="Active").compile(api.comment.GetComments)
+    assert params == {}
+    params, _ = Filter(sort=api.listing.SortType.TopDay).compile(
+        api.comment.GetComments
+    )
+    assert params == {"sort": "Top"}
+    api.comment.GetComments(**params)
+    params, _ = Filter(sort=api.listing.SortType.Active).compile(api.post.GetPosts)
+    assert params == {"sort": api.listing.SortType.Active}
+
+    # Conditions on another kind of views are skipped, and views without the field
+    # of a condition fail it, instead of raising.
+    comment = Comment(lemmy, comment_view_factory(1))
+    _, predicate = Filter(unresolved=True).compile(api.post.GetPosts)
+    assert predicate(comment)
+    _, predicate = Filter(community_name="test").compile(api.post.ListPostReports)
+    assert not predicate(object())
+
+
+def test_content_apply_comment_condition():
+    """A condition on comments keeps all the posts of a multi-community stream."""
+    instance = SyntheticInstance(n_communities=1)
+    instance.generate(n_posts=2, n_comments=2)
+    lemmy = Lemmy(
+        "http://lemmy.test",
+        None,
+        None,
+        "tests",
+        transport=FakeTransport(instance=instance),
+    )
+    items = []
+    lemmy.multi_communities_stream([1]).content_apply(
+        items.append, filters=Filter(max_depth=1), limit=4, min_wait_time=0
+    )
+    assert sum(isinstance(item, Post) for item in items) == 2
+    assert sum(isinstance(item, Comment) for item in items) == 2
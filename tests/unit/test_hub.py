@@ -0,0 +1,113 @@
+"""Test the stream hub and its subscriptions."""
+
+import pytest
+
+from pylemmy import Lemmy
+from pylemmy.endpoints import LemmyAPI
+from pylemmy.hub import StreamHub
+from pylemmy.models.post import Post
+from pylemmy.testing.synthetic import SyntheticInstance
+from pylemmy.transport import FakeTransport
+
+
+@pytest.fixture
+def instance():
+    """Fixture for a synthetic instance with two communities."""
+    return SyntheticInstance(n_communities=2)
+
+
+@pytest.fixture
+def lemmy(instance):
+    """Fixture for a client of the synthetic instance."""
+    return Lemmy(
+        "http://lemmy.test",
+        None,
+        None,
+        "tests",
+        transport=FakeTransport(instance=instance),
+    )
+
+
+def post_ids(items):
+    """Get the ids of Posts."""
+    return [p.post_view.post.id for p in items]
+
+
+def drain(subscription):
+    """Get all the items queued in a subscription."""
+    items = []
+    while len(subscription):
+        items.append(subscription.get(timeout=0))
+    return items
+
+
+def test_fan_out(instance, lemmy):
+    """Each source is polled once per round, whatever the number of subscribers."""
+    hub = StreamHub(min_wait_time=0)
+    first = hub.add_posts(lemmy.get_community(1))
+    hub.add_posts(lemmy.get_community(2))
+    everything = hub.subscribe(max_size=100)
+    only_first = hub.subscribe([first], max_size=100)
+    latest = hub.subscribe(max_size=2, policy="drop_oldest")
+    spilled = hub.subscribe(max_size=2, policy="spill")
+
+    for i in range(6):
+        instance.add_post(community_id=i % 2 + 1)
+    hub.poll_once()
+    hub.poll_once()
+    polls = lemmy.transport.calls[("GET", LemmyAPI.GetPosts.value)]
+    assert polls == 4
+
+    assert sorted(post_ids(drain(everything))) == list(range(1, 7))
+    assert post_ids(drain(only_first)) == [5, 3, 1]
+    assert len(latest) == 2
+    assert latest.dropped == 4
+
+    # Spilled items are read back in order, and rebuilt as Posts.
+    assert len(spilled) == 6
+    assert spilled.spilled == 4
+    instance.add_post(community_id=1)
+    hub.poll_once()
+    spilled.close()
+    items = drain(spilled)
+    assert all(isinstance(p, Post) for p in items)
+    assert post_ids(items) == [5, 3, 1, 6, 4, 2, 7]
+    # The spill file is deleted once drained.
+    assert spilled._spill_file is None
+
+    assert hub.stats_snapshot()[first]["new_items"] == 4
+
+
+def test_threads(instance, lemmy):
+    """Pollers run in the background, and blocked subscribers slow them down."""
+    hub = StreamHub(min_wait_time=0, max_wait_time=0)
+    hub.add_posts(lemmy.get_community(1))
+    blocking = hub.subscribe(max_size=1)
+    for _ in range(3):
+        instance.add_post(community_id=1)
+
+    with hub:
+        assert post_ids(blocking.get(timeout=5) for _ in range(3)) == [3, 2, 1]
+        with pytest.raises(TimeoutError):
+            blocking.get(timeout=0.01)
+    assert blocking.closed
+    assert list(blocking) == []
+
+
+def test_errors():
+    """Errors of a source are reported, and its poller keeps running."""
+
+    def check(item):
+        if item == 2:
+            msg = "broken item"
+            raise ValueError(msg)
+        return True
+
+    hub = StreamHub(min_wait_time=0, max_wait_time=0)
+    hub.add_source("numbers", lambda: [1, 2, 3], str, filter_fn=check)
+    subscription = hub.subscribe(max_size=10)
+
+    hub.poll_once()
+    assert isinstance(hub.errors["numbers"], ValueError)
+    with hub:
+        assert [subscription.get(timeout=5) for _ in range(2)] == [1, 3]
@@ -0,0 +1,49 @@
+"""Test that slow dependencies are only imported when needed."""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+
+def imported_modules(code: str):
+    """Run code in a fresh interpreter, and list the modules it imported."""
+    output = subprocess.run(  # noqa: S603
+        [
+            sys.executable,
+            "-c",
+            f"{code}\nimport json, sys\nprint(json.dumps(list(sys.modules)))",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return set(json.loads(output))
+
+
+@pytest.mark.parametrize(
+    ("code", "not_imported"),
+    [
+        ("import pylemmy", {"pylemmy.lemmy", "pydantic", "requests"}),
+        ("import pylemmy.endpoints", {"pylemmy.api", "pydantic"}),
+        ("from pylemmy import api", {"pylemmy.api.post", "pydantic"}),
+        (
+            "from pylemmy import Lemmy",
+            {"aiostream", "pylemmy.cassette", "pylemmy.testing.synthetic"},
+        ),
+    ],
+)
+def test_lazy_imports(code, not_imported):
+    """Modules aren't imported before they are used."""
+    assert not_imported.isdisjoint(imported_modules(code))
+
+
+def test_lazy_attributes():
+    """Lazily imported modules and classes can be used as before."""
+    modules = imported_modules(
+        "from pylemmy import Lemmy, api\n"
+        "api.post.GetPostsResponse(posts=[])\n"
+        "Lemmy('http://lemmy.test', None, None, 'tests')"
+    )
+    assert {"pylemmy.lemmy", "pylemmy.api.post"} <= modules
@@ -0,0 +1,42 @@
+"""Test the local full-text index."""
+
+import pytest
+
+from pylemmy.index import ContentIndex
+from pylemmy.models.comment import Comment
+from pylemmy.models.post import Post
+
+
+@pytest.fixture
+def index(lemmy):
+    """Fixture for an in-memory index."""
+    content_index = ContentIndex(lemmy)
+    yield content_index
+    content_index.close()
+
+
+def test_search_posts(index, lemmy, post_view_factory):
+    """Posts are found by words in their name or body."""
+    index.add_many(
+        [
+            Post(lemmy, post_view_factory(1, "What is Python?")),
+            Post(lemmy, post_view_factory(2, "Cats", body="I love python")),
+            Post(lemmy, post_view_factory(3, "Dogs")),
+        ]
+    )
+    results = index.search_posts("python")
+    assert sorted(p.post_view.post.id for p in results) == [1, 2]
+    assert results[0].lemmy is lemmy
+    assert index.search_posts("giraffe") == []
+
+
+def test_reindex_replaces(index, lemmy, post_view_factory, comment_view_factory):
+    """Adding an item again replaces the previously indexed version."""
+    index(Comment(lemmy, comment_view_factory(1, "old text")))
+    index(Comment(lemmy, comment_view_factory(1, "new text")))
+    index(Post(lemmy, post_view_factory(1)))
+
+    assert len(index) == 2
+    assert index.search_comments("old") == []
+    (comment,) = index.search_comments("new", post_id=1)
+    assert comment.comment_view.comment.content == "new text"
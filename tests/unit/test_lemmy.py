@@ -0,0 +1,126 @@
+"""Test the Lemmy class without a Lemmy instance."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from pylemmy import Lemmy, api
+from pylemmy.endpoints import LemmyAPI
+from pylemmy.models.post import Post
+from pylemmy.testing.synthetic import SyntheticInstance
+from pylemmy.transport import FakeTransport
+
+
+class FakeReport:
+    """Test report, which fails to resolve for negative ids."""
+
+    def __init__(self, report_id: int):
+        """Initialize the report.
+
+        :param report_id: Some integer id.
+        """
+        self.report_id = report_id
+
+    def resolve(self, *, resolved: bool):
+        """Resolve the report."""
+        if self.report_id < 0:
+            msg = "Report not found"
+            raise RuntimeError(msg)
+        return (self.report_id, resolved)
+
+
+def test_resolve_many(lemmy):
+    """Each report is resolved, with per-report errors."""
+    results = lemmy.resolve_many([FakeReport(1), FakeReport(-1), FakeReport(3)])
+
+    assert [r.ok for r in results] == [True, False, True]
+    assert results[0].value == (1, True)
+    assert isinstance(results[1].error, RuntimeError)
+
+
+def test_get_posts_by_id(lemmy, monkeypatch, post_view_factory):
+    """Posts are fetched once per id, in order, and cached between calls."""
+    fetched = []
+
+    def get_post(*, post_id):
+        if post_id == 0:
+            msg = "Post not found"
+            raise RuntimeError(msg)
+        fetched.append(post_id)
+        return Post(lemmy, post_view_factory(post_id))
+
+    monkeypatch.setattr(lemmy, "get_post", get_post)
+    lemmy.entity_caches["post"].max_size = 10
+
+    results = lemmy.get_posts_by_id([2, 0, 1, 2])
+    assert [r.key for r in results] == [2, 0, 1, 2]
+    assert [r.ok for r in results] == [True, False, True, True]
+    assert results[0].value is results[3].value
+    assert sorted(fetched) == [1, 2]
+
+    lemmy.get_posts_by_id([1, 3])
+    assert sorted(fetched) == [1, 2, 3]
+
+
+def test_coalesce_get_requests():
+    """Identical concurrent GET requests are sent only once."""
+    transport = FakeTransport(
+        {LemmyAPI.Post: lambda p: {"id": int(p["id"])}}, latency=0.2
+    )
+    lemmy = Lemmy("http://lemmy.test", None, None, "tests", transport=transport)
+    params = api.post.GetPost(id=1)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            executor.submit(lemmy.get_request, LemmyAPI.Post, params) for _ in range(4)
+        ]
+        results = [f.result() for f in futures]
+
+    async def get_async():
+        return await asyncio.gather(
+            *(lemmy.get_request_async(LemmyAPI.Post, params) for _ in range(3))
+        )
+
+    results += asyncio.run(get_async())
+
+    assert results == [{"id": 1}] * 7
+    assert transport.calls[("GET", LemmyAPI.Post.value)] == 2
+    assert lemmy.coalescing_stats() == {"requests": 2, "shared": 5}
+
+
+def test_thread_safe_client():
+    """Threads share one login, and `map` fans calls out over the client's pool."""
+    instance = SyntheticInstance(n_communities=4)
+    instance.generate(n_posts=20, n_comments=0)
+    transport = FakeTransport(instance=instance, latency=0.05)
+    lemmy = Lemmy("http://lemmy.test", "user", "password", "tests", transport=transport)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        logins = list(executor.map(lambda _: lemmy.login(), range(4)))
+    assert all(login is logins[0] for login in logins)
+    assert transport.calls[("POST", LemmyAPI.Login.value)] == 1
+
+    with lemmy:
+        results = lemmy.map(lambda c: lemmy.get_community(c).get_posts(), [1, 2, 3, 9])
+        executor = lemmy._executor
+        lemmy.map(lambda c: c, [1])
+        assert lemmy._executor is executor
+
+    assert [r.ok for r in results] == [True, True, True, False]
+    for community_id, result in zip([1, 2, 3], results):
+        assert {p.post_view.community.id for p in result.value} == {community_id}
+    assert lemmy._executor is None
+
+
+def test_iter_posts_with_cursors():
+    """A community is crawled with cursors, each Post exactly once."""
+    instance = SyntheticInstance(n_communities=1, page_cursors=True)
+    instance.generate(n_posts=45, n_comments=0)
+    transport = FakeTransport(instance=instance)
+    lemmy = Lemmy("http://lemmy.test", None, None, "tests", transport=transport)
+    community = lemmy.get_community(1)
+
+    ids = [post.post_view.post.id for post in community.iter_posts(limit=30)]
+    assert ids == list(range(45, 15, -1))
+    assert transport.calls[("GET", LemmyAPI.GetPosts.value)] == 3
+
+    ids = [post.post_view.post.id for post in community.iter_posts()]
+    assert ids == list(range(45, 0, -1))
@@ -0,0 +1,33 @@
+"""Test the multi-pattern keyword matcher."""
+
+from pylemmy.matcher import KeywordMatcher
+from pylemmy.models.comment import Comment
+from pylemmy.models.post import Post
+
+
+def test_phrases(lemmy, post_view_factory, comment_view_factory):
+    """Phrases match in the default fields, and the longest phrase is reported."""
+    matcher = KeywordMatcher(
+        {"what": "what is", "what_exactly": "what is that", "who": "who is"}
+    )
+    post = Post(lemmy, post_view_factory(1, "Hello", body="WHAT IS THAT? who is it?"))
+    comment = Comment(lemmy, comment_view_factory(1, "nothing to see"))
+
+    assert matcher(post)
+    assert not matcher(comment)
+    assert matcher.matches(post) == ["what_exactly", "who"]
+    assert matcher.matches(comment) == []
+
+
+def test_regex_and_fields(lemmy, post_view_factory):
+    """Regular expressions can be matched against chosen fields only."""
+    matcher = KeywordMatcher(
+        {"number": r"\d+", "cat": "cats?"},
+        fields=["post_view.post.name"],
+        regex=True,
+        whole_words=True,
+    )
+    post = Post(lemmy, post_view_factory(1, "2 cats", body="dog"))
+
+    assert matcher.matches(post) == ["number", "cat"]
+    assert not matcher(Post(lemmy, post_view_factory(2, "concatenate", body="cat")))
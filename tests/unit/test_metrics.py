@@ -0,0 +1,122 @@
+"""Test the request hooks and metrics."""
+
+import pytest
+import requests
+
+from pylemmy import Lemmy
+from pylemmy.endpoints import LemmyAPI
+from pylemmy.metrics import Histogram, Metrics, RequestHooks
+from pylemmy.testing.synthetic import SyntheticInstance
+from pylemmy.transport import FakeTransport, Response
+
+
+class RecordingHooks(RequestHooks):
+    """Records the hooks called."""
+
+    def __init__(self):
+        """Initialize RecordingHooks."""
+        self.calls = []
+
+    def on_request(self, event):
+        """Record a request."""
+        self.calls.append(("request", event.endpoint))
+
+    def on_response(self, event):
+        """Record a response."""
+        self.calls.append(("response", event.status))
+
+    def on_error(self, event, error):
+        """Record an error."""
+        self.calls.append(("error", event.status, type(error)))
+
+    def on_validate(self, method, endpoint, seconds):
+        """Record a validation."""
+        assert seconds >= 0
+        self.calls.append(("validate", method, endpoint))
+
+
+@pytest.fixture
+def transport():
+    """Fixture for a fake transport serving a few posts."""
+    instance = SyntheticInstance(n_communities=1)
+    instance.generate(n_posts=5, n_comments=0)
+    return FakeTransport(instance=instance)
+
+
+def test_hooks(transport):
+    """Hooks are called around successful and failed requests."""
+    hooks = RecordingHooks()
+    lemmy = Lemmy("http://lemmy.test", None, None, "tests", transport=transport)
+    lemmy.hooks.append(hooks)
+
+    lemmy.get_community(1)
+    transport.route(LemmyAPI.GetSite, Response.from_json({}, 503))
+    with pytest.raises(requests.HTTPError):
+        lemmy.get_request(LemmyAPI.GetSite)
+
+    assert hooks.calls == [
+        ("request", LemmyAPI.Community),
+        ("response", 200),
+        ("validate", "GET", LemmyAPI.Community),
+        ("request", LemmyAPI.GetSite),
+        ("response", 503),
+        ("error", 503, requests.HTTPError),
+    ]
+
+
+def test_metrics(transport):
+    """Metrics count requests, statuses and bytes, and time them by endpoint."""
+    metrics = Metrics()
+    lemmy = Lemmy(
+        "http://lemmy.test", None, None, "tests", transport=transport, hooks=[metrics]
+    )
+    community = lemmy.get_community(1)
+    for _ in range(3):
+        community.get_posts()
+    transport.route(LemmyAPI.GetSite, Response.from_json({}, 503))
+    with pytest.raises(requests.HTTPError):
+        lemmy.get_request(LemmyAPI.GetSite)
+
+    snapshot = metrics.snapshot()
+    assert set(snapshot) == {"GET Community", "GET GetPosts", "GET GetSite"}
+    posts = snapshot["GET GetPosts"]
+    assert posts["requests"] == 3
+    assert posts["statuses"] == {200: 3}
+    assert posts["errors"] == {}
+    assert posts["response_bytes"] > 0
+    for timing in ("network_seconds", "decode_seconds", "validate_seconds"):
+        assert posts[timing]["count"] == 3
+    site = snapshot["GET GetSite"]
+    assert site["statuses"] == {503: 1}
+    assert site["errors"] == {"HTTPError": 1}
+    assert site["decode_seconds"]["count"] == 0
+
+    text = metrics.to_prometheus()
+    assert "# TYPE pylemmy_requests_total counter" in text
+    assert 'pylemmy_requests_total{method="GET",endpoint="GetPosts"} 3' in text
+    assert (
+        'pylemmy_responses_total{method="GET",endpoint="GetSite",status="503"} 1'
+        in text
+    )
+    assert (
+        'pylemmy_network_seconds_bucket{method="GET",endpoint="GetPosts",le="+Inf"} 3'
+        in text
+    )
+    # Each family is declared once, before all its samples.
+    families = [line.split()[2] for line in text.splitlines() if line.startswith("#")]
+    assert len(families) == len(set(families))
+
+    metrics.reset()
+    assert metrics.snapshot() == {}
+
+
+def test_histogram():
+    """Histograms estimate quantiles with the bounds of their buckets."""
+    histogram = Histogram(buckets=(1, 2, 5))
+    for value in (0.5, 1.5, 1.5, 3, 10):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.quantile(0.5) == 2
+    assert histogram.quantile(0.8) == 5
+    assert histogram.quantile(1) == float("inf")
+    assert histogram.snapshot()["mean"] == pytest.approx(16.5 / 5)
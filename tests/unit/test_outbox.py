@@ -0,0 +1,103 @@
+"""Test the Outbox, sending writes in the background."""
+
+import pytest
+import requests
+from urllib3 import HTTPConnectionPool
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from pylemmy import api
+from pylemmy.endpoints import LemmyAPI
+from pylemmy.models.comment import Comment
+from pylemmy.models.post import Post
+from pylemmy.outbox import Outbox
+
+
+def _response(status: int) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    return response
+
+
+@pytest.fixture
+def sent(lemmy, monkeypatch, comment_view_factory):
+    """Fixture replacing the requests of the client, and recording them."""
+    requests_sent = []
+
+    def post_request(path, params):
+        requests_sent.append((path, params))
+        if len(requests_sent) == 1:
+            raise requests.HTTPError(response=_response(429))
+        view = comment_view_factory(len(requests_sent), params.content)
+        return {"comment_view": view.model_dump(), "recipient_ids": []}
+
+    monkeypatch.setattr(lemmy, "get_token", lambda: "token")
+    monkeypatch.setattr(lemmy, "post_request", post_request)
+    return requests_sent
+
+
+def test_create_comment_with_retry(lemmy, sent, post_view_factory):
+    """Writes are retried when they weren't applied, and the future gets the result."""
+    post = Post(lemmy, post_view_factory(7))
+    with Outbox(lemmy, min_retry_wait=0) as outbox:
+        future = outbox.create_comment(post, "Hello")
+        comment = future.result(timeout=5)
+
+    assert isinstance(comment, Comment)
+    assert comment.comment_view.comment.content == "Hello"
+    assert comment.post is post
+    assert len(sent) == 2
+    assert sent[1][0] is LemmyAPI.Comment
+    assert sent[1][1] == api.comment.CreateComment(content="Hello", post_id=7)
+
+
+def test_journal_recovery(lemmy, sent, tmp_path):
+    """Writes left in the journal are sent by the next Outbox."""
+    journal = str(tmp_path / "outbox.db")
+    outbox = Outbox(lemmy, workers=0, journal_path=journal)
+    outbox.create_comment(3, "Pending")
+    outbox.close(wait=False)
+    assert sent == []
+
+    with Outbox(lemmy, journal_path=journal, min_retry_wait=0) as outbox:
+        (future,) = outbox.recovered
+        assert future.result(timeout=5).comment_view.comment.content == "Pending"
+
+    with Outbox(lemmy, journal_path=journal) as outbox:
+        assert outbox.recovered == []
+
+
+@pytest.mark.parametrize(
+    ("error", "attempts"),
+    [
+        (requests.ReadTimeout("read timed out"), 1),
+        (requests.HTTPError(response=_response(503)), 1),
+        (requests.ConnectionError("reset"), 1),
+        (requests.ConnectTimeout("connect timed out"), 3),
+        (
+            requests.ConnectionError(
+                MaxRetryError(
+                    HTTPConnectionPool("lemmy.test"),
+                    "/",
+                    NewConnectionError(HTTPConnection("lemmy.test"), "refused"),
+                )
+            ),
+            3,
+        ),
+    ],
+)
+def test_no_retry_once_sent(lemmy, monkeypatch, error, attempts):
+    """Writes the server may have applied aren't resent, to avoid duplicates."""
+    calls = []
+
+    def post_request(path, params):  # noqa: ARG001
+        calls.append(params)
+        raise error
+
+    monkeypatch.setattr(lemmy, "get_token", lambda: "token")
+    monkeypatch.setattr(lemmy, "post_request", post_request)
+    with Outbox(lemmy, max_retries=2, min_retry_wait=0) as outbox:
+        future = outbox.create_comment(1, "Hello")
+        with pytest.raises(type(error)):
+            future.result(timeout=5)
+    assert len(calls) == attempts
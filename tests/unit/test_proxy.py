@@ -0,0 +1,68 @@
+"""Test the proxy sharing a client between the bots of a host."""
+
+import pytest
+import requests
+
+from pylemmy import Lemmy
+from pylemmy.cache import DEFAULT_TTLS, ResponseCache
+from pylemmy.endpoints import LemmyAPI
+from pylemmy.proxy import LemmyProxy
+from pylemmy.testing.synthetic import SyntheticInstance
+from pylemmy.transport import FakeTransport, Response, UnixSocketTransport
+
+
+@pytest.fixture
+def upstream():
+    """Fixture for the proxy's client, of a synthetic instance."""
+    instance = SyntheticInstance(n_communities=2)
+    instance.generate(n_posts=20)
+    return Lemmy(
+        "http://lemmy.test",
+        "bot",
+        "password",
+        "proxy",
+        transport=FakeTransport(instance=instance),
+        # Bots polling the same listings share its responses for a few seconds.
+        response_cache=ResponseCache({**DEFAULT_TTLS, LemmyAPI.GetPosts: 5}),
+    )
+
+
+def test_proxy(upstream, tmp_path):
+    """Bots share the proxy's session and cache, and see the instance's content."""
+    expected = [p.post_view.post.id for p in upstream.get_community(1).get_posts()]
+    path = str(tmp_path / "lemmy.sock")
+    with LemmyProxy(upstream, path) as proxy:
+        bots = [
+            Lemmy(
+                "http://lemmy.test",
+                "someone",
+                "else",
+                f"bot {i}",
+                transport=UnixSocketTransport(path),
+            )
+            for i in range(5)
+        ]
+        results = bots[0].map(
+            lambda bot: [p.post_view.post.id for p in bot.get_community(1).get_posts()],
+            bots,
+        )
+        assert all(r.unwrap() == expected for r in results)
+        assert bots[0].get_token() == upstream.get_token()
+
+        upstream.transport.route(
+            LemmyAPI.Post, Response.from_json({"error": "couldnt_find_post"}, 404)
+        )
+        with pytest.raises(requests.HTTPError) as error:
+            bots[0].get_request(LemmyAPI.Post, {"id": 1000})
+        assert error.value.response.json() == {"error": "couldnt_find_post"}
+        stats = proxy.stats()
+        for bot in bots:
+            bot.close()
+
+    calls = upstream.transport.calls
+    assert calls[("POST", LemmyAPI.Login.value)] == 1
+    # One request for the expected posts, and one for all the bots.
+    assert calls[("GET", LemmyAPI.GetPosts.value)] == 2
+    assert stats["requests"][LemmyAPI.GetPosts.value] == 5
+    assert stats["cache"]["hits"] > 0
+    assert not (tmp_path / "lemmy.sock").exists()
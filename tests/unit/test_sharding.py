@@ -0,0 +1,89 @@
+"""Test the sharded stream workers and their dedup stores."""
+
+import pytest
+
+from pylemmy import Lemmy
+from pylemmy.sharding import (
+    ConsistentHashRing,
+    MemoryDedupStore,
+    SQLiteDedupStore,
+    StreamWorker,
+)
+from pylemmy.testing.synthetic import SyntheticInstance
+from pylemmy.transport import FakeTransport
+
+
+def test_hash_ring():
+    """Keys are spread over the nodes, and few move when a node is added."""
+    keys = [f"community{i}" for i in range(1000)]
+    ring = ConsistentHashRing(["a", "b", "c"])
+    before = {key: ring.node_for(key) for key in keys}
+    assert all(200 < len(k) < 467 for k in ring.assign(keys).values())
+    fallbacks = ring.nodes_for(keys[0], 5)
+    assert fallbacks[0] == before[keys[0]]
+    assert sorted(fallbacks) == ["a", "b", "c"]
+
+    ring.add("d")
+    after = {key: ring.node_for(key) for key in keys}
+    moved = [key for key in keys if before[key] != after[key]]
+    assert all(after[key] == "d" for key in moved)
+    assert len(moved) < 400
+
+    ring.remove("d")
+    assert {key: ring.node_for(key) for key in keys} == before
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_dedup_store(kind, tmp_path):
+    """A key is claimed once, across all the users of the store."""
+    if kind == "memory":
+        store = other = MemoryDedupStore()
+    else:
+        store = SQLiteDedupStore(str(tmp_path / "dedup.sqlite"))
+        other = SQLiteDedupStore(str(tmp_path / "dedup.sqlite"))
+
+    assert store.claim(["a", "b"]) == [True, True]
+    assert other.claim(["b", "c", "c"]) == [False, True, False]
+    assert len(store) == 3
+
+    assert other.get_checkpoint("posts/1") is None
+    store.set_checkpoint("posts/1", "2023-06-01T12:00:00.000000")
+    assert other.get_checkpoint("posts/1") == "2023-06-01T12:00:00.000000"
+
+    store.prune(before=float("inf"))
+    assert len(other) == 0
+
+
+def test_stream_workers():
+    """Workers split the communities, and deliver each item once."""
+    instance = SyntheticInstance(n_communities=6)
+    instance.generate(n_posts=30, n_comments=0)
+    lemmy = Lemmy(
+        "http://lemmy.test",
+        None,
+        None,
+        "tests",
+        transport=FakeTransport(instance=instance),
+    )
+    communities = list(range(1, 7))
+    store = MemoryDedupStore()
+
+    workers = [
+        StreamWorker(lemmy, communities, worker=w, workers=["a", "b"], store=store)
+        for w in ("a", "b")
+    ]
+    assert sorted(c for w in workers for c in w.assigned) == communities
+
+    # A worker which still thinks it's alone overlaps with the others.
+    stale = StreamWorker(lemmy, communities, worker="a", workers=["a"], store=store)
+    delivered = []
+    for worker in [*workers, stale]:
+        n_posts = sum(
+            len(instance.get_posts({"community_id": c, "limit": 50})["posts"])
+            for c in worker.assigned
+        )
+        worker.posts_apply(delivered.append, limit=n_posts, min_wait_time=0)
+
+    assert sorted(p.post_view.post.id for p in delivered) == list(range(1, 31))
+    assert stale.delivered == 0
+    assert stale.duplicates == 30
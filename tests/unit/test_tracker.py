@@ -0,0 +1,70 @@
+"""Test the tracker of vote counts."""
+
+import pytest
+
+from pylemmy import Lemmy
+from pylemmy.endpoints import LemmyAPI
+from pylemmy.testing.synthetic import SyntheticInstance
+from pylemmy.tracker import POST_FIELDS, CounterSeries, ScoreTracker
+from pylemmy.transport import FakeTransport
+from pylemmy.utils import parse_time
+
+
+def test_counter_series():
+    """The ring buffer keeps the last samples, in order."""
+    series = CounterSeries(["score"], capacity=3)
+    for t in range(5):
+        series.append(float(t), {"score": t * 10})
+    assert series.timestamps() == [2.0, 3.0, 4.0]
+    assert series.values("score") == [20, 30, 40]
+    assert series.oldest("score") == (2.0, 20)
+    assert series.latest("score") == (4.0, 40)
+    assert series.at("score", 3.5) == (3.0, 30)
+    assert series.at("score", 1.0) is None
+
+
+def test_score_tracker():
+    """Posts are re-polled in batches, and a brigaded post stands out."""
+    instance = SyntheticInstance(n_communities=2)
+    instance.generate(n_posts=30)
+    transport = FakeTransport(instance=instance)
+    lemmy = Lemmy("http://lemmy.test", None, None, "tests", transport=transport)
+    tracker = ScoreTracker(lemmy, max_age=None, page_size=10)
+
+    posts = lemmy.get_community(1).get_posts(limit=10)
+    other = next(p for p in instance.posts if p["community"]["id"] == 2)
+    tracker.watch([*posts, other["post"]["id"]])
+    assert len(tracker) == len(posts) + 1
+    brigaded = posts[3].post_view.post.id
+
+    for t in range(4):
+        for post in posts:
+            instance.vote(post_id=post.post_view.post.id, upvotes=1)
+        instance.vote(post_id=brigaded, downvotes=20)
+        assert tracker.poll(now=60.0 * t) == len(posts) + 1
+
+    # The post given by id is fetched alone once, then listed with its community,
+    # where it is on the second page.
+    assert tracker.single_requests == 1
+    assert transport.calls[("GET", LemmyAPI.Post.value)] == 1
+    assert tracker.listing_requests == 4 + 3 * 2
+    assert tracker.series(brigaded, "downvotes") == [
+        (0.0, 20),
+        (60.0, 40),
+        (120.0, 60),
+        (180.0, 80),
+    ]
+    assert tracker.rates("upvotes", window=120)[brigaded] == pytest.approx(1 / 60)
+    assert tracker.rates("downvotes", window=120)[brigaded] == pytest.approx(1 / 3)
+    assert tracker.outliers("downvotes", window=120) == [brigaded]
+    assert tracker.outliers("upvotes", window=120) == []
+    assert set(tracker.latest("score")) == set(tracker.zscores("score", 60))
+
+    tracker.unwatch([brigaded])
+    assert brigaded not in tracker
+    # Only the posts published in the last hour are still tracked.
+    tracker.max_age = 3600
+    newest = max(parse_time(p.post_view.post.published) for p in posts)
+    assert tracker.poll(now=newest.timestamp() + 3600) == 1
+    assert len(tracker) == 1
+    assert set(tracker.fields) == set(POST_FIELDS)
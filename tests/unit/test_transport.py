@@ -0,0 +1,204 @@
+"""Test the HTTP layer of the Lemmy client."""
+
+import asyncio
+import json
+import socketserver
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from pylemmy import Lemmy, api
+from pylemmy.endpoints import LemmyAPI
+from pylemmy.testing.synthetic import SyntheticInstance
+from pylemmy.transport import (
+    AsyncioTransport,
+    FakeTransport,
+    RequestsTransport,
+    Response,
+    Transport,
+    UnixSocketTransport,
+    create_session,
+)
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    """Answers GET requests with their path, user agent and cookies."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # noqa: N802
+        """Answer a GET request."""
+        body = json.dumps(
+            {
+                "path": self.path,
+                "user_agent": self.headers["User-Agent"],
+                "cookie": self.headers["Cookie"],
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Don't log requests."""
+
+
+@pytest.fixture
+def server_url():
+    """Fixture for the URL of a local HTTP server."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), EchoHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_transport_is_abstract():
+    """Transports must implement `request`."""
+    with pytest.raises(TypeError):
+        Transport()  # type: ignore[abstract]
+
+
+def test_shared_session(server_url):
+    """Clients sharing a session reuse its connections, with their own settings."""
+    session = create_session(pool_maxsize=2)
+    clients = [
+        Lemmy(server_url, None, None, f"client {i}", session=session, read_timeout=5)
+        for i in range(2)
+    ]
+    for i in range(3):
+        response = clients[i % 2].get_request(
+            LemmyAPI.Post, params=api.post.GetPost(id=i)
+        )
+        assert response["user_agent"] == f"client {i % 2}"
+
+    assert clients[0].timeout == (30, 5)
+    assert clients[0].connection_stats() == {
+        "connections": 1,
+        "requests": 3,
+        "reused": 2,
+    }
+    # Only the connections to the host of the URL are counted.
+    other_host = server_url.replace("127.0.0.1", "localhost")
+    assert RequestsTransport(session).connection_stats(other_host)["requests"] == 0
+
+
+def test_per_thread_sessions(server_url):
+    """Each thread has its own session, mirroring the settings of the shared one."""
+    transport = RequestsTransport(create_session(pool_maxsize=4), per_thread=True)
+    lemmy = Lemmy(server_url, None, None, "threaded client", transport=transport)
+    assert lemmy.session is not None
+    lemmy.session.cookies.set("theme", "dark")
+
+    def get_session(i: int):
+        response = lemmy.get_request(LemmyAPI.Post, params=api.post.GetPost(id=i))
+        assert response["cookie"] == "theme=dark"
+        return transport._get_session()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        sessions = set(executor.map(get_session, range(8)))
+
+    assert lemmy.session not in sessions
+    assert len(sessions) <= 4
+    assert all(s.proxies is lemmy.session.proxies for s in sessions)
+    stats = lemmy.connection_stats()
+    assert stats["requests"] == 8
+    assert stats["connections"] <= 4
+    lemmy.close()
+
+
+def test_asyncio_transport(server_url):
+    """The asyncio transport sends requests, reusing its connections."""
+    transport = AsyncioTransport()
+    lemmy = Lemmy(server_url, None, None, "async client", transport=transport)
+
+    async def get_posts():
+        responses = [
+            await lemmy.get_request_async(LemmyAPI.Post, api.post.GetPost(id=i))
+            for i in range(3)
+        ]
+        transport.close()
+        return responses
+
+    responses = asyncio.run(get_posts())
+    assert [r["path"] for r in responses] == [
+        f"{LemmyAPI.Post.value}?id={i}" for i in range(3)
+    ]
+    assert responses[0]["user_agent"] == "async client"
+
+    # Blocking calls share a loop, and reuse their connection.
+    for _ in range(3):
+        assert lemmy.get_request(LemmyAPI.GetSite)["path"] == LemmyAPI.GetSite.value
+    loop = transport._loop
+    assert [len(idle) for idle in transport._pools[loop].values()] == [1]
+    transport.close()
+    assert loop.is_closed()
+
+
+def test_fake_transport():
+    """The fake transport serves synthetic content, and errors from its routes."""
+    instance = SyntheticInstance(n_communities=2)
+    instance.generate(n_posts=30, n_comments=10)
+    transport = FakeTransport(instance=instance)
+    lemmy = Lemmy("http://lemmy.test", None, None, "tests", transport=transport)
+
+    community = lemmy.get_community(1)
+    posts = community.get_posts(limit=50)
+    assert {p.post_view.community.id for p in posts} == {1}
+    assert len(posts) + len(lemmy.get_community(2).get_posts(limit=50)) == 30
+    assert len(lemmy.get_comments_by_id([instance.comments[0]["comment"]["id"]])) == 1
+
+    transport.route(LemmyAPI.GetSite, Response.from_json({}, 503))
+    with pytest.raises(requests.HTTPError) as error:
+        lemmy.get_request(LemmyAPI.GetSite)
+    assert error.value.response.status_code == 503
+    assert transport.calls[("GET", LemmyAPI.Community.value)] == 2
+
+
+class DroppingHandler(socketserver.StreamRequestHandler):
+    """Answers the first request of each connection, and drops the second one."""
+
+    def read_request(self):
+        """Read a request, and record its method."""
+        method = self.rfile.readline().split()[0].decode()
+        length = 0
+        while (line := self.rfile.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        self.rfile.read(length)
+        self.server.methods.append(method)  # type: ignore[attr-defined]
+
+    def handle(self):
+        """Answer a request, then close the connection after reading the next one."""
+        self.read_request()
+        self.wfile.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}")
+        self.read_request()
+
+
+def test_unix_socket_retries(tmp_path):
+    """Only idempotent requests are resent when the server drops a connection."""
+    path = str(tmp_path / "lemmy.sock")
+    server = socketserver.ThreadingUnixStreamServer(path, DroppingHandler)
+    server.methods = []  # type: ignore[attr-defined]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    transport = UnixSocketTransport(path)
+    url = "http://lemmy.test/api/v3/post"
+    try:
+        transport.request("GET", url, timeout=5)
+        # The connection is dropped after the request is sent, and it is resent.
+        assert transport.request("GET", url, timeout=5).json() == {}
+        with pytest.raises(requests.ConnectionError):
+            transport.request("POST", url, json={"name": "post"}, timeout=5)
+    finally:
+        transport.close()
+        server.shutdown()
+        server.server_close()
+    assert server.methods == ["GET", "GET", "GET", "POST"]  # type: ignore[attr-defined]
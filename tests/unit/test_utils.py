@@ -1,6 +1,20 @@
 """Test functions from the utils module."""
 
-from pylemmy.utils import stream_apply
+import datetime
+import itertools
+import time
+
+import pytest
+
+from pylemmy.utils import (
+    PageSizer,
+    RateLimiter,
+    StreamStats,
+    paginate,
+    run_concurrently,
+    stream_apply,
+    stream_generator,
+)
 
 
 class SwitchObj:
@@ -47,3 +61,176 @@ def test_stream_apply():
         assert s.status
     for s in switches2:
         assert s.status
+
+
+def test_stream_stats():
+    """Streams skip existing results if asked, and report their statistics."""
+    published = (
+        datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=3)
+    ).strftime("%Y-%m-%dT%H:%M:%S.%f")
+    polls = itertools.count(1)
+
+    def results_fn():
+        # 2 new results appear every other poll.
+        newest = 2 * (next(polls) // 2) + 2
+        return [(i, published) for i in range(newest, newest - 2, -1)]
+
+    stats = StreamStats()
+    stream = stream_generator(
+        results_fn,
+        lambda x: str(x[0]),
+        skip_existing=True,
+        limit=4,
+        min_wait_time=0,
+        max_wait_time=0,
+        stats=stats,
+        published_fn=lambda x: x[1],
+    )
+
+    assert [i for i, _ in stream] == [4, 3, 6, 5]
+    snapshot = stats.snapshot()
+    assert snapshot["polls"] == 4
+    assert snapshot["empty_polls"] == 1
+    assert snapshot["new_items"] == 6
+    assert snapshot["duplicates"] == 2
+    assert snapshot["items_per_poll"] == 1.5
+    assert snapshot["dedup_keys"] == 6
+    assert snapshot["dedup_bytes"] > 0
+    assert snapshot["lag_seconds"]["count"] == 4
+    assert snapshot["lag_seconds"]["p50"] == 5
+
+
+def test_page_sizer():
+    """Pages shrink on a quiet source, and a burst is caught up without gaps."""
+    items = list(range(1, 11))  # newest last
+    arrivals = {5: 30, 9: 1}  # new items before some polls
+    requests = []
+    stats = StreamStats()
+
+    def results_fn(*, limit, page):
+        n = arrivals.pop(stats.polls, 0)
+        items.extend(range(items[-1] + 1, items[-1] + 1 + n))
+        requests.append((limit, page))
+        return items[::-1][(page - 1) * limit : page * limit]
+
+    stream = stream_generator(
+        results_fn,
+        str,
+        limit=41,
+        min_wait_time=0,
+        max_wait_time=0,
+        stats=stats,
+        page_sizer=PageSizer(),
+    )
+
+    streamed = list(stream)
+    assert sorted(streamed) == list(range(1, 42))
+    assert requests == [
+        (10, 1),
+        (10, 1),
+        (2, 1),
+        (2, 1),
+        (2, 1),
+        (2, 1),
+        (50, 1),
+        (31, 1),
+        (16, 1),
+        (9, 1),
+        (5, 1),
+    ]
+    assert stats.page_limit == 4
+    # Pages of 10 items would have downloaded 110 items, and missed 20 of the burst.
+    downloaded = 10 + 10 + 4 * 2 + 40 + 31 + 16 + 9 + 5
+    assert downloaded / len(streamed) < 110 / (len(streamed) - 20)
+
+
+def test_page_sizer_filter():
+    """A burst is caught up when most of its items are filtered out."""
+    items = list(range(1, 11))  # newest last
+    stats = StreamStats()
+
+    def results_fn(*, limit, page):
+        assert stats.polls < 10, "the stream missed items of the burst"
+        if stats.polls == 2:
+            items.extend(range(11, 41))
+        return items[::-1][(page - 1) * limit : page * limit]
+
+    stream = stream_generator(
+        results_fn,
+        str,
+        filter_fn=lambda x: x % 10 == 0,
+        limit=4,
+        min_wait_time=0,
+        max_wait_time=0,
+        stats=stats,
+        page_sizer=PageSizer(),
+    )
+
+    assert list(stream) == [10, 40, 30, 20]
+
+
+@pytest.mark.parametrize("cursors", [False, True])
+def test_paginate(cursors):
+    """Items added during a crawl don't cause duplicates, with or without cursors."""
+    items = list(range(1, 26))  # newest last
+    requests = []
+
+    def page_fn(*, page=None, page_cursor=None):
+        requests.append(page_cursor if cursors and page_cursor else page)
+        older = items if page_cursor is None else [i for i in items if i < page_cursor]
+        start = 0 if page_cursor is not None else (page - 1) * 10
+        result = older[::-1][start : start + 10]
+        items.append(items[-1] + 1)  # a new item arrives after each request
+        return result, (result[-1] if cursors and result else None)
+
+    crawled = list(paginate(page_fn, str))
+    assert sorted(crawled) == list(range(1, 26))
+    assert len(crawled) == len(set(crawled))
+    assert requests == ([1, 16, 6, 1] if cursors else [1, 2, 3])
+
+    limited = list(paginate(page_fn, str, filter_fn=lambda x: x % 2, limit=3))
+    assert limited == ([29, 27, 25] if cursors else [27, 25, 23])
+
+
+def test_paginate_burst():
+    """More than a page of new items between two pages doesn't end the crawl."""
+    items = list(range(1, 26))  # newest last
+    requests = []
+
+    def page_fn(*, page):
+        requests.append(page)
+        result = items[::-1][(page - 1) * 10 : page * 10]
+        if page == 1:
+            items.extend(range(26, 41))
+        return result, None
+
+    crawled = list(paginate(page_fn, str))
+    # The pages shifted by 15 items: the second one has 10 of the new items, and
+    # the crawl goes on to reach the older items.
+    assert sorted(crawled) == list(range(1, 31))
+    assert len(crawled) == len(set(crawled))
+    assert requests == [1, 2, 3, 4, 5]
+
+
+def test_rate_limiter():
+    """After the burst is used, actions are spaced according to the rate."""
+    limiter = RateLimiter(rate=50, burst=2)
+    start = time.monotonic()
+    for _ in range(4):
+        limiter.acquire()
+    # 2 actions from the burst, then 2 more at 50 per second
+    assert time.monotonic() - start >= 0.035
+
+
+def test_run_concurrently():
+    """Results keep the order of the inputs, and failures don't stop the others."""
+
+    def invert(x: int) -> float:
+        return 1 / x
+
+    results = run_concurrently(invert, [1, 0, 4], max_workers=2)
+    assert [r.key for r in results] == [1, 0, 4]
+    assert [r.ok for r in results] == [True, False, True]
+    assert results[2].unwrap() == 0.25
+    with pytest.raises(ZeroDivisionError):
+        results[1].unwrap()